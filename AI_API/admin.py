@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import AIRequest, AIConfiguration
+from django.utils.html import format_html_join
+from .blobs import blob_url
+from .models import AIRequest, AIConfiguration, AIAnalysisCache
 
 
 @admin.register(AIRequest)
@@ -8,9 +10,9 @@ class AIRequestAdmin(admin.ModelAdmin):
         'id', 'user', 'request_type', 'status', 'model_name',
         'response_tokens', 'processing_time', 'created_at'
     ]
-    list_filter = ['request_type', 'status', 'model_name', 'created_at']
+    list_filter = ['request_type', 'status', 'task', 'model_name', 'created_at']
     search_fields = ['prompt', 'response_text', 'user__username']
-    readonly_fields = ['created_at', 'updated_at', 'processing_time']
+    readonly_fields = ['created_at', 'updated_at', 'processing_time', 'image_previews']
     ordering = ['-created_at']
     
     fieldsets = (
@@ -18,16 +20,38 @@ class AIRequestAdmin(admin.ModelAdmin):
             'fields': ('user', 'request_type', 'status', 'model_name')
         }),
         ('Request', {
-            'fields': ('prompt', 'image_urls', 'max_tokens', 'temperature')
+            'fields': ('prompt', 'image_urls', 'image_previews', 'max_tokens', 'temperature')
         }),
         ('Response', {
             'fields': ('response_text', 'response_tokens', 'processing_time', 'error_message')
         }),
+        ('Cola', {
+            'fields': ('task', 'attempts', 'run_after', 'leased_by', 'lease_expires_at', 'result'),
+            'classes': ('collapse',)
+        }),
         ('Metadatos', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).select_related('user')
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            # El listado no muestra textos ni imágenes: no cargarlos
+            queryset = queryset.defer('prompt', 'response_text', 'image_urls', 'error_message', 'result')
+        return queryset
+    
+    @admin.display(description='Imágenes')
+    def image_previews(self, obj):
+        """Miniaturas servidas desde el almacén de blobs, cargadas bajo demanda por el navegador"""
+        if not obj.image_urls:
+            return '-'
+        return format_html_join(
+            ' ',
+            '<a href="{0}" target="_blank"><img src="{0}" loading="lazy" style="max-height: 120px;"></a>',
+            ((blob_url(ref),) for ref in obj.image_urls)
+        )
 
 
 @admin.register(AIConfiguration)
@@ -55,3 +79,11 @@ class AIConfigurationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(AIAnalysisCache)
+class AIAnalysisCacheAdmin(admin.ModelAdmin):
+    list_display = ['key', 'created_at', 'last_used_at']
+    search_fields = ['key']
+    readonly_fields = ['key', 'data', 'created_at', 'last_used_at']
+    ordering = ['-last_used_at']
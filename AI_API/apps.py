@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AiApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'AI_API'
+    
+    def ready(self):
+        """Conectar señales y, si está activado, calentar el servicio de IA"""
+        import AI_API.signals
+        from django.conf import settings
+        
+        if getattr(settings, 'AI_WARM_UP', False):
+            from .registry import warm_up_in_background
+            warm_up_in_background()
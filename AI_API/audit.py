@@ -0,0 +1,156 @@
+"""
+Registro de auditoría de AIRequest con escrituras agrupadas.
+
+En lugar de crear el registro como 'pending' y actualizarlo dos veces durante la
+inferencia, el servicio construye el AIRequest en memoria y lo entrega aquí una
+sola vez con su estado final. En modo 'buffered' los registros se acumulan y un
+hilo en segundo plano los escribe con bulk_create/bulk_update al alcanzar
+AI_AUDIT_BATCH_SIZE registros o cada AI_AUDIT_FLUSH_INTERVAL segundos, de modo
+que la ruta de la request no espera al lock de escritura de SQLite, pero las
+respuestas no pueden devolver el id del registro ('request_id' es None). En
+modo 'sync', el predeterminado, cada registro se guarda inmediatamente y tiene
+id al volver. El buffer se vacía al salir del proceso.
+
+Si un lote falla se reintenta fila por fila, de modo que un registro inválido
+no descarta el resto; los fallos se registran en el log y en los contadores
+ai_audit_flush_errors_total y ai_audit_dropped_total.
+"""
+import atexit
+import logging
+import threading
+from typing import List
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from productplatform import metrics
+from .models import AIRequest
+
+logger = logging.getLogger(__name__)
+
+AUDIT_MODE = getattr(settings, 'AI_AUDIT_MODE', 'sync')
+AUDIT_BATCH_SIZE = getattr(settings, 'AI_AUDIT_BATCH_SIZE', 50)
+AUDIT_FLUSH_INTERVAL = getattr(settings, 'AI_AUDIT_FLUSH_INTERVAL', 2.0)
+
+# Campos que cambian cuando se registra de nuevo un AIRequest ya guardado
+UPDATE_FIELDS = [
+    'status', 'response_text', 'response_tokens', 'processing_time',
+    'error_message', 'updated_at',
+]
+
+
+class AIRequestAuditLogger:
+    """
+    Buffer de registros AIRequest que se escribe por lotes
+    """
+
+    def __init__(self, mode: str = 'buffered', batch_size: int = 50, flush_interval: float = 2.0):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[AIRequest] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._exit_flush_registered = False
+
+    @property
+    def is_buffered(self) -> bool:
+        return self.mode == 'buffered'
+
+    def log(self, ai_request: AIRequest) -> AIRequest:
+        """
+        Registra el AIRequest en su estado actual. En modo 'sync' lo guarda ya
+        (y tendrá id al volver); en modo 'buffered' no toca la base de datos
+        """
+        if not self.is_buffered:
+            ai_request.save()
+            return ai_request
+
+        with self._lock:
+            self._pending.append(ai_request)
+            pending = len(self._pending)
+        self._ensure_flusher()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return ai_request
+
+    def flush(self):
+        """
+        Escribe todos los registros acumulados: bulk_create para los nuevos y
+        bulk_update para los que ya existían. Si el lote falla se reintenta
+        fila por fila
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            now = timezone.now()
+            creates = [ai_request for ai_request in pending if ai_request.pk is None]
+            updates = list({ai_request.pk: ai_request for ai_request in pending if ai_request.pk}.values())
+            for ai_request in updates:
+                ai_request.updated_at = now
+
+            try:
+                with transaction.atomic():
+                    if creates:
+                        AIRequest.objects.bulk_create(creates, batch_size=self.batch_size)
+                    if updates:
+                        AIRequest.objects.bulk_update(updates, UPDATE_FIELDS, batch_size=self.batch_size)
+            except Exception:
+                logger.exception(
+                    'Falló la escritura por lotes de %d registros de auditoría de IA; '
+                    'se reintenta fila por fila', len(creates) + len(updates)
+                )
+                metrics.counter(
+                    'ai_audit_flush_errors_total', 'Lotes de auditoría de IA que fallaron'
+                ).inc()
+                self._save_each(creates + updates)
+
+    @staticmethod
+    def _save_each(ai_requests: List[AIRequest]):
+        dropped = 0
+        for ai_request in ai_requests:
+            try:
+                ai_request.save()
+            except Exception:
+                dropped += 1
+                logger.exception('No se pudo guardar el registro de auditoría de IA %r', ai_request)
+        if dropped:
+            metrics.counter(
+                'ai_audit_dropped_total', 'Registros de auditoría de IA descartados por errores de escritura'
+            ).inc(dropped)
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(
+                    target=self._run_flusher, name='ai-audit-flusher', daemon=True
+                )
+                self._flusher.start()
+                if not self._exit_flush_registered:
+                    # Lo que quede en el buffer se escribe al salir del proceso
+                    atexit.register(self.flush)
+                    self._exit_flush_registered = True
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+
+audit_logger = AIRequestAuditLogger(
+    mode=AUDIT_MODE,
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL,
+)
@@ -0,0 +1,219 @@
+"""
+Balanceo de carga entre varias réplicas de Gemma.
+
+Cada AIConfiguration activo es un endpoint del pool con su propio
+Gemma3Service (sesión keep-alive y circuit breaker). Cada request se envía al
+endpoint elegido según AI_LOAD_BALANCING:
+
+- 'least_outstanding': el que tiene menos requests en curso (desempate por
+  latencia media).
+- 'ewma': el de menor latencia media móvil exponencial, ponderada por las
+  requests en curso. Los fallos entran en la media como una latencia de al
+  menos AI_EWMA_FAILURE_PENALTY segundos, y un endpoint aún sin medir puntúa
+  con la media del pool, de modo que un endpoint que solo falla no gana
+  todas las elecciones.
+
+Un hilo en segundo plano ejecuta health_check sobre cada endpoint cada
+AI_HEALTH_PROBE_INTERVAL segundos. Los endpoints que fallan la sonda o tienen el
+circuito abierto quedan fuera de la rotación hasta recuperarse. Si no queda
+ninguno sano se usan todos, y el circuit breaker decide si fallan al instante.
+
+EndpointPool expone la misma interfaz que Gemma3Service (config,
+generate_response, stream_response, health_check), así que el resto del código
+no distingue entre un endpoint y varios.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+
+from .models import AIConfiguration
+from .resilience import CircuitBreaker, get_circuit_breaker
+from .services import Gemma3Service
+
+logger = logging.getLogger(__name__)
+
+LOAD_BALANCING = getattr(settings, 'AI_LOAD_BALANCING', 'least_outstanding')
+HEALTH_PROBE_INTERVAL = getattr(settings, 'AI_HEALTH_PROBE_INTERVAL', 30.0)
+EWMA_ALPHA = getattr(settings, 'AI_EWMA_ALPHA', 0.3)
+EWMA_FAILURE_PENALTY = getattr(settings, 'AI_EWMA_FAILURE_PENALTY', 10.0)
+
+STRATEGIES = ('least_outstanding', 'ewma')
+
+
+class Endpoint:
+    """
+    Una réplica del pool con sus contadores de carga y salud
+    """
+
+    def __init__(self, service: Gemma3Service, alpha: float = 0.3, failure_penalty: float = 10.0):
+        self.service = service
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.healthy = True
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> AIConfiguration:
+        return self.service.config
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return get_circuit_breaker(self.config.lightning_endpoint)
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.breaker.state != CircuitBreaker.OPEN
+
+    def start_request(self) -> float:
+        with self._lock:
+            self.outstanding += 1
+        return time.monotonic()
+
+    def finish_request(self, start_time: float, success: bool):
+        latency = time.monotonic() - start_time
+        if not success:
+            # Un fallo rápido (conexión rechazada) no debe parecer una respuesta rápida
+            latency = max(latency, self.failure_penalty)
+        with self._lock:
+            self.outstanding -= 1
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'name': self.config.name,
+            'endpoint': self.config.lightning_endpoint,
+            'healthy': self.healthy,
+            'available': self.available,
+            'outstanding': self.outstanding,
+            'ewma_latency': round(self.ewma_latency, 4) if self.ewma_latency is not None else None,
+            'last_error': self.last_error,
+            'circuit_breaker': self.breaker.snapshot(),
+        }
+
+
+class EndpointPool:
+    """
+    Pool de endpoints de Gemma con la interfaz de Gemma3Service
+    """
+
+    def __init__(self, services: List[Gemma3Service], strategy: str = 'least_outstanding',
+                 alpha: float = 0.3, failure_penalty: float = 10.0):
+        if not services:
+            raise ValueError("EndpointPool necesita al menos un endpoint")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia de balanceo desconocida: {strategy}")
+        self.endpoints = [Endpoint(service, alpha, failure_penalty) for service in services]
+        self.strategy = strategy
+        self._stop = threading.Event()
+        self._prober = None
+
+    @classmethod
+    def from_active_configs(cls) -> 'EndpointPool':
+        """
+        Construye el pool con todos los AIConfiguration activos (crea el de
+        por defecto si no hay ninguno)
+        """
+        configs = list(AIConfiguration.objects.filter(is_active=True).order_by('id'))
+        if not configs:
+            configs = [Gemma3Service._get_active_config()]
+        return cls(
+            [Gemma3Service(config) for config in configs],
+            strategy=LOAD_BALANCING,
+            alpha=EWMA_ALPHA,
+            failure_penalty=EWMA_FAILURE_PENALTY,
+        )
+
+    @property
+    def config(self) -> AIConfiguration:
+        """
+        Configuración del primer endpoint; se usa para el nombre del modelo,
+        que debe ser el mismo en todas las réplicas
+        """
+        return self.endpoints[0].config
+
+    def choose(self) -> Endpoint:
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.available] or self.endpoints
+        if self.strategy == 'ewma':
+            # Los endpoints sin medir puntúan con la media del pool (y ganan los empates):
+            # reciben tráfico sin ganar siempre
+            measured = [e.ewma_latency for e in self.endpoints if e.ewma_latency is not None]
+            default = sum(measured) / len(measured) if measured else 0.0
+            return min(candidates, key=lambda e: (
+                (default if e.ewma_latency is None else e.ewma_latency) * (e.outstanding + 1),
+                e.ewma_latency is not None,
+                e.outstanding,
+            ))
+        return min(candidates, key=lambda e: (e.outstanding, e.ewma_latency or 0.0))
+
+    def generate_response(self, *args, **kwargs) -> Dict[str, Any]:
+        endpoint = self.choose()
+        start_time = endpoint.start_request()
+        success = False
+        try:
+            result = endpoint.service.generate_response(*args, **kwargs)
+            success = result['success']
+            return result
+        finally:
+            endpoint.finish_request(start_time, success)
+
+    def stream_response(self, *args, **kwargs) -> Iterator[str]:
+        endpoint = self.choose()
+        start_time = endpoint.start_request()
+        success = False
+        try:
+            yield from endpoint.service.stream_response(*args, **kwargs)
+            success = True
+        finally:
+            endpoint.finish_request(start_time, success)
+
+    def probe(self):
+        """
+        Ejecuta health_check en cada endpoint y actualiza su disponibilidad
+        """
+        for endpoint in self.endpoints:
+            result = endpoint.service.health_check()
+            endpoint.healthy = result['status'] == 'healthy'
+            endpoint.last_error = result.get('error')
+
+    def health_check(self) -> Dict[str, Any]:
+        """
+        Sondea todos los endpoints; el pool está sano si alguno lo está
+        """
+        self.probe()
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+        return {
+            'status': 'healthy' if healthy else 'unhealthy',
+            'model': self.config.model_name,
+            'strategy': self.strategy,
+            'healthy_endpoints': len(healthy),
+            'endpoints': [endpoint.snapshot() for endpoint in self.endpoints],
+        }
+
+    def start_probing(self, interval: float):
+        if interval <= 0 or self._prober is not None:
+            return
+        self._prober = threading.Thread(
+            target=self._run_prober, args=(interval,), name='ai-health-probe', daemon=True
+        )
+        self._prober.start()
+
+    def close(self):
+        """Detiene la sonda de salud (el pool fue reemplazado)"""
+        self._stop.set()
+
+    def _run_prober(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.probe()
+            except Exception:
+                # La sonda sigue viva, pero el fallo (p. ej. un error de programación) queda en el log
+                logger.exception('Falló la sonda de salud del pool de endpoints de IA')
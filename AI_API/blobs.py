@@ -0,0 +1,110 @@
+"""
+Almacén deduplicado de las imágenes enviadas al modelo.
+
+AIRequest.image_urls guarda referencias "sha256:<hash>.<ext>" en lugar de la data
+URL completa; los bytes se escriben una sola vez bajo
+AI_BLOB_ROOT/AI_BLOB_DIRECTORY/<hash[:2]>/<hash>.<ext>. Las URLs que no son data
+URLs (por ejemplo imágenes públicas http) se guardan tal cual.
+
+AI_BLOB_ROOT está fuera de MEDIA_ROOT: las fotos que suben los vendedores no se
+sirven públicamente, solo a staff a través de la vista ai_api:blob (previews
+del admin). Las referencias escritas antes en el storage de media (migración
+0004) se siguen leyendo desde allí.
+
+El nombre del fichero es el hash de su contenido, así que el storage sobrescribe
+en lugar de renombrar: dos escrituras simultáneas de la misma imagen dejan un
+único fichero con los mismos bytes.
+"""
+import hashlib
+import os
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.urls import reverse
+
+from .images import encode_data_url, parse_data_url
+
+BLOB_PREFIX = 'sha256:'
+BLOB_DIRECTORY = getattr(settings, 'AI_BLOB_DIRECTORY', 'ai_blobs')
+BLOB_ROOT = getattr(settings, 'AI_BLOB_ROOT', os.path.join(settings.BASE_DIR, 'private_media'))
+
+blob_storage = FileSystemStorage(location=BLOB_ROOT, base_url=None, allow_overwrite=True)
+
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+CONTENT_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+
+
+def is_blob_ref(value: str) -> bool:
+    return value.startswith(BLOB_PREFIX)
+
+
+def blob_path(ref: str) -> str:
+    """
+    Ruta en el storage de una referencia sha256:<hash>.<ext>
+    """
+    name = ref[len(BLOB_PREFIX):]
+    return f'{BLOB_DIRECTORY}/{name[:2]}/{name}'
+
+
+def store_image_url(image_url: str) -> str:
+    """
+    Guarda la imagen de una data URL en el almacén (si no existía ya) y
+    devuelve su referencia por contenido
+    """
+    parsed = parse_data_url(image_url)
+    if parsed is None:
+        return image_url
+
+    content_type, content = parsed
+    extension = EXTENSIONS.get(content_type, 'bin')
+    ref = f'{BLOB_PREFIX}{hashlib.sha256(content).hexdigest()}.{extension}'
+    path = blob_path(ref)
+    if not blob_storage.exists(path):
+        blob_storage.save(path, ContentFile(content))
+    return ref
+
+
+def store_image_urls(image_urls: List[str]) -> List[str]:
+    return [store_image_url(image_url) for image_url in image_urls or []]
+
+
+def blob_url(ref: str) -> Optional[str]:
+    """
+    URL (solo staff) de una referencia, para mostrarla sin cargar los bytes
+    """
+    if not is_blob_ref(ref):
+        return ref
+    return reverse('ai_api:blob', args=[ref[len(BLOB_PREFIX):]])
+
+
+def content_type(ref: str) -> str:
+    return CONTENT_TYPES.get(ref.rsplit('.', 1)[-1], 'application/octet-stream')
+
+
+def open_blob(ref: str):
+    """
+    Fichero de una referencia, abierto en binario. Las escritas antes del
+    almacén privado siguen en el storage de media
+    """
+    path = blob_path(ref)
+    if not blob_storage.exists(path) and default_storage.exists(path):
+        return default_storage.open(path, 'rb')
+    return blob_storage.open(path, 'rb')
+
+
+def load_image_url(ref: str) -> str:
+    """
+    Reconstruye la data URL original a partir de una referencia
+    """
+    if not is_blob_ref(ref):
+        return ref
+    with open_blob(ref) as blob:
+        content = blob.read()
+    return encode_data_url(content_type(ref), content)
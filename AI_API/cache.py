@@ -0,0 +1,252 @@
+"""
+Caché direccionada por contenido de los análisis de producto.
+
+La clave combina el hash de los bytes de cada imagen, la versión de la plantilla
+del prompt, el modelo y la configuración de IA, y las categorías ofrecidas al
+modelo, de modo que un reintento o una re-subida de la misma foto devuelve el
+JSON ya parseado sin volver a llamar al endpoint, pero añadir o renombrar una
+categoría (que cambia suggested_category) no sirve análisis obsoletos. El backend
+se elige con AI_ANALYSIS_CACHE, con la misma forma que CACHES de Django:
+
+    AI_ANALYSIS_CACHE = {
+        'BACKEND': 'AI_API.cache.LocalMemoryAnalysisCache',
+        'OPTIONS': {'MAX_ENTRIES': 1000, 'TIMEOUT': 604800, 'CULL_EVERY': 20},
+    }
+
+Los backends de archivo y de base de datos solo recortan a MAX_ENTRIES cada
+CULL_EVERY escrituras (contar las entradas cuesta O(N)), así que entre dos
+recortes pueden superar MAX_ENTRIES en hasta CULL_EVERY - 1 entradas.
+"""
+import abc
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .images import image_digest
+
+DEFAULT_CACHE_CONFIG = {
+    'BACKEND': 'AI_API.cache.LocalMemoryAnalysisCache',
+    'OPTIONS': {},
+}
+
+
+def analysis_cache_key(image_urls: List[str], prompt_version: int, model_name: str,
+                       category_names: List[str] = (), config_id=None) -> str:
+    """
+    Clave de caché para un análisis: imágenes (en orden), versión del prompt,
+    modelo, configuración de IA y categorías del prompt (en orden)
+    """
+    categories = hashlib.sha256('\n'.join(category_names).encode('utf-8')).hexdigest()
+    parts = [f'v{prompt_version}', model_name, f'config{config_id}', categories] + \
+        [image_digest(url) for url in image_urls]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+class BaseAnalysisCache(abc.ABC):
+    """
+    Interfaz común de los backends: get/set/delete/clear con expiración (TIMEOUT,
+    en segundos) y un máximo de entradas (MAX_ENTRIES) con desalojo LRU
+    """
+
+    def __init__(self, options: Dict[str, Any] = None):
+        options = options or {}
+        self.max_entries = int(options.get('MAX_ENTRIES', 1000))
+        self.timeout = int(options.get('TIMEOUT', 60 * 60 * 24 * 7))
+        self.cull_every = max(1, int(options.get('CULL_EVERY', 20)))
+        self._sets = 0
+        self._sets_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, data: Dict[str, Any]):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    def clear(self):
+        ...
+
+    def _should_cull(self) -> bool:
+        """
+        True una de cada cull_every escrituras
+        """
+        with self._sets_lock:
+            self._sets += 1
+            return self._sets % self.cull_every == 0
+
+
+class LocalMemoryAnalysisCache(BaseAnalysisCache):
+    """
+    Caché LRU en memoria del proceso
+    """
+
+    def __init__(self, options: Dict[str, Any] = None):
+        super().__init__(options)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileAnalysisCache(BaseAnalysisCache):
+    """
+    Caché en disco compartida entre procesos: un fichero JSON por entrada en
+    OPTIONS['LOCATION']. La fecha de modificación marca el último uso, así que
+    al superar MAX_ENTRIES se eliminan primero las entradas menos usadas
+    """
+
+    def __init__(self, options: Dict[str, Any] = None):
+        super().__init__(options)
+        options = options or {}
+        self.location = options.get(
+            'LOCATION', os.path.join(settings.MEDIA_ROOT, 'ai_analysis_cache')
+        )
+        os.makedirs(self.location, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.location, f'{key}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.timeout < time.time():
+                os.remove(path)
+                return None
+            with open(path, encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+            os.utime(path)
+            return data
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as cache_file:
+            json.dump(data, cache_file, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        if self._should_cull():
+            self._cull()
+
+    def _cull(self):
+        entries = [
+            entry for entry in os.scandir(self.location)
+            if entry.name.endswith('.json')
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for entry in os.scandir(self.location):
+            if entry.name.endswith('.json'):
+                self.delete(entry.name[:-5])
+
+
+class DatabaseAnalysisCache(BaseAnalysisCache):
+    """
+    Caché en la tabla AIAnalysisCache, junto a AIRequest
+    """
+
+    def get(self, key):
+        from .models import AIAnalysisCache
+
+        entry = AIAnalysisCache.objects.filter(
+            key=key, created_at__gte=timezone.now() - timedelta(seconds=self.timeout)
+        ).values_list('data', flat=True).first()
+        if entry is not None:
+            AIAnalysisCache.objects.filter(key=key).update(last_used_at=timezone.now())
+        return entry
+
+    def set(self, key, data):
+        from .models import AIAnalysisCache
+
+        AIAnalysisCache.objects.update_or_create(
+            key=key,
+            defaults={'data': data, 'created_at': timezone.now(), 'last_used_at': timezone.now()}
+        )
+        if not self._should_cull():
+            return
+        stale_keys = AIAnalysisCache.objects.order_by('-last_used_at').values_list(
+            'key', flat=True
+        )[self.max_entries:]
+        AIAnalysisCache.objects.filter(key__in=list(stale_keys)).delete()
+
+    def delete(self, key):
+        from .models import AIAnalysisCache
+
+        AIAnalysisCache.objects.filter(key=key).delete()
+
+    def clear(self):
+        from .models import AIAnalysisCache
+
+        AIAnalysisCache.objects.all().delete()
+
+
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> BaseAnalysisCache:
+    """
+    Instancia compartida del backend configurado en AI_ANALYSIS_CACHE
+    """
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                config = getattr(settings, 'AI_ANALYSIS_CACHE', DEFAULT_CACHE_CONFIG)
+                backend = import_string(config['BACKEND'])
+                _analysis_cache = backend(config.get('OPTIONS', {}))
+    return _analysis_cache
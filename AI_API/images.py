@@ -0,0 +1,107 @@
+"""
+Utilidades para las imágenes que se envían al modelo como data URLs
+"""
+import base64
+import binascii
+import hashlib
+import io
+from typing import Optional, Tuple
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from productplatform import metrics
+
+# Resolución de entrada de Gemma 3 (las imágenes se normalizan a 896x896)
+MAX_SIDE = getattr(settings, 'AI_IMAGE_MAX_SIDE', 896)
+OUTPUT_FORMAT = getattr(settings, 'AI_IMAGE_FORMAT', 'JPEG').upper()
+QUALITY = getattr(settings, 'AI_IMAGE_QUALITY', 85)
+
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+
+def parse_data_url(image_url: str) -> Optional[Tuple[str, bytes]]:
+    """
+    Devuelve (content_type, bytes) de una data URL base64, o None si la URL
+    no es una data URL válida
+    """
+    if not image_url.startswith('data:') or ';base64,' not in image_url:
+        return None
+    header, encoded = image_url[5:].split(';base64,', 1)
+    try:
+        return header or 'image/jpeg', base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def image_digest(image_url: str) -> str:
+    """
+    Hash SHA-256 del contenido de la imagen. Para data URLs se calcula sobre los
+    bytes decodificados; para URLs remotas, sobre la propia URL
+    """
+    parsed = parse_data_url(image_url)
+    content = parsed[1] if parsed else image_url.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def prepare_image(image_file, max_side: int = None, output_format: str = None,
+                  quality: int = None) -> Tuple[str, bytes]:
+    """
+    Redimensiona la imagen a la resolución de entrada del modelo, aplica la
+    orientación EXIF, descarta los metadatos y la re-codifica en JPEG/WebP.
+
+    Pillow lee el archivo de forma incremental (las subidas grandes quedan en
+    disco como TemporaryUploadedFile) y, para JPEG, decodifica directamente a
+    escala reducida con draft(), así que nunca se carga la foto original
+    completa en memoria.
+
+    Returns:
+        Tupla (content_type, bytes codificados)
+    """
+    max_side = max_side or MAX_SIDE
+    output_format = (output_format or OUTPUT_FORMAT).upper()
+    quality = quality or QUALITY
+
+    with Image.open(image_file) as image:
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        if image.mode in ('RGBA', 'LA', 'P') and output_format == 'JPEG':
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        buffer = io.BytesIO()
+        # Sin exif= ni icc_profile= los metadatos de la cámara no se copian
+        image.save(buffer, format=output_format, quality=quality, optimize=True)
+
+    return CONTENT_TYPES.get(output_format, 'image/jpeg'), buffer.getvalue()
+
+
+def encode_data_url(content_type: str, content: bytes) -> str:
+    """
+    Codifica bytes como data URL base64
+    """
+    return f"data:{content_type};base64,{base64.b64encode(content).decode('ascii')}"
+
+
+def image_to_data_url(image_file, fallback_content_type: str = 'image/jpeg') -> str:
+    """
+    Data URL lista para enviar al modelo. Si Pillow no reconoce el archivo se
+    envía el contenido original sin modificar
+    """
+    try:
+        with metrics.span('ai.image.prepare'):
+            content_type, content = prepare_image(image_file)
+    except (UnidentifiedImageError, OSError, ValueError):
+        image_file.seek(0)
+        content_type, content = fallback_content_type, image_file.read()
+    with metrics.span('ai.image.encode'):
+        return encode_data_url(content_type, content)
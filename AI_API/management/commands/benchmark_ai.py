@@ -0,0 +1,381 @@
+"""
+Benchmark reproducible de latencia y throughput de la IA contra un servidor
+Gemma simulado (AI_API.mock_server).
+
+Escenarios, cada uno a varios niveles de concurrencia:
+
+- analyze: POST /api/ai/analyze-product/ con una imagen (única por request
+  para que no acierte la caché de análisis, salvo con --cache-hits)
+- bulk: carga masiva completa; POST /api/products/bulk-jobs/ con N imágenes y
+  sondeo del estado hasta que el trabajo termina
+
+Las requests pasan por toda la pila de Django (middleware, vistas, auditoría)
+con el cliente de pruebas, en hilos. Por nivel se reportan throughput,
+latencias p50/p95/p99, escrituras en la base de datos (INSERT/UPDATE/DELETE de
+todas las conexiones, también las de los hilos de fondo), llamadas al modelo y
+memoria por request (tracemalloc). El resultado es JSON; con --baseline se
+compara contra un resultado anterior.
+"""
+import io
+import itertools
+import json
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from AI_API import registry
+from AI_API.audit import audit_logger
+from AI_API.mock_server import MockGemmaServer
+from AI_API.models import AIConfiguration
+from productplatform import metrics
+from products.models import BulkUploadJob, Category
+
+BENCHMARK_USER = 'benchmark_ai'
+BENCHMARK_CONFIG = 'benchmark-mock'
+SCENARIOS = ('analyze', 'bulk')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+POLL_INTERVAL = 0.05
+
+
+def percentile(values, percent: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class QueryTally:
+    """
+    execute_wrapper compartido por todas las conexiones del proceso que cuenta
+    consultas y escrituras
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        is_write = sql.lstrip().split(None, 1)[0].upper() in WRITE_STATEMENTS
+        with self._lock:
+            self.queries += 1
+            if is_write:
+                self.writes += 1
+        return execute(sql, params, many, context)
+
+    def attach(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def read(self) -> tuple:
+        with self._lock:
+            return self.queries, self.writes
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide throughput, latencias, escrituras en base de datos y memoria de '
+        'analyze-product y de la carga masiva contra un Gemma simulado'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default='analyze,bulk', help='Escenarios separados por comas: analyze, bulk')
+        parser.add_argument('--concurrency', default='1,4,16', help='Niveles de concurrencia separados por comas')
+        parser.add_argument('--requests', type=int, default=40, help='Requests de analyze por nivel')
+        parser.add_argument('--bulk-jobs', type=int, default=0, help='Trabajos de carga masiva por nivel (por defecto, la concurrencia)')
+        parser.add_argument('--bulk-images', type=int, default=10, help='Imágenes por trabajo de carga masiva')
+        parser.add_argument('--image-size', type=int, default=1024, help='Lado de las imágenes JPEG generadas')
+        parser.add_argument('--cache-hits', action='store_true', help='Repetir la misma imagen (mide la caché de análisis)')
+        parser.add_argument('--endpoint', default='', help='Usar este endpoint en lugar del servidor simulado')
+        parser.add_argument('--latency', type=float, default=0.3, help='Servidor simulado: segundos hasta el primer token')
+        parser.add_argument('--jitter', type=float, default=0.05, help='Servidor simulado: variación ± de la latencia')
+        parser.add_argument('--tokens-per-second', type=float, default=0.0, help='Servidor simulado: velocidad de generación')
+        parser.add_argument('--completion-tokens', type=int, default=80)
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Servidor simulado: fracción de requests que fallan')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-tracemalloc', action='store_true', help='No medir memoria (tracemalloc ralentiza el proceso)')
+        parser.add_argument('--output', default='', help='Guardar el resultado JSON en este archivo')
+        parser.add_argument('--baseline', default='', help='Resultado JSON anterior con el que comparar')
+        parser.add_argument('--keep-data', action='store_true', help='No borrar el usuario, productos e imágenes del benchmark')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Escenarios desconocidos: {", ".join(sorted(unknown))}')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency debe ser una lista de enteros, p. ej. 1,4,16')
+        self.options = options
+        self._image_numbers = itertools.count(1)
+
+        server = None
+        endpoint = options['endpoint']
+        if not endpoint:
+            server = MockGemmaServer(
+                latency=options['latency'],
+                jitter=options['jitter'],
+                tokens_per_second=options['tokens_per_second'],
+                completion_tokens=options['completion_tokens'],
+                error_rate=options['error_rate'],
+                seed=options['seed'],
+            ).start()
+            endpoint = server.url
+
+        media_root = None if options['keep_data'] else tempfile.mkdtemp(prefix='benchmark-media-')
+        previous_active = list(AIConfiguration.objects.filter(is_active=True).values_list('pk', flat=True))
+        tally = QueryTally()
+        try:
+            with override_settings(MEDIA_ROOT=media_root or settings.MEDIA_ROOT):
+                self.user = self.prepare(endpoint)
+                tally.attach(connection)
+                connection_created.connect(tally.attach)
+                results = []
+                for scenario in scenarios:
+                    for level in levels:
+                        self.stdout.write(f'⏱️  {scenario} · concurrencia {level}...')
+                        results.append(self.run_level(scenario, level, tally, server))
+        finally:
+            connection_created.disconnect(tally.attach)
+            if tally in connection.execute_wrappers:
+                connection.execute_wrappers.remove(tally)
+            self.restore(previous_active)
+            if server:
+                server.stop()
+            if media_root:
+                shutil.rmtree(media_root, ignore_errors=True)
+
+        report = {
+            'meta': self.meta(endpoint, server),
+            'results': results,
+            'spans': {
+                key: {field: data[field] for field in ('count', 'p50', 'p95', 'p99')}
+                for key, data in metrics.snapshot(metrics.SPAN_METRIC).items() if data['count']
+            },
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                output_file.write(output)
+            self.stdout.write(self.style.SUCCESS(f'📄 Resultado guardado en {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+        self.print_summary(results)
+        if options['baseline']:
+            self.print_comparison(results, options['baseline'])
+
+    def prepare(self, endpoint: str) -> User:
+        """
+        Usuario del benchmark y configuración de IA apuntando al endpoint
+        (se desactivan las demás mientras dura el benchmark)
+        """
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USER, defaults={'email': 'benchmark@example.com'})
+        if not Category.objects.exists():
+            Category.objects.create(name='Hogar')
+        AIConfiguration.objects.filter(is_active=True).update(is_active=False)
+        AIConfiguration.objects.update_or_create(
+            name=BENCHMARK_CONFIG,
+            defaults={'lightning_endpoint': endpoint, 'api_key': 'benchmark', 'is_active': True},
+        )
+        registry.invalidate()
+        return user
+
+    def restore(self, previous_active):
+        AIConfiguration.objects.filter(name=BENCHMARK_CONFIG).delete()
+        AIConfiguration.objects.filter(pk__in=previous_active).update(is_active=True)
+        registry.invalidate()
+        if not self.options['keep_data']:
+            User.objects.filter(username=BENCHMARK_USER).delete()
+
+    def image(self) -> SimpleUploadedFile:
+        """
+        JPEG generado; distinto en cada llamada salvo con --cache-hits
+        """
+        number = 0 if self.options['cache_hits'] else next(self._image_numbers)
+        size = self.options['image_size']
+        color = (number * 37 % 256, number * 91 % 256, number * 53 % 256)
+        buffer = io.BytesIO()
+        Image.new('RGB', (size, size), color).save(buffer, 'JPEG', quality=90)
+        return SimpleUploadedFile(f'benchmark-{number}.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def client(self) -> Client:
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    def analyze_once(self, client: Client) -> tuple:
+        image = self.image()
+        start = time.perf_counter()
+        response = client.post(reverse('ai_api:analyze_product_image_upload'), {'image': image})
+        return time.perf_counter() - start, response.status_code == 200, 1
+
+    def bulk_once(self, client: Client) -> tuple:
+        images = [self.image() for _ in range(self.options['bulk_images'])]
+        start = time.perf_counter()
+        response = client.post(reverse('api_bulk_upload_job_create'), {'images': images, 'status': 'draft'})
+        if response.status_code != 202:
+            return time.perf_counter() - start, False, len(images)
+        job_id = response.json()['job']['id']
+        status_url = reverse('api_bulk_upload_job_status', args=[job_id])
+        while True:
+            job = client.get(status_url).json()['job']
+            if job['status'] in ('completed', 'failed'):
+                break
+            time.sleep(POLL_INTERVAL)
+        ok = job['status'] == 'completed' and not BulkUploadJob.objects.get(pk=job_id).items.filter(status='failed').exists()
+        return time.perf_counter() - start, ok, len(images)
+
+    def run_level(self, scenario: str, concurrency: int, tally: QueryTally, server) -> dict:
+        if scenario == 'analyze':
+            operation, total = self.analyze_once, self.options['requests']
+        else:
+            operation, total = self.bulk_once, self.options['bulk_jobs'] or concurrency
+
+        clients = [self.client() for _ in range(concurrency)]
+        # Calentamiento: pool de conexiones al modelo, índices y cachés del proceso
+        operation(clients[0])
+        audit_logger.flush()
+
+        memory = not self.options['no_tracemalloc']
+        if memory:
+            tracemalloc.start()
+            baseline_memory = tracemalloc.get_traced_memory()[0]
+        model_calls = server.stats['requests'] if server else None
+        queries_before, writes_before = tally.read()
+        counter = itertools.count()
+
+        def worker(client: Client):
+            samples = []
+            try:
+                while next(counter) < total:
+                    samples.append(operation(client))
+            finally:
+                connection.close()
+            return samples
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark') as pool:
+            samples = [sample for worker_samples in pool.map(worker, clients) for sample in worker_samples]
+        duration = time.perf_counter() - start
+        audit_logger.flush()
+
+        queries_after, writes_after = tally.read()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        latencies = [elapsed * 1000 for elapsed, _, _ in samples]
+        items = sum(count for _, _, count in samples)
+        errors = sum(1 for _, ok, _ in samples if not ok)
+        writes = writes_after - writes_before
+        result = {
+            'scenario': scenario,
+            'concurrency': concurrency,
+            'operations': len(samples),
+            'items': items,
+            'errors': errors,
+            'duration_s': round(duration, 3),
+            'throughput_per_s': round(len(samples) / duration, 2) if duration else None,
+            'items_per_s': round(items / duration, 2) if duration else None,
+            'latency_ms': {
+                'mean': round(statistics.mean(latencies), 2) if latencies else None,
+                'p50': round(percentile(latencies, 50), 2) if latencies else None,
+                'p95': round(percentile(latencies, 95), 2) if latencies else None,
+                'p99': round(percentile(latencies, 99), 2) if latencies else None,
+                'max': round(max(latencies), 2) if latencies else None,
+            },
+            'db_queries': queries_after - queries_before,
+            'db_writes': writes,
+            'db_writes_per_item': round(writes / items, 2) if items else None,
+            'model_calls': server.stats['requests'] - model_calls if server else None,
+        }
+        if memory:
+            # El pico se reparte entre las requests que estaban en vuelo a la vez
+            result['memory_kib'] = {
+                'peak': round((peak - baseline_memory) / 1024, 1),
+                'per_request_peak': round((peak - baseline_memory) / 1024 / concurrency, 1),
+                'retained': round((current - baseline_memory) / 1024, 1),
+            }
+        return result
+
+    def meta(self, endpoint: str, server) -> dict:
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'endpoint': 'mock' if server else endpoint,
+            'mock': {
+                'latency': server.latency,
+                'jitter': server.jitter,
+                'tokens_per_second': server.tokens_per_second,
+                'completion_tokens': server.completion_tokens,
+                'error_rate': server.error_rate,
+                'stats': server.stats,
+            } if server else None,
+            'options': {
+                key: self.options[key]
+                for key in ('requests', 'bulk_jobs', 'bulk_images', 'image_size', 'cache_hits', 'seed')
+            },
+            'settings': {
+                key: getattr(settings, key, None)
+                for key in (
+                    'AI_AUDIT_MODE', 'AI_ASYNC_VIEWS', 'AI_BATCH_SCHEDULER', 'AI_STRUCTURED_OUTPUT',
+                    'AI_IMAGE_MAX_SIDE', 'AI_IMAGE_FORMAT', 'BULK_INGESTION_MAX_WORKERS',
+                )
+            },
+            'database': connection.vendor,
+        }
+
+    def print_summary(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            '\nescenario  conc  ops/s  items/s   p50 ms   p95 ms   p99 ms  errores  escrituras/item'
+        ))
+        for result in results:
+            latency = result['latency_ms']
+            self.stdout.write(
+                f'{result["scenario"]:<9} {result["concurrency"]:>5} {result["throughput_per_s"] or 0:>6} '
+                f'{result["items_per_s"] or 0:>8} {latency["p50"] or 0:>8} {latency["p95"] or 0:>8} '
+                f'{latency["p99"] or 0:>8} {result["errors"]:>8} {result["db_writes_per_item"] or 0:>16}'
+            )
+
+    def print_comparison(self, results, baseline_path: str):
+        try:
+            with open(baseline_path, encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer la línea base {baseline_path}: {e}')
+
+        previous = {(result['scenario'], result['concurrency']): result for result in baseline.get('results', [])}
+        self.stdout.write(self.style.MIGRATE_HEADING('\nComparación con la línea base (actual vs anterior)'))
+        for result in results:
+            before = previous.get((result['scenario'], result['concurrency']))
+            if not before:
+                continue
+            self.stdout.write(
+                f'{result["scenario"]:<9} {result["concurrency"]:>5}  '
+                f'items/s {self.delta(result["items_per_s"], before["items_per_s"])}  '
+                f'p95 {self.delta(result["latency_ms"]["p95"], before["latency_ms"]["p95"])}  '
+                f'escrituras/item {self.delta(result["db_writes_per_item"], before["db_writes_per_item"])}'
+            )
+
+    @staticmethod
+    def delta(current, previous) -> str:
+        if current is None or not previous:
+            return f'{current} (antes {previous})'
+        return f'{current} ({(current - previous) / previous * 100:+.1f}%)'
@@ -0,0 +1,232 @@
+"""
+Benchmark del throughput de escritura de la auditoría de IA con escritores
+concurrentes sobre la base de datos configurada (perfil de DB_ENGINE).
+
+Cada hilo imita el registro de requests de IA de generate_response en uno de
+estos modos:
+
+- legacy: crear el AIRequest como 'pending' y guardarlo dos veces más
+  (tres escrituras por request, el patrón anterior a AI_API.audit)
+- sync: AIRequestAuditLogger en modo 'sync' (un INSERT por request)
+- buffered: AIRequestAuditLogger en modo 'buffered' (bulk_create por lotes)
+
+Para comparar perfiles se ejecuta con distintas variables de entorno y se pasa
+el JSON anterior con --baseline, p. ej. SQLite sin ajustar frente a WAL:
+
+    SQLITE_JOURNAL_MODE=DELETE SQLITE_SYNCHRONOUS=FULL SQLITE_TRANSACTION_MODE=DEFERRED \\
+        python manage.py benchmark_db_writes --output rollback.json
+    python manage.py benchmark_db_writes --baseline rollback.json
+"""
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from AI_API.audit import AIRequestAuditLogger
+from AI_API.models import AIRequest
+
+MODES = ('legacy', 'sync', 'buffered')
+# Marca de las filas del benchmark, que se borran al terminar
+BENCHMARK_MODEL = 'benchmark/db-writes'
+RESPONSE_TEXT = (
+    '{"title": "Lámpara de escritorio", "description": "Lámpara LED regulable con brazo articulado", '
+    '"suggested_category": "Hogar", "tags": "lampara, led", "price_suggestion": "$25.99 USD"}'
+)
+
+
+def percentile(values, percent: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def database_profile() -> dict:
+    """
+    Motor y ajustes efectivos de la conexión actual
+    """
+    profile = {
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+        'conn_health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+    }
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                cursor.execute(f'PRAGMA {pragma}')
+                profile[pragma] = cursor.fetchone()[0]
+        profile['transaction_mode'] = connection.settings_dict['OPTIONS'].get('transaction_mode')
+    else:
+        profile['pool'] = bool(connection.settings_dict['OPTIONS'].get('pool'))
+    return profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide escrituras por segundo y errores "database is locked" de la auditoría '
+        'de IA con escritores concurrentes en la base de datos configurada'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help='Modos separados por comas: legacy, sync, buffered')
+        parser.add_argument('--concurrency', default='1,8,32', help='Hilos escritores, separados por comas')
+        parser.add_argument('--requests', type=int, default=500, help='Requests de IA registradas por nivel')
+        parser.add_argument('--batch-size', type=int, default=50, help='Lote del modo buffered')
+        parser.add_argument('--output', default='', help='Guardar el resultado JSON en este archivo')
+        parser.add_argument('--baseline', default='', help='Resultado JSON anterior con el que comparar')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Modos desconocidos: {", ".join(sorted(unknown))}')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency debe ser una lista de enteros, p. ej. 1,8,32')
+
+        profile = database_profile()
+        self.stdout.write(f'🗄️  Perfil: {profile}')
+        results = []
+        try:
+            for mode in modes:
+                for level in levels:
+                    self.stdout.write(f'⏱️  {mode} · {level} escritores...')
+                    results.append(self.run_level(mode, level, options))
+        finally:
+            AIRequest.objects.filter(model_name=BENCHMARK_MODEL).delete()
+
+        report = {'profile': profile, 'requests': options['requests'], 'results': results}
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'📄 Resultado guardado en {options["output"]}'))
+        self.print_summary(results)
+        if options['baseline']:
+            self.print_comparison(results, options['baseline'])
+
+    @staticmethod
+    def new_request(number: int) -> AIRequest:
+        return AIRequest(
+            request_type='image_analysis',
+            status='pending',
+            prompt=f'Analiza la imagen {number}',
+            image_urls=[f'sha256:{number:064x}'],
+            model_name=BENCHMARK_MODEL,
+        )
+
+    @staticmethod
+    def complete(ai_request: AIRequest):
+        ai_request.status = 'completed'
+        ai_request.response_text = RESPONSE_TEXT
+        ai_request.response_tokens = 42
+        ai_request.processing_time = 0.3
+
+    def log_legacy(self, number: int):
+        ai_request = self.new_request(number)
+        ai_request.save()
+        ai_request.status = 'processing'
+        ai_request.save()
+        self.complete(ai_request)
+        ai_request.save()
+
+    def run_level(self, mode: str, concurrency: int, options) -> dict:
+        total = options['requests']
+        logger = AIRequestAuditLogger(
+            mode='buffered' if mode == 'buffered' else 'sync',
+            batch_size=options['batch_size'],
+            flush_interval=0.05,
+        )
+        before = AIRequest.objects.filter(model_name=BENCHMARK_MODEL).count()
+        numbers = iter(range(total))
+        numbers_lock = threading.Lock()
+        errors = []
+
+        def log_one(number: int):
+            if mode == 'legacy':
+                self.log_legacy(number)
+            else:
+                ai_request = self.new_request(number)
+                self.complete(ai_request)
+                logger.log(ai_request)
+
+        def worker():
+            latencies = []
+            try:
+                while True:
+                    with numbers_lock:
+                        number = next(numbers, None)
+                    if number is None:
+                        return latencies
+                    start = time.perf_counter()
+                    try:
+                        log_one(number)
+                    except DatabaseError as e:
+                        errors.append(str(e))
+                    latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='db-writer') as pool:
+            futures = [pool.submit(worker) for _ in range(concurrency)]
+            latencies = [latency for future in futures for latency in future.result()]
+        # El modo buffered no termina hasta que todo está en la base de datos
+        logger.flush()
+        duration = time.perf_counter() - start
+
+        stored = AIRequest.objects.filter(model_name=BENCHMARK_MODEL).count() - before
+        return {
+            'mode': mode,
+            'concurrency': concurrency,
+            'requests': total,
+            'stored': stored,
+            'lost': total - stored,
+            'errors': len(errors),
+            'locked_errors': sum(1 for error in errors if 'locked' in error),
+            'duration_s': round(duration, 3),
+            'requests_per_s': round(stored / duration, 1) if duration else None,
+            'log_latency_ms': {
+                'mean': round(statistics.mean(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3),
+            },
+        }
+
+    def print_summary(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            '\nmodo      hilos   req/s   p50 ms   p95 ms   p99 ms  perdidas  locked'
+        ))
+        for result in results:
+            latency = result['log_latency_ms']
+            self.stdout.write(
+                f'{result["mode"]:<9} {result["concurrency"]:>5} {result["requests_per_s"] or 0:>7} '
+                f'{latency["p50"]:>8} {latency["p95"]:>8} {latency["p99"]:>8} '
+                f'{result["lost"]:>9} {result["locked_errors"]:>7}'
+            )
+
+    def print_comparison(self, results, baseline_path: str):
+        try:
+            with open(baseline_path, encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer la línea base {baseline_path}: {e}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nComparación con la línea base ({baseline.get("profile", {}).get("journal_mode", baseline.get("profile", {}).get("vendor"))})'
+        ))
+        previous = {(result['mode'], result['concurrency']): result for result in baseline.get('results', [])}
+        for result in results:
+            before = previous.get((result['mode'], result['concurrency']))
+            if not before or not before['requests_per_s']:
+                continue
+            change = (result['requests_per_s'] - before['requests_per_s']) / before['requests_per_s'] * 100
+            self.stdout.write(
+                f'{result["mode"]:<9} {result["concurrency"]:>5}  req/s {result["requests_per_s"]} '
+                f'(antes {before["requests_per_s"]}, {change:+.1f}%)  '
+                f'locked {result["locked_errors"]} (antes {before["locked_errors"]})'
+            )
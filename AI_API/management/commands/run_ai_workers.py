@@ -0,0 +1,70 @@
+"""
+Comando para ejecutar los workers de la cola de tareas de IA (AI_API.tasks).
+
+Cada worker es un hilo que toma tareas con un lease en la base de datos, así
+que se pueden lanzar varios procesos (o máquinas) contra la misma base de
+datos. SIGINT/SIGTERM terminan la tarea en curso y salen.
+"""
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from AI_API import tasks
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta workers que procesan la cola de tareas de IA guardada en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Hilos worker (inferencias concurrentes)')
+        parser.add_argument('--poll-interval', type=float, default=tasks.POLL_INTERVAL,
+                            help='Segundos de espera con la cola vacía')
+        parser.add_argument('--drain', action='store_true', help='Salir cuando la cola quede vacía')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers debe ser al menos 1')
+
+        stop_event = threading.Event()
+        output_lock = threading.Lock()
+
+        def report(worker, ai_request, status):
+            with output_lock:
+                self.stdout.write(
+                    f'   [{worker.worker_id}] {ai_request.task} #{ai_request.pk} '
+                    f'(intento {ai_request.attempts}) -> {status}'
+                )
+
+        def stop(signum, frame):
+            self.stdout.write('⏹️  Deteniendo workers al terminar las tareas en curso...')
+            stop_event.set()
+
+        previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        workers = [
+            tasks.Worker(tasks.default_worker_id(index), stop_event, options['poll_interval'], on_task=report)
+            for index in range(options['workers'])
+        ]
+        threads = [
+            threading.Thread(target=worker.run, kwargs={'drain': options['drain']},
+                             name=f'ai-worker-{index}', daemon=True)
+            for index, worker in enumerate(workers)
+        ]
+        self.stdout.write(self.style.SUCCESS(f'🧵 {len(workers)} workers de IA en marcha'))
+        start = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            # join con timeout para que la señal llegue al hilo principal
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+        processed = sum(worker.processed for worker in workers)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {processed} tareas procesadas en {time.perf_counter() - start:.1f} s'
+        ))
@@ -0,0 +1,46 @@
+"""
+Comando para lanzar el servidor OpenAI-compatible de benchmark (AI_API.mock_server)
+"""
+from django.core.management.base import BaseCommand
+
+from AI_API.mock_server import MockGemmaServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Lanza un servidor local que imita el endpoint de Gemma 3 con latencia, '
+        'velocidad de generación y tasa de errores configurables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.3, help='Segundos hasta el primer token')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Variación uniforme ± de la latencia')
+        parser.add_argument('--tokens-per-second', type=float, default=0.0, help='Velocidad de generación (0 = instantánea)')
+        parser.add_argument('--completion-tokens', type=int, default=80)
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de requests que fallan')
+        parser.add_argument('--error-status', type=int, default=503)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        server = MockGemmaServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            tokens_per_second=options['tokens_per_second'],
+            completion_tokens=options['completion_tokens'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'🤖 Servidor de Gemma simulado en {server.url}'))
+        self.stdout.write('Usar como lightning_endpoint de un AIConfiguration activo. Ctrl+C para salir.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(f'Requests atendidas: {server.stats}')
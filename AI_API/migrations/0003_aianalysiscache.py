@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_API', '0002_remove_productaigeneration_ai_request_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIAnalysisCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 de imágenes, versión del prompt y modelo', max_length=64, unique=True)),
+                ('data', models.JSONField(default=dict, help_text='JSON parseado devuelto por el modelo')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'AI Analysis Cache',
+                'verbose_name_plural': 'AI Analysis Cache',
+            },
+        ),
+    ]
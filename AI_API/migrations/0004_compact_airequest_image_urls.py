@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:35
+
+import base64
+import binascii
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import migrations, models
+
+BLOB_DIRECTORY = getattr(settings, 'AI_BLOB_DIRECTORY', 'ai_blobs')
+# Almacén privado (fuera de MEDIA_ROOT), como AI_API.blobs
+blob_storage = FileSystemStorage(
+    location=getattr(settings, 'AI_BLOB_ROOT', os.path.join(settings.BASE_DIR, 'private_media')),
+    base_url=None, allow_overwrite=True,
+)
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+# Filas cargadas a la vez: cada una puede llevar varios MB de base64
+BATCH_SIZE = 20
+
+
+def _store_image_url(image_url):
+    """
+    Copia congelada de AI_API.blobs.store_image_url para que la migración no
+    dependa del código actual de la app
+    """
+    if not isinstance(image_url, str) or not image_url.startswith('data:') or ';base64,' not in image_url:
+        return image_url
+    header, encoded = image_url[5:].split(';base64,', 1)
+    try:
+        content = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return image_url
+
+    digest = hashlib.sha256(content).hexdigest()
+    name = f"{digest}.{EXTENSIONS.get(header or 'image/jpeg', 'bin')}"
+    path = f'{BLOB_DIRECTORY}/{name[:2]}/{name}'
+    if not blob_storage.exists(path):
+        blob_storage.save(path, ContentFile(content))
+    return f'sha256:{name}'
+
+
+def compact_image_urls(apps, schema_editor):
+    """
+    Mueve las data URLs guardadas en AIRequest.image_urls al almacén de blobs
+    y deja solo las referencias por contenido.
+
+    Primero se leen solo los ids y después cada lote pequeño por separado: no
+    queda un cursor abierto sobre la tabla mientras se actualiza (inseguro en
+    SQLite) ni se cargan cientos de MB de base64 de una vez
+    """
+    AIRequest = apps.get_model('AI_API', 'AIRequest')
+    pks = list(AIRequest.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), BATCH_SIZE):
+        batch = AIRequest.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).only('id', 'image_urls')
+        for ai_request in list(batch):
+            refs = [_store_image_url(image_url) for image_url in ai_request.image_urls or []]
+            if refs != ai_request.image_urls:
+                AIRequest.objects.filter(pk=ai_request.pk).update(image_urls=refs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_API', '0003_aianalysiscache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='airequest',
+            name='image_urls',
+            field=models.JSONField(blank=True, default=list, help_text='Referencias sha256 (almacén de blobs) o URLs de las imágenes enviadas'),
+        ),
+        migrations.RunPython(compact_image_urls, migrations.RunPython.noop),
+    ]
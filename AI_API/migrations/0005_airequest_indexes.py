@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_API', '0004_compact_airequest_image_urls'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airequest',
+            index=models.Index(fields=['-created_at'], name='airequest_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='airequest',
+            index=models.Index(fields=['status', '-created_at'], name='airequest_status_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='airequest',
+            index=models.Index(fields=['request_type', '-created_at'], name='airequest_type_recent_idx'),
+        ),
+    ]
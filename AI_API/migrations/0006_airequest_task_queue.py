@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AI_API', '0005_airequest_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airequest',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='leased_by',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='result',
+            field=models.JSONField(blank=True, help_text='Resultado de la tarea', null=True),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='run_after',
+            field=models.DateTimeField(blank=True, help_text='No ejecutar antes de esta fecha (reintentos)', null=True),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='task',
+            field=models.CharField(blank=True, default='', help_text='Tarea en segundo plano que ejecuta un worker', max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='airequest',
+            index=models.Index(condition=models.Q(('task', ''), _negated=True), fields=['status', 'run_after'], name='airequest_task_queue_idx'),
+        ),
+    ]
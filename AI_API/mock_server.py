@@ -0,0 +1,202 @@
+"""
+Servidor local OpenAI-compatible que imita al endpoint de Gemma 3 para
+benchmarks y pruebas de carga sin depender de Lightning AI.
+
+Simula la latencia de inferencia (tiempo hasta el primer token más una
+generación a tokens_per_second), una tasa de errores configurable y las
+respuestas en streaming (SSE). Devuelve siempre un análisis de producto en el
+formato que espera ProductAIService.
+
+    server = MockGemmaServer(latency=0.3, tokens_per_second=120).start()
+    ... AIConfiguration(lightning_endpoint=server.url) ...
+    server.stop()
+
+También se puede lanzar como proceso aparte con "manage.py run_mock_gemma".
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+STREAM_CHUNK_TOKENS = 4
+# Aproximación de tokens por carácter para los usage de la respuesta
+CHARS_PER_TOKEN = 4
+
+
+class MockGemmaServer:
+    """
+    Servidor HTTP en un hilo de fondo. Cada request se atiende en su propio hilo
+    (como un servidor de inferencia con batching continuo)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.3,
+                 jitter: float = 0.0, tokens_per_second: float = 0.0, completion_tokens: int = 80,
+                 error_rate: float = 0.0, error_status: int = 503, category: str = 'Hogar',
+                 seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.category = category
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'completions': 0, 'streams': 0, 'errors': 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'MockGemmaServer':
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name='mock-gemma-server', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'MockGemmaServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _draw(self) -> tuple:
+        """
+        Retardo hasta el primer token y si esta request debe fallar
+        """
+        with self._lock:
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            failed = self._random.random() < self.error_rate
+        return max(0.0, delay), failed
+
+    def generation_time(self) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return self.completion_tokens / self.tokens_per_second
+
+    def completion_text(self, number: int) -> str:
+        return json.dumps({
+            'title': f'Producto de prueba {number}',
+            'description': 'Descripción generada por el servidor de benchmark. ' * 2,
+            'suggested_category': self.category,
+            'tags': 'benchmark, prueba, mock',
+            'price_suggestion': '$25.99 USD',
+        }, ensure_ascii=False)
+
+    def usage(self, payload: Dict[str, Any]) -> Dict[str, int]:
+        prompt_tokens = len(json.dumps(payload.get('messages', ''))) // CHARS_PER_TOKEN
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': prompt_tokens + self.completion_tokens,
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                # El cliente puede abandonar la request (hedging, timeouts): no es un error del servidor
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, status: int, body: Dict[str, Any]):
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                # Sonda de salud (Gemma3Service.health_check) y listado de modelos
+                if self.path.startswith('/v1/models'):
+                    self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model'}]})
+                else:
+                    self._send_json(200, {'status': 'ok'})
+
+            def do_POST(self):
+                if not self.path.startswith('/v1/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'Not found'}})
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+                    return
+
+                server._count('requests')
+                delay, failed = server._draw()
+                time.sleep(delay)
+                if failed:
+                    server._count('errors')
+                    self._send_json(server.error_status, {'error': {'message': 'Simulated failure'}})
+                    return
+
+                number = server.stats['requests']
+                if payload.get('stream'):
+                    server._count('streams')
+                    self._stream(payload, server.completion_text(number))
+                else:
+                    server._count('completions')
+                    time.sleep(server.generation_time())
+                    self._send_json(200, {
+                        'id': f'chatcmpl-mock-{number}',
+                        'object': 'chat.completion',
+                        'model': payload.get('model', 'mock'),
+                        'choices': [{
+                            'index': 0,
+                            'message': {'role': 'assistant', 'content': server.completion_text(number)},
+                            'finish_reason': 'stop',
+                        }],
+                        'usage': server.usage(payload),
+                    })
+
+            def _stream(self, payload: Dict[str, Any], text: str):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+
+                chunks = max(1, server.completion_tokens // STREAM_CHUNK_TOKENS)
+                size = max(1, -(-len(text) // chunks))
+                pause = server.generation_time() / chunks
+                for start in range(0, len(text), size):
+                    event = {'choices': [{'index': 0, 'delta': {'content': text[start:start + size]}}]}
+                    self.wfile.write(f'data: {json.dumps(event)}\n\n'.encode())
+                    self.wfile.flush()
+                    if pause:
+                        time.sleep(pause)
+                final = {'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                         'usage': server.usage(payload)}
+                self.wfile.write(f'data: {json.dumps(final)}\n\ndata: [DONE]\n\n'.encode())
+                self.wfile.flush()
+
+        return Handler
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class AIRequest(models.Model):
@@ -26,7 +27,7 @@ class AIRequest(models.Model):
     
     # Datos de entrada
     prompt = models.TextField(help_text="Prompt o texto enviado al modelo")
-    image_urls = models.JSONField(default=list, blank=True, help_text="URLs de imágenes enviadas")
+    image_urls = models.JSONField(default=list, blank=True, help_text="Referencias sha256 (almacén de blobs) o URLs de las imágenes enviadas")
     model_name = models.CharField(max_length=100, default='google/gemma-3-4b-it')
     max_tokens = models.IntegerField(default=256)
     temperature = models.FloatField(default=0.7)
@@ -41,10 +42,28 @@ class AIRequest(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     error_message = models.TextField(blank=True, null=True)
     
+    # Cola de tareas (AI_API.tasks): vacío en los registros de auditoría
+    task = models.CharField(max_length=30, blank=True, default='', help_text="Tarea en segundo plano que ejecuta un worker")
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(null=True, blank=True, help_text="No ejecutar antes de esta fecha (reintentos)")
+    leased_by = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True, help_text="Resultado de la tarea")
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'AI Request'
         verbose_name_plural = 'AI Requests'
+        # Listado del admin: orden por fecha y filtros por estado / tipo
+        indexes = [
+            models.Index(fields=['-created_at'], name='airequest_recent_idx'),
+            models.Index(fields=['status', '-created_at'], name='airequest_status_recent_idx'),
+            models.Index(fields=['request_type', '-created_at'], name='airequest_type_recent_idx'),
+            # Solo las filas de la cola: el índice no crece con la auditoría
+            models.Index(
+                fields=['status', 'run_after'], name='airequest_task_queue_idx', condition=~models.Q(task='')
+            ),
+        ]
     
     def __str__(self):
         return f"AI Request {self.id} - {self.request_type} - {self.status}"
@@ -81,3 +100,21 @@ class AIConfiguration(models.Model):
     def __str__(self):
         return f"AI Config: {self.name} - {'Active' if self.is_active else 'Inactive'}"
 
+
+
+class AIAnalysisCache(models.Model):
+    """
+    Resultados de análisis de producto cacheados por contenido
+    (hash de imágenes + versión del prompt + modelo)
+    """
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 de imágenes, versión del prompt y modelo")
+    data = models.JSONField(default=dict, help_text="JSON parseado devuelto por el modelo")
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = 'AI Analysis Cache'
+        verbose_name_plural = 'AI Analysis Cache'
+    
+    def __str__(self):
+        return f"AI Analysis Cache {self.key[:12]}"
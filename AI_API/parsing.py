@@ -0,0 +1,296 @@
+"""
+Decodificación estructurada de las respuestas de análisis de producto.
+
+- product_analysis_response_format: el 'response_format' (JSON schema) que se
+  envía al endpoint OpenAI-compatible con AI_STRUCTURED_OUTPUT activo, con las
+  categorías reales de la tienda como enum
+- IncrementalJSONParser: recibe el texto por fragmentos (streaming o respuesta
+  completa), ignora la prosa y las vallas ``` alrededor del objeto (prefiere
+  el contenido de la valla y, si una llave de la prosa no abre un JSON válido,
+  vuelve a empezar en la siguiente),
+  tolera comas finales y repara una salida truncada cerrando la cadena y los
+  contenedores abiertos
+- ProductAnalysis: resultado tipado y validado del análisis
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+class AnalysisParseError(ValueError):
+    """
+    La respuesta del modelo no contiene un análisis de producto utilizable
+    """
+
+
+def product_analysis_schema(category_names: List[str] = None) -> Dict[str, Any]:
+    category = {'type': 'string'}
+    if category_names:
+        category['enum'] = list(category_names)
+    return {
+        'type': 'object',
+        'properties': {
+            'title': {'type': 'string'},
+            'description': {'type': 'string'},
+            'suggested_category': category,
+            'tags': {'type': 'string'},
+            'price_suggestion': {'type': 'string'},
+        },
+        'required': ['title', 'description', 'suggested_category', 'tags', 'price_suggestion'],
+        'additionalProperties': False,
+    }
+
+
+def product_analysis_response_format(category_names: List[str] = None) -> Dict[str, Any]:
+    """
+    response_format de chat completions con el schema del análisis
+    """
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': 'product_analysis',
+            'schema': product_analysis_schema(category_names),
+            'strict': True,
+        },
+    }
+
+
+# Valla ```json (o ``` sin lenguaje) que abre un objeto
+FENCE_PATTERN = re.compile(r'```(?:json)?[ \t]*\r?\n?(?=\s*\{)', re.IGNORECASE)
+FENCE_END_PATTERN = re.compile(r'```(?:json)?\s*$', re.IGNORECASE)
+
+
+class IncrementalJSONParser:
+    """
+    Sigue la estructura de un objeto JSON carácter a carácter a medida que llega
+    el texto (coste lineal salvo cuando un candidato resulta ser prosa y se
+    reanaliza desde el siguiente '{') y puede devolver en cualquier momento el
+    valor reparado de lo recibido hasta entonces
+    """
+
+    # Fuera de las cadenas solo pueden aparecer estos caracteres en un escalar
+    # (números, true, false, null): cualquier otro indica que el candidato era prosa
+    SCALAR_CHARS = frozenset('0123456789+-.eEtrufalsn')
+
+    def __init__(self):
+        self.text = ''
+        # Posición del siguiente carácter a procesar y del '{' del candidato actual
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._fenced = False
+        self._reset()
+
+    def _reset(self):
+        self._out: List[str] = []
+        self._stack: List[List[str]] = []    # [tipo de contenedor, estado]
+        self._started = False
+        self.complete = False
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._scalar = False
+        self._last_comma: Optional[int] = None
+        # Último punto en el que cortar y cerrar da un JSON válido
+        self._safe_end = 0
+        self._safe_closers = ''
+
+    def feed(self, delta: str) -> 'IncrementalJSONParser':
+        self.text += delta
+        while True:
+            while self._pos < len(self.text) and not self.complete:
+                char = self.text[self._pos]
+                self._pos += 1
+                if self._consume(char) is False:
+                    self._restart()
+                elif self.complete and not self._decodes():
+                    self._restart()
+            # Un objeto dentro de una valla ```json tiene preferencia sobre
+            # las llaves que aparecieron antes en la prosa
+            fence = FENCE_PATTERN.search(self.text, self._pos) if self.complete and not self._fenced else None
+            if not fence:
+                return self
+            self._pos = fence.end()
+            self._start = None
+            self._reset()
+
+    def _decodes(self) -> bool:
+        try:
+            json.loads(''.join(self._out), strict=False)
+        except ValueError:
+            return False
+        return True
+
+    def _restart(self):
+        """
+        El candidato actual no es JSON (prosa con llaves, "{el modelo}"...):
+        se descarta y se vuelve a buscar a partir del siguiente '{'
+        """
+        self._pos = self._start + 1
+        self._start = None
+        self._reset()
+
+    def _consume(self, char: str) -> Optional[bool]:
+        """
+        Procesa un carácter; devuelve False si el candidato deja de poder ser JSON
+        """
+        if not self._started:
+            if char != '{':
+                return None    # prosa o ```json antes del objeto
+            self._started = True
+            self._start = self._pos - 1
+            self._fenced = bool(FENCE_END_PATTERN.search(self.text, 0, self._start))
+
+        if self._in_string:
+            self._out.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self._stack[-1][1] = 'colon'
+                else:
+                    self._value_done()
+            return None
+
+        if self._scalar and (char in ',}] \t\r\n'):
+            self._scalar = False
+            self._value_done()
+
+        if char in ' \t\r\n':
+            self._out.append(char)
+            return None
+
+        if char in '{[':
+            self._append(char)
+            self._stack.append(['{' if char == '{' else '[', 'key' if char == '{' else 'value'])
+            self._mark_safe()
+        elif char in '}]':
+            if self._last_comma is not None:
+                # Coma final antes del cierre: {"a": 1,}
+                del self._out[self._last_comma]
+                self._last_comma = None
+            self._out.append(char)
+            self._stack.pop()
+            if not self._stack:
+                self.complete = True
+            self._value_done()
+        elif char == '"':
+            self._append(char)
+            self._in_string = True
+            self._string_is_key = bool(self._stack) and self._stack[-1] == ['{', 'key']
+        elif char == ':':
+            self._append(char)
+            if self._stack:
+                self._stack[-1][1] = 'value'
+        elif char == ',':
+            self._append(char)
+            self._last_comma = len(self._out) - 1
+            if self._stack:
+                self._stack[-1][1] = 'key' if self._stack[-1][0] == '{' else 'value'
+        elif char in self.SCALAR_CHARS:
+            # Número, true, false o null en curso
+            self._append(char)
+            self._scalar = True
+        else:
+            return False
+        return None
+
+    def _append(self, char: str):
+        self._last_comma = None
+        self._out.append(char)
+
+    def _closers(self) -> str:
+        return ''.join('}' if kind == '{' else ']' for kind, _ in reversed(self._stack))
+
+    def _mark_safe(self):
+        self._safe_end = len(self._out)
+        self._safe_closers = self._closers()
+
+    def _value_done(self):
+        if self._stack:
+            self._stack[-1][1] = 'after_value'
+        self._mark_safe()
+
+    def repaired_text(self) -> Optional[str]:
+        """
+        Texto JSON válido (o candidato) con lo recibido hasta ahora
+        """
+        if not self._started:
+            return None
+        if self.complete:
+            return ''.join(self._out)
+        if self._in_string and not self._string_is_key:
+            # Valor de texto a medias: cerrarlo para ver el valor parcial
+            body = ''.join(self._out)
+            if self._escape:
+                body = body[:-1]
+            return body + '"' + self._closers()
+        return ''.join(self._out[:self._safe_end]) + self._safe_closers
+
+    def value(self) -> Optional[Any]:
+        """
+        Valor decodificado de lo recibido hasta ahora, o None si aún no hay nada
+        """
+        text = self.repaired_text()
+        if text is None:
+            return None
+        closers = len(self._closers()) + 1 if (self._in_string and not self.complete) else 0
+        # Un escape \\uXXXX cortado a la mitad: recortar hasta 6 caracteres antes de la comilla
+        for cut in range(0, 7 if closers else 1):
+            candidate = text if not cut else text[:len(text) - closers - cut] + text[len(text) - closers:]
+            try:
+                return json.loads(candidate, strict=False)
+            except ValueError:
+                continue
+        return None
+
+
+class ProductAnalysis:
+    """
+    Análisis de producto validado. repaired indica que la salida del modelo
+    estaba truncada o mal formada y se reparó
+    """
+
+    FIELDS = ('title', 'description', 'suggested_category', 'tags', 'price_suggestion')
+
+    def __init__(self, title: str, description: str, suggested_category: str = '',
+                 tags: str = '', price_suggestion: str = '', repaired: bool = False):
+        self.title = title
+        self.description = description
+        self.suggested_category = suggested_category
+        self.tags = tags
+        self.price_suggestion = price_suggestion
+        self.repaired = repaired
+
+    @staticmethod
+    def _text(value) -> str:
+        if value is None:
+            return ''
+        if isinstance(value, list):
+            return ', '.join(str(item).strip() for item in value if str(item).strip())
+        return str(value).strip()
+
+    @classmethod
+    def from_dict(cls, data: Any, repaired: bool = False) -> 'ProductAnalysis':
+        if not isinstance(data, dict):
+            raise AnalysisParseError('La respuesta no es un objeto JSON')
+        values = {field: cls._text(data.get(field)) for field in cls.FIELDS}
+        if not values['title'] or not values['description']:
+            raise AnalysisParseError('Faltan el título o la descripción del producto')
+        return cls(repaired=repaired, **values)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def parse_product_analysis(text: str) -> ProductAnalysis:
+    """
+    ProductAnalysis a partir del texto completo generado por el modelo
+    """
+    parser = IncrementalJSONParser().feed(text or '')
+    data = parser.value()
+    if data is None:
+        raise AnalysisParseError('No se encontró JSON en la respuesta del modelo')
+    return ProductAnalysis.from_dict(data, repaired=not parser.complete)
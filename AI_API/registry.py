@@ -0,0 +1,148 @@
+"""
+Registro de servicios de IA compartidos por el proceso.
+
+Construir un Gemma3Service consulta la configuración activa y abre una nueva
+requests.Session (con su handshake TCP/TLS). El registro mantiene un único
+EndpointPool caliente por proceso, con un Gemma3Service por cada
+AIConfiguration activo (ver AI_API.balancer), y lo reconstruye solo cuando
+cambia un AIConfiguration: las señales post_save/post_delete incrementan la
+versión y, como red de seguridad para cambios hechos desde otros procesos, cada
+AI_CONFIG_MAX_AGE segundos se compara la huella de los AIConfiguration activos
+(id y updated_at) con la del pool. Sin cambios el pool se conserva con sus
+latencias EWMA, sus sesiones keep-alive y su sonda de salud.
+"""
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .balancer import HEALTH_PROBE_INTERVAL, EndpointPool
+from .models import AIConfiguration
+from .scheduler import (
+    BATCH_MAX_IN_FLIGHT, BATCH_MAX_QUEUE, BATCH_MAX_SIZE, BATCH_MAX_WAIT, BatchScheduler
+)
+from .services import ProductAIService
+
+CONFIG_MAX_AGE = getattr(settings, 'AI_CONFIG_MAX_AGE', 300)
+BATCH_SCHEDULER = getattr(settings, 'AI_BATCH_SCHEDULER', False)
+
+_lock = threading.Lock()
+_version = 0
+_service = None
+_service_version = None
+_service_fingerprint = None
+_checked_at = 0.0
+_scheduler = None
+
+
+def invalidate(**kwargs):
+    """
+    Marca la configuración cacheada como obsoleta. Se conecta a las señales de
+    AIConfiguration, por eso acepta sus argumentos
+    """
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _config_fingerprint() -> tuple:
+    return tuple(
+        AIConfiguration.objects.filter(is_active=True).order_by('id').values_list('id', 'updated_at')
+    )
+
+
+def _invalidate_if_changed_elsewhere():
+    """
+    Red de seguridad para cambios hechos desde otros procesos (sin señal aquí)
+    """
+    global _checked_at
+    _checked_at = time.monotonic()
+    if _config_fingerprint() != _service_fingerprint:
+        invalidate()
+
+
+def get_gemma_service() -> EndpointPool:
+    """
+    Pool de endpoints compartido (misma interfaz que Gemma3Service),
+    reconstruido solo si la configuración cambió
+    """
+    global _service, _service_version, _service_fingerprint, _checked_at
+    if _service is not None and time.monotonic() - _checked_at >= CONFIG_MAX_AGE:
+        _invalidate_if_changed_elsewhere()
+    service = _service
+    if service is not None and _service_version == _version:
+        return service
+
+    with _lock:
+        if _service is None or _service_version != _version:
+            version = _version
+            if _service is not None:
+                # Solo detiene la sonda: las llamadas en curso siguen con sus sesiones
+                _service.close()
+            _service = EndpointPool.from_active_configs()
+            _service_fingerprint = _config_fingerprint()
+            _service.start_probing(HEALTH_PROBE_INTERVAL)
+            _service_version = version
+            _checked_at = time.monotonic()
+        return _service
+
+
+def get_active_config() -> AIConfiguration:
+    return get_gemma_service().choose().config
+
+
+def get_scheduler() -> BatchScheduler:
+    """
+    Planificador de micro-lotes compartido; despacha sobre el pool vigente
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _lock:
+            if _scheduler is None:
+                _scheduler = BatchScheduler(
+                    get_gemma_service,
+                    max_batch_size=BATCH_MAX_SIZE,
+                    max_wait=BATCH_MAX_WAIT,
+                    max_in_flight=BATCH_MAX_IN_FLIGHT,
+                    max_queue=BATCH_MAX_QUEUE,
+                )
+    return _scheduler
+
+
+def get_product_ai_service() -> ProductAIService:
+    if BATCH_SCHEDULER:
+        return ProductAIService(gemma_service=get_scheduler())
+    return ProductAIService(gemma_service=get_gemma_service())
+
+
+def warm_up(connect: bool = True):
+    """
+    Carga la configuración activa y, opcionalmente, abre la conexión keep-alive
+    con el endpoint para que la primera request no pague el handshake
+    """
+    try:
+        service = get_gemma_service()
+        if connect:
+            service.health_check()
+    except DatabaseError:
+        # Tablas aún no migradas (p. ej. durante migrate): se cargará en el primer uso
+        pass
+    finally:
+        connection.close()
+
+
+def warm_up_in_background(connect: bool = True, timeout: float = 30.0):
+    """
+    Hook para AppConfig.ready(): espera a que el registro de apps termine de
+    cargarse (no se deben hacer consultas durante ready()) y calienta el servicio
+    en un hilo aparte
+    """
+    def _run():
+        deadline = time.monotonic() + timeout
+        while not apps.ready and time.monotonic() < deadline:
+            time.sleep(0.05)
+        warm_up(connect=connect)
+
+    threading.Thread(target=_run, name='ai-service-warm-up', daemon=True).start()
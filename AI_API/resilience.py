@@ -0,0 +1,510 @@
+"""
+Capa de resiliencia alrededor de las llamadas HTTP al endpoint de Lightning AI.
+
+- CircuitBreaker: abre el circuito cuando la tasa de error reciente supera
+  AI_BREAKER_FAILURE_RATE (un health_check fallido cuenta como un fallo más en
+  la ventana) y rechaza las llamadas al instante durante AI_BREAKER_RESET_TIMEOUT
+  segundos, en lugar de esperar timeout_seconds en cada una. Después deja pasar
+  una request de prueba (half-open) para decidir si vuelve a cerrarse.
+- RetryPolicy: reintentos con backoff exponencial y jitter completo solo cuando
+  la request no llegó a generar nada: errores al conectar (incluido el timeout
+  de conexión) y respuestas 429/502/503/504. Un read timeout no se reintenta:
+  el modelo pudo estar generando y repetirlo retendría el worker otra vez
+  timeout_seconds. Todos los intentos comparten un deadline (AI_RETRY_DEADLINE,
+  por defecto el read timeout de la llamada) y cada uno recorta su timeout a lo
+  que queda.
+- El circuit breaker cuenta como fallo cualquier error de transporte y toda
+  respuesta 429 o 5xx; solo una respuesta por debajo de 500 cuenta como éxito.
+- Hedging opcional: si la respuesta tarda más que el percentil
+  AI_HEDGE_PERCENTILE de las latencias recientes, se lanza una segunda request
+  idéntica y se usa la primera que responda. Las requests con hedging corren en
+  un pool propio de AI_HEDGE_MAX_WORKERS hilos, y el plazo del hedge empieza a
+  contar cuando la primera request sale del pool, no mientras espera en él.
+
+El estado se guarda por endpoint a nivel de módulo, así que sobrevive a la
+reconstrucción de los servicios (ver AI_API.registry).
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+import httpx
+import requests
+from django.conf import settings
+
+BREAKER_FAILURE_RATE = getattr(settings, 'AI_BREAKER_FAILURE_RATE', 0.5)
+BREAKER_WINDOW = getattr(settings, 'AI_BREAKER_WINDOW', 20)
+BREAKER_MIN_REQUESTS = getattr(settings, 'AI_BREAKER_MIN_REQUESTS', 5)
+BREAKER_RESET_TIMEOUT = getattr(settings, 'AI_BREAKER_RESET_TIMEOUT', 30.0)
+
+RETRY_MAX_ATTEMPTS = getattr(settings, 'AI_RETRY_MAX_ATTEMPTS', 3)
+RETRY_BACKOFF_BASE = getattr(settings, 'AI_RETRY_BACKOFF_BASE', 0.5)
+RETRY_BACKOFF_MAX = getattr(settings, 'AI_RETRY_BACKOFF_MAX', 8.0)
+RETRY_STATUSES = {429, 502, 503, 504}
+# Segundos para todos los intentos de una llamada; 0: el read timeout de la llamada
+RETRY_DEADLINE = getattr(settings, 'AI_RETRY_DEADLINE', 0)
+
+HEDGE_ENABLED = getattr(settings, 'AI_HEDGE_ENABLED', False)
+HEDGE_PERCENTILE = getattr(settings, 'AI_HEDGE_PERCENTILE', 95)
+HEDGE_MIN_SAMPLES = getattr(settings, 'AI_HEDGE_MIN_SAMPLES', 20)
+HEDGE_MAX_WORKERS = getattr(settings, 'AI_HEDGE_MAX_WORKERS', 64)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """El circuito del endpoint está abierto: la llamada se rechaza sin enviarse"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de error sobre una ventana de las últimas N llamadas
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float = 0.5, window: int = 20, min_requests: int = 5,
+                 reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._outcomes = deque(maxlen=window)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._outcomes.append(True)
+            if self.state == self.HALF_OPEN:
+                self._close()
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            if self.state == self.HALF_OPEN:
+                self._open()
+            elif self.state == self.CLOSED and self._should_trip():
+                self._open()
+
+    def release_probe(self):
+        """
+        La request de prueba terminó sin resultado (error ajeno al endpoint o
+        cancelación): deja pasar otra prueba
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_health(self, healthy: bool):
+        """
+        Resultado de health_check: un endpoint caído cuenta como un fallo más en
+        la ventana (el tráfico real sigue decidiendo) y uno sano permite volver
+        a probar sin esperar a reset_timeout
+        """
+        with self._lock:
+            if not healthy:
+                self._outcomes.append(False)
+                if self.state == self.CLOSED and self._should_trip():
+                    self._open()
+            elif self.state == self.OPEN:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, round(self.reset_timeout - (self.clock() - self.opened_at), 2))
+            return {
+                'state': self.state,
+                'error_rate': round(self.error_rate(), 3),
+                'recent_calls': len(self._outcomes),
+                'retry_in_seconds': retry_in,
+            }
+
+    def _should_trip(self) -> bool:
+        return len(self._outcomes) >= self.min_requests and self.error_rate() >= self.failure_rate
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+        self._probe_in_flight = False
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+
+class LatencyTracker:
+    """
+    Latencias recientes de respuestas exitosas, para calcular el umbral de hedging
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class RetryPolicy:
+    """
+    Reintentos con backoff exponencial y jitter completo
+    """
+
+    def __init__(self, max_attempts: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def is_failure_status(status_code: int) -> bool:
+    """
+    Respuestas que cuentan como fallo del endpoint para el circuit breaker
+    """
+    return status_code >= 500 or status_code in RETRY_STATUSES
+
+
+def read_timeout(timeout) -> Optional[float]:
+    """
+    Read timeout de un timeout de requests (número o tupla) o de httpx
+    """
+    if isinstance(timeout, httpx.Timeout):
+        return timeout.read
+    if isinstance(timeout, tuple):
+        return timeout[1]
+    return timeout
+
+
+def bounded_timeout(timeout, remaining: float):
+    """
+    El timeout de un intento recortado a los segundos que quedan hasta el deadline
+    """
+    def bound(value):
+        return remaining if value is None else min(value, remaining)
+
+    if isinstance(timeout, httpx.Timeout):
+        return httpx.Timeout(
+            bound(timeout.read), connect=bound(timeout.connect),
+            write=bound(timeout.write), pool=bound(timeout.pool),
+        )
+    if isinstance(timeout, tuple):
+        return tuple(bound(value) for value in timeout)
+    return bound(timeout)
+
+
+class RetryBudget:
+    """
+    Intentos y deadline compartidos por todos los intentos de una llamada
+    """
+
+    def __init__(self, retry: RetryPolicy, deadline_seconds: Optional[float], clock=time.monotonic):
+        self.retry = retry
+        self.clock = clock
+        self.deadline = clock() + deadline_seconds if deadline_seconds else None
+        self.attempt = 0
+
+    def next_delay(self) -> Optional[float]:
+        """
+        Espera antes del siguiente intento, o None si no quedan intentos o el
+        siguiente empezaría después del deadline
+        """
+        if self.attempt >= self.retry.max_attempts - 1:
+            return None
+        delay = self.retry.delay(self.attempt + 1)
+        if self.deadline is not None and self.clock() + delay >= self.deadline:
+            return None
+        self.attempt += 1
+        return delay
+
+    def timeout(self, timeout):
+        if self.deadline is None or timeout is None:
+            return timeout
+        return bounded_timeout(timeout, max(self.deadline - self.clock(), 0.001))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_state_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='ai-hedge')
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    with _state_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(
+                failure_rate=BREAKER_FAILURE_RATE,
+                window=BREAKER_WINDOW,
+                min_requests=BREAKER_MIN_REQUESTS,
+                reset_timeout=BREAKER_RESET_TIMEOUT,
+            )
+        return _breakers[endpoint]
+
+
+def get_latency_tracker(endpoint: str) -> LatencyTracker:
+    with _state_lock:
+        return _latencies.setdefault(endpoint, LatencyTracker())
+
+
+def breaker_states() -> Dict[str, Dict]:
+    """
+    Estado exportable de todos los circuit breakers, por endpoint
+    """
+    with _state_lock:
+        breakers = dict(_breakers)
+    return {endpoint: breaker.snapshot() for endpoint, breaker in breakers.items()}
+
+
+class ResilientSession:
+    """
+    Envuelve requests.Session.post con circuit breaker, reintentos y hedging
+    """
+
+    def __init__(self, session: requests.Session, endpoint: str, retry: RetryPolicy = None,
+                 hedge: bool = None, sleep=time.sleep, deadline: float = None):
+        self.session = session
+        self.breaker = get_circuit_breaker(endpoint)
+        self.latency = get_latency_tracker(endpoint)
+        self.retry = retry or RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+        self.hedge = HEDGE_ENABLED if hedge is None else hedge
+        self.sleep = sleep
+        self.deadline = RETRY_DEADLINE if deadline is None else deadline
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """
+        Igual que Session.post. Lanza CircuitOpenError si el circuito está
+        abierto; tras agotar los reintentos (o el deadline) devuelve la última
+        respuesta (para que raise_for_status informe del error) o relanza la
+        última excepción
+        """
+        timeout = kwargs.get('timeout')
+        budget = RetryBudget(self.retry, self.deadline or read_timeout(timeout))
+        last_error = None
+        delay = 0
+        while True:
+            if delay:
+                self.sleep(delay)
+            if not self.breaker.allow_request():
+                raise last_error or CircuitOpenError(
+                    f"Circuit breaker abierto para el endpoint de IA "
+                    f"(reintento en {self.breaker.snapshot()['retry_in_seconds']} s)"
+                )
+            if timeout is not None:
+                kwargs['timeout'] = budget.timeout(timeout)
+
+            start_time = time.monotonic()
+            try:
+                response = self._send(url, kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # Incluye ConnectTimeout: la request no llegó al modelo
+                self.breaker.record_failure()
+                last_error = e
+                delay = budget.next_delay()
+                if delay is None:
+                    raise
+                continue
+            except requests.exceptions.RequestException:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Error ajeno al endpoint: no cuenta, pero libera la prueba half-open
+                self.breaker.release_probe()
+                raise
+
+            if not is_failure_status(response.status_code):
+                self.breaker.record_success()
+                self.latency.record(time.monotonic() - start_time)
+                return response
+
+            self.breaker.record_failure()
+            delay = budget.next_delay() if response.status_code in RETRY_STATUSES else None
+            if delay is None:
+                return response
+            response.close()
+            last_error = requests.exceptions.HTTPError(
+                f"HTTP {response.status_code} from AI endpoint", response=response
+            )
+
+    def _hedge_delay(self, kwargs) -> Optional[float]:
+        if not self.hedge or kwargs.get('stream'):
+            return None
+        return self.latency.percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+
+    def _send(self, url: str, kwargs) -> requests.Response:
+        hedge_delay = self._hedge_delay(kwargs)
+        if hedge_delay is None:
+            return self.session.post(url, **kwargs)
+
+        started = threading.Event()
+
+        def send_primary():
+            started.set()
+            return self.session.post(url, **kwargs)
+
+        primary = _hedge_executor.submit(send_primary)
+        # El plazo del hedge cuenta desde que la request sale, no desde la cola del pool
+        started.wait()
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        # La primera request supera el p95: lanzar una segunda y usar la que llegue antes
+        secondary = _hedge_executor.submit(self.session.post, url, **kwargs)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                return response
+        raise error
+
+
+class AsyncResilientClient:
+    """
+    Equivalente de ResilientSession para httpx.AsyncClient; comparte el circuit
+    breaker y las latencias del endpoint con el cliente síncrono
+    """
+
+    def __init__(self, client: httpx.AsyncClient, endpoint: str, retry: RetryPolicy = None,
+                 hedge: bool = None, deadline: float = None):
+        self.client = client
+        self.breaker = get_circuit_breaker(endpoint)
+        self.latency = get_latency_tracker(endpoint)
+        self.retry = retry or RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+        self.hedge = HEDGE_ENABLED if hedge is None else hedge
+        self.deadline = RETRY_DEADLINE if deadline is None else deadline
+
+    async def post(self, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        Igual que AsyncClient.post; con stream=True el cuerpo no se lee y el
+        llamador debe cerrar la respuesta (aclose)
+        """
+        timeout = kwargs.get('timeout')
+        budget = RetryBudget(self.retry, self.deadline or read_timeout(timeout))
+        last_error = None
+        delay = 0
+        while True:
+            if delay:
+                await asyncio.sleep(delay)
+            if not self.breaker.allow_request():
+                raise last_error or CircuitOpenError(
+                    f"Circuit breaker abierto para el endpoint de IA "
+                    f"(reintento en {self.breaker.snapshot()['retry_in_seconds']} s)"
+                )
+            if timeout is not None:
+                kwargs['timeout'] = budget.timeout(timeout)
+
+            start_time = time.monotonic()
+            try:
+                response = await self._send(url, stream, kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # La request no llegó al modelo
+                self.breaker.record_failure()
+                last_error = e
+                delay = budget.next_delay()
+                if delay is None:
+                    raise
+                continue
+            except httpx.HTTPError:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelación o error ajeno al endpoint: libera la prueba half-open
+                self.breaker.release_probe()
+                raise
+
+            if not is_failure_status(response.status_code):
+                self.breaker.record_success()
+                self.latency.record(time.monotonic() - start_time)
+                return response
+
+            self.breaker.record_failure()
+            delay = budget.next_delay() if response.status_code in RETRY_STATUSES else None
+            if delay is None:
+                return response
+            await response.aclose()
+            last_error = httpx.HTTPStatusError(
+                f"HTTP {response.status_code} from AI endpoint",
+                request=response.request, response=response
+            )
+
+    async def _send(self, url: str, stream: bool, kwargs) -> httpx.Response:
+        hedge_delay = None
+        if self.hedge and not stream:
+            hedge_delay = self.latency.percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+        if hedge_delay is None:
+            request = self.client.build_request('POST', url, **kwargs)
+            return await self.client.send(request, stream=stream)
+
+        primary = asyncio.ensure_future(self.client.post(url, **kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        # La primera request supera el p95: lanzar una segunda y usar la que llegue antes
+        secondary = asyncio.ensure_future(self.client.post(url, **kwargs))
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                return task.result()
+        raise error
+
+
+def _close_response(future):
+    try:
+        future.result().close()
+    except Exception:
+        pass
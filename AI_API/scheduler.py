@@ -0,0 +1,174 @@
+"""
+Planificador de micro-lotes para las inferencias de Gemma.
+
+Las llamadas a generate_response que llegan a la vez (varios vendedores
+analizando productos al mismo tiempo) se retienen hasta AI_BATCH_MAX_WAIT
+segundos y se agrupan en lotes de hasta AI_BATCH_MAX_SIZE. Cada lote se
+despacha junto, como requests concurrentes sobre las conexiones keep-alive del
+pool. El endpoint OpenAI-compatible no ofrece una ruta de lotes, pero LitServe
+agrupa en un mismo batch de GPU las requests que llegan juntas.
+
+Control de admisión: como máximo AI_BATCH_MAX_IN_FLIGHT inferencias en curso.
+Cuando se alcanza ese límite el despachador espera y la cola se llena. Con
+AI_BATCH_MAX_QUEUE trabajos en espera las nuevas llamadas se rechazan al
+instante en lugar de acumular latencia.
+
+El planificador expone la interfaz de Gemma3Service: generate_response pasa por
+la cola y el resto de atributos se delegan al servicio actual del registro.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, Full, Queue
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+
+from productplatform import metrics
+
+BATCH_MAX_SIZE = getattr(settings, 'AI_BATCH_MAX_SIZE', 8)
+BATCH_MAX_WAIT = getattr(settings, 'AI_BATCH_MAX_WAIT', 0.01)
+BATCH_MAX_IN_FLIGHT = getattr(settings, 'AI_BATCH_MAX_IN_FLIGHT', 16)
+BATCH_MAX_QUEUE = getattr(settings, 'AI_BATCH_MAX_QUEUE', 256)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class SchedulerOverloaded(Exception):
+    """La cola del planificador está llena: la request se rechaza"""
+
+
+class _Job:
+    __slots__ = ('kwargs', 'future', 'enqueued_at')
+
+    def __init__(self, kwargs: Dict[str, Any]):
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """
+    Agrupa llamadas concurrentes a generate_response en micro-lotes
+    """
+
+    def __init__(self, get_service: Callable, max_batch_size: int = 8, max_wait: float = 0.01,
+                 max_in_flight: int = 16, max_queue: int = 256, name: str = 'ai_scheduler'):
+        self.get_service = get_service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.max_in_flight = max(1, max_in_flight)
+        self._queue = Queue(maxsize=max_queue)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='ai-batch')
+        self._dispatcher = None
+        self._start_lock = threading.Lock()
+        self.batch_size_histogram = metrics.histogram(
+            f'{name}_batch_size', 'Trabajos por lote despachado', BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait_histogram = metrics.histogram(
+            f'{name}_queue_wait_seconds', 'Espera en cola antes de despachar'
+        )
+
+    def __getattr__(self, name):
+        # config, stream_response, health_check... del servicio actual
+        if name.startswith('_') or name == 'get_service':
+            raise AttributeError(name)
+        return getattr(self.get_service(), name)
+
+    def submit(self, **kwargs) -> Future:
+        """
+        Encola una llamada a generate_response y devuelve su Future.
+        Lanza SchedulerOverloaded si la cola está llena
+        """
+        job = _Job(kwargs)
+        self._ensure_dispatcher()
+        try:
+            self._queue.put_nowait(job)
+        except Full:
+            raise SchedulerOverloaded(
+                f"Cola de inferencia llena ({self._queue.maxsize} trabajos en espera)"
+            )
+        return job.future
+
+    def generate_response(self, prompt: str, image_urls: List[str] = None,
+                          max_tokens: int = None, temperature: float = None,
+                          request_type: str = 'chat', user=None,
+                          response_format: Dict = None, ai_request=None) -> Dict[str, Any]:
+        """
+        Igual que Gemma3Service.generate_response, pasando por la cola de micro-lotes
+        """
+        try:
+            future = self.submit(
+                prompt=prompt, image_urls=image_urls, max_tokens=max_tokens,
+                temperature=temperature, request_type=request_type, user=user,
+                response_format=response_format, ai_request=ai_request
+            )
+        except SchedulerOverloaded as e:
+            return {
+                'success': False,
+                'error': f"Request error: {str(e)}",
+                'processing_time': 0.0,
+                'request_id': None
+            }
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait': self.max_wait,
+            'max_in_flight': self.max_in_flight,
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_wait_seconds': self.queue_wait_histogram.snapshot(),
+        }
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        with self._start_lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(
+                    target=self._run, name='ai-batch-dispatcher', daemon=True
+                )
+                self._dispatcher.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0].enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[_Job]):
+        self.batch_size_histogram.observe(len(batch))
+        try:
+            service = self.get_service()
+        except Exception as e:
+            for job in batch:
+                job.future.set_exception(e)
+            return
+
+        for job in batch:
+            # Admisión: no más de max_in_flight inferencias en curso
+            self._slots.acquire()
+            self.queue_wait_histogram.observe(time.monotonic() - job.enqueued_at)
+            if not job.future.set_running_or_notify_cancel():
+                self._slots.release()
+                continue
+            self._executor.submit(self._execute, service, job)
+
+    def _execute(self, service, job: _Job):
+        try:
+            job.future.set_result(service.generate_response(**job.kwargs))
+        except Exception as e:
+            job.future.set_exception(e)
+        finally:
+            self._slots.release()
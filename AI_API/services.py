@@ -1,9 +1,21 @@
+import asyncio
 import requests
+import requests.adapters
 import time
-from typing import Dict, List, Any
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import httpx
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.utils import timezone
+from productplatform import metrics
 from .models import AIRequest, AIConfiguration
+from .audit import audit_logger
+from .blobs import store_image_urls
+from .cache import analysis_cache_key, get_analysis_cache
+from .parsing import AnalysisParseError, parse_product_analysis, product_analysis_response_format
+from .resilience import AsyncResilientClient, CircuitOpenError, ResilientSession, get_circuit_breaker
+from .streaming import STREAM_DONE, PartialFieldExtractor, chunk_delta, parse_sse_line
 # Configuración directa desde settings
 LIGHTNING_AI_ENDPOINT = getattr(settings, 'LIGHTNING_AI_ENDPOINT', 'https://8001-01k4ap2fswtrsc3fyamsj261fp.cloudspaces.litng.ai')
 LIGHTNING_AI_API_KEY = getattr(settings, 'LIGHTNING_AI_API_KEY', 'gemma3-litserve')
@@ -12,20 +24,44 @@ DEFAULT_MAX_TOKENS = 256
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_TIMEOUT = 300
 
+# Tiempo máximo para establecer la conexión: un endpoint caído falla rápido aunque timeout_seconds sea alto
+CONNECT_TIMEOUT = getattr(settings, 'AI_CONNECT_TIMEOUT', 10.0)
+
+# Versión de la plantilla del prompt de análisis; incrementarla invalida la caché de análisis
+ANALYSIS_PROMPT_VERSION = 2
+
+# Enviar el JSON schema del análisis como response_format (el endpoint debe soportarlo)
+STRUCTURED_OUTPUT = getattr(settings, 'AI_STRUCTURED_OUTPUT', False)
+
+# Conexiones keep-alive por host de la sesión síncrona
+HTTP_POOL_MAXSIZE = getattr(settings, 'AI_HTTP_POOL_MAXSIZE', 32)
+
+# Pool de conexiones HTTP/1.1 keep-alive del cliente asíncrono (por endpoint)
+ASYNC_MAX_CONNECTIONS = getattr(settings, 'AI_ASYNC_MAX_CONNECTIONS', 100)
+ASYNC_MAX_KEEPALIVE_CONNECTIONS = getattr(settings, 'AI_ASYNC_MAX_KEEPALIVE_CONNECTIONS', 20)
+ASYNC_KEEPALIVE_EXPIRY = getattr(settings, 'AI_ASYNC_KEEPALIVE_EXPIRY', 30.0)
+
 class Gemma3Service:
     """
     Servicio para interactuar con el modelo Gemma 3 desplegado en Lightning AI
     """
     
-    def __init__(self):
-        self.config = self._get_active_config()
+    def __init__(self, config: AIConfiguration = None):
+        self.config = config or self._get_active_config()
         self.session = requests.Session()
+        # Sesión compartida entre hilos (ver AI_API.registry): pool acorde a la concurrencia
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_MAXSIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self.config.api_key}'
         })
+        # Circuit breaker, reintentos y hedging (ver AI_API.resilience)
+        self.http = ResilientSession(self.session, self.config.lightning_endpoint)
     
-    def _get_active_config(self) -> AIConfiguration:
+    @staticmethod
+    def _get_active_config() -> AIConfiguration:
         """Obtiene la configuración activa de IA"""
         try:
             config = AIConfiguration.objects.filter(is_active=True).first()
@@ -60,21 +96,27 @@ class Gemma3Service:
         return [{"role": "user", "content": content}]
     
     def _build_payload(self, prompt: str, image_urls: List[str] = None, 
-                      max_tokens: int = None, temperature: float = None) -> Dict:
+                      max_tokens: int = None, temperature: float = None,
+                      stream: bool = False, response_format: Dict = None) -> Dict:
         """
-        Construye el payload para la API de Gemma 3
+        Construye el payload para la API de Gemma 3. response_format (JSON
+        schema) activa la decodificación estructurada del endpoint
         """
-        return {
+        payload = {
             "model": self.config.model_name,
             "messages": self._build_messages(prompt, image_urls),
             "max_tokens": max_tokens or self.config.max_tokens_default,
             "temperature": temperature or self.config.temperature_default,
-            "stream": False
+            "stream": stream
         }
+        if response_format:
+            payload["response_format"] = response_format
+        return payload
     
     def generate_response(self, prompt: str, image_urls: List[str] = None,
                         max_tokens: int = None, temperature: float = None,
-                        request_type: str = 'chat', user=None) -> Dict[str, Any]:
+                        request_type: str = 'chat', user=None,
+                        response_format: Dict = None, ai_request: AIRequest = None) -> Dict[str, Any]:
         """
         Genera una respuesta del modelo Gemma 3
         
@@ -85,68 +127,57 @@ class Gemma3Service:
             temperature: Temperatura para la generación (opcional)
             request_type: Tipo de request ('chat', 'product_description', etc.)
             user: Usuario que hace la request (opcional)
+            response_format: JSON schema para salida estructurada (opcional)
+            ai_request: AIRequest ya guardado (cola de tareas, AI_API.tasks). Se
+                actualiza en memoria y no pasa por la auditoría: lo guarda quien lo pasó
         
         Returns:
-            Dict con la respuesta del modelo y metadatos
+            Dict con la respuesta del modelo y metadatos. Con AI_AUDIT_MODE='buffered'
+            el registro AIRequest se escribe en diferido y 'request_id' es None
         """
         start_time = time.time()
+        external = ai_request is not None
         
-        # Crear registro de request
-        ai_request = AIRequest.objects.create(
-            user=user,
-            request_type=request_type,
-            status='pending',
-            prompt=prompt,
-            image_urls=image_urls or [],
-            model_name=self.config.model_name,
-            max_tokens=max_tokens or self.config.max_tokens_default,
-            temperature=temperature or self.config.temperature_default
-        )
+        # Registro de request en memoria: se escribe una sola vez con su estado final
+        with metrics.span('ai.request_record'):
+            if external:
+                self._update_request_record(ai_request, prompt, max_tokens, temperature, request_type)
+            else:
+                ai_request = self._new_request_record(
+                    prompt, image_urls, max_tokens, temperature, request_type, user
+                )
         
         try:
-            # Actualizar estado a procesando
-            ai_request.status = 'processing'
-            ai_request.save()
-            
             # Construir payload
-            payload = self._build_payload(prompt, image_urls, max_tokens, temperature)
+            with metrics.span('ai.build_payload'):
+                payload = self._build_payload(
+                    prompt, image_urls, max_tokens, temperature, response_format=response_format
+                )
             
             # Hacer request al endpoint
-            response = self.session.post(
-                f"{self.config.lightning_endpoint}/v1/chat/completions",
-                json=payload,
-                timeout=self.config.timeout_seconds
-            )
+            with metrics.span('ai.http'):
+                response = self.http.post(
+                    f"{self.config.lightning_endpoint}/v1/chat/completions",
+                    json=payload,
+                    timeout=(CONNECT_TIMEOUT, self.config.timeout_seconds)
+                )
+                response.raise_for_status()
             
-            response.raise_for_status()
-            response_data = response.json()
+            with metrics.span('ai.parse_completion'):
+                response_text, tokens_used = self._parse_completion(response.json())
             
             # Procesar respuesta
             processing_time = time.time() - start_time
             
-            if 'choices' in response_data and len(response_data['choices']) > 0:
-                response_text = response_data['choices'][0]['message']['content']
-                usage = response_data.get('usage', {})
-                tokens_used = usage.get('total_tokens', 0)
-                
-                # Actualizar request con respuesta exitosa
-                ai_request.status = 'completed'
-                ai_request.response_text = response_text
-                ai_request.response_tokens = tokens_used
-                ai_request.processing_time = processing_time
-                ai_request.save()
-                
-             
-                return {
-                    'success': True,
-                    'response': response_text,
-                    'tokens_used': tokens_used,
-                    'processing_time': processing_time,
-                    'request_id': ai_request.id,
-                    'model': self.config.model_name
-                }
-            else:
-                raise Exception("No valid response from model")
+            # Actualizar request con respuesta exitosa
+            ai_request.status = 'completed'
+            ai_request.response_text = response_text
+            ai_request.response_tokens = tokens_used
+            ai_request.processing_time = processing_time
+            if not external:
+                self._log_request_sync(ai_request)
+            
+            return self._success_result(ai_request, response_text, tokens_used, processing_time)
                 
         except requests.exceptions.RequestException as e:
             processing_time = time.time() - start_time
@@ -155,14 +186,10 @@ class Gemma3Service:
             ai_request.status = 'failed'
             ai_request.error_message = error_msg
             ai_request.processing_time = processing_time
-            ai_request.save()
+            if not external:
+                self._log_request_sync(ai_request)
             
-            return {
-                'success': False,
-                'error': error_msg,
-                'processing_time': processing_time,
-                'request_id': ai_request.id
-            }
+            return self._error_result(ai_request, error_msg, processing_time)
             
         except Exception as e:
             processing_time = time.time() - start_time
@@ -171,19 +198,142 @@ class Gemma3Service:
             ai_request.status = 'failed'
             ai_request.error_message = error_msg
             ai_request.processing_time = processing_time
-            ai_request.save()
+            if not external:
+                self._log_request_sync(ai_request)
             
-            return {
-                'success': False,
-                'error': error_msg,
-                'processing_time': processing_time,
-                'request_id': ai_request.id
-            }
+            return self._error_result(ai_request, error_msg, processing_time)
+    
+    def stream_response(self, prompt: str, image_urls: List[str] = None,
+                        max_tokens: int = None, temperature: float = None,
+                        request_type: str = 'chat', user=None,
+                        response_format: Dict = None) -> Iterator[str]:
+        """
+        Genera una respuesta en modo streaming (SSE del endpoint OpenAI-compatible)
+        y va devolviendo los fragmentos de texto a medida que llegan. El registro
+        AIRequest se escribe al terminar, igual que en generate_response.
+        Los errores de red se registran y se propagan al consumidor
+        """
+        start_time = time.time()
+        ai_request = self._new_request_record(
+            prompt, image_urls, max_tokens, temperature, request_type, user
+        )
+        chunks = []
+        
+        try:
+            payload = self._build_payload(
+                prompt, image_urls, max_tokens, temperature, stream=True, response_format=response_format
+            )
+            
+            with self.http.post(
+                f"{self.config.lightning_endpoint}/v1/chat/completions",
+                json=payload,
+                timeout=(CONNECT_TIMEOUT, self.config.timeout_seconds),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # text/event-stream sin charset: requests asumiría ISO-8859-1
+                response.encoding = 'utf-8'
+                
+                for line in response.iter_lines(decode_unicode=True):
+                    chunk = parse_sse_line(line)
+                    if chunk == STREAM_DONE:
+                        break
+                    if chunk is None:
+                        continue
+                    delta = chunk_delta(chunk)
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+                    if chunk.get('usage'):
+                        ai_request.response_tokens = chunk['usage'].get('total_tokens', 0)
+            
+            ai_request.status = 'completed'
+        
+        except Exception as e:
+            ai_request.status = 'failed'
+            ai_request.error_message = f"Stream error: {str(e)}"
+            raise
+        
+        finally:
+            ai_request.response_text = ''.join(chunks)
+            ai_request.processing_time = time.time() - start_time
+            if ai_request.status == 'pending':
+                # El consumidor cerró el stream antes de terminar
+                ai_request.status = 'failed'
+                ai_request.error_message = 'Stream cancelled by client'
+            self._log_request_sync(ai_request)
+    
+    @staticmethod
+    def _log_request_sync(ai_request: AIRequest):
+        with metrics.span('ai.audit_log'):
+            audit_logger.log(ai_request)
+    
+    def _update_request_record(self, ai_request: AIRequest, prompt: str, max_tokens: int = None,
+                               temperature: float = None, request_type: str = 'chat'):
+        """
+        Completa un registro existente con los datos de esta llamada (las
+        imágenes ya están guardadas como referencias)
+        """
+        ai_request.prompt = prompt
+        ai_request.request_type = request_type
+        ai_request.model_name = self.config.model_name
+        ai_request.max_tokens = max_tokens or self.config.max_tokens_default
+        ai_request.temperature = temperature or self.config.temperature_default
+    
+    def _new_request_record(self, prompt: str, image_urls: List[str] = None,
+                            max_tokens: int = None, temperature: float = None,
+                            request_type: str = 'chat', user=None) -> AIRequest:
+        """
+        Construye (sin guardar) el registro de auditoría de una request. Las
+        imágenes se guardan como referencias al almacén de blobs, no como data URLs
+        """
+        return AIRequest(
+            user=user,
+            request_type=request_type,
+            status='pending',
+            prompt=prompt,
+            image_urls=store_image_urls(image_urls),
+            model_name=self.config.model_name,
+            max_tokens=max_tokens or self.config.max_tokens_default,
+            temperature=temperature or self.config.temperature_default
+        )
+    
+    @staticmethod
+    def _parse_completion(response_data: Dict) -> tuple:
+        """
+        Extrae el texto generado y los tokens usados de una respuesta de chat completions
+        """
+        if 'choices' in response_data and len(response_data['choices']) > 0:
+            response_text = response_data['choices'][0]['message']['content']
+            usage = response_data.get('usage', {})
+            return response_text, usage.get('total_tokens', 0)
+        raise Exception("No valid response from model")
+    
+    def _success_result(self, ai_request: AIRequest, response_text: str,
+                        tokens_used: int, processing_time: float) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'response': response_text,
+            'tokens_used': tokens_used,
+            'processing_time': processing_time,
+            'request_id': ai_request.id,
+            'model': self.config.model_name
+        }
+    
+    @staticmethod
+    def _error_result(ai_request: AIRequest, error_msg: str, processing_time: float) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': error_msg,
+            'processing_time': processing_time,
+            'request_id': ai_request.id
+        }
     
  
     def health_check(self) -> Dict[str, Any]:
         """
-        Verifica el estado del servicio de IA
+        Verifica el estado del servicio de IA. El resultado alimenta el circuit
+        breaker del endpoint, cuyo estado se incluye en la respuesta
         """
         try:
             response = self.session.get(
@@ -192,25 +342,284 @@ class Gemma3Service:
             )
             
             if response.status_code == 200:
-                return {
+                result = {
                     'status': 'healthy',
                     'endpoint': self.config.lightning_endpoint,
                     'model': self.config.model_name,
                     'response': response.text
                 }
             else:
-                return {
+                result = {
                     'status': 'unhealthy',
                     'endpoint': self.config.lightning_endpoint,
                     'error': f"HTTP {response.status_code}"
                 }
                 
         except Exception as e:
-            return {
+            result = {
                 'status': 'unhealthy',
                 'endpoint': self.config.lightning_endpoint,
                 'error': str(e)
             }
+        
+        return self._with_breaker_state(result)
+    
+    def _with_breaker_state(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        breaker = get_circuit_breaker(self.config.lightning_endpoint)
+        breaker.record_health(result['status'] == 'healthy')
+        result['circuit_breaker'] = breaker.snapshot()
+        return result
+
+
+# Clientes HTTP asíncronos compartidos: uno por event loop y endpoint
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(endpoint: str, api_key: str) -> httpx.AsyncClient:
+    """
+    Devuelve el cliente HTTP/1.1 keep-alive compartido para el endpoint en el
+    event loop actual. Cada cliente tiene su propio pool de conexiones, así que
+    los límites de conexiones se aplican por host
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get((endpoint, api_key))
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {api_key}'
+            },
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=ASYNC_KEEPALIVE_EXPIRY
+            )
+        )
+        clients[(endpoint, api_key)] = client
+    return client
+
+
+class AsyncGemma3Service(Gemma3Service):
+    """
+    Variante asíncrona de Gemma3Service para vistas async servidas por ASGI.
+    Las inferencias en curso no ocupan un hilo cada una: comparten el pool de
+    conexiones del endpoint en el event loop
+    """
+    
+    def __init__(self, config: AIConfiguration, endpoint=None):
+        self.config = config
+        # Endpoint del pool (AI_API.balancer) al que se reportan las requests en curso
+        self.endpoint = endpoint
+        self._http: Optional[AsyncResilientClient] = None
+    
+    @classmethod
+    async def create(cls) -> 'AsyncGemma3Service':
+        """Construye el servicio sobre el endpoint que elige el pool de AI_API.registry"""
+        from .registry import get_gemma_service
+
+        pool = await sync_to_async(get_gemma_service)()
+        endpoint = pool.choose()
+        return cls(endpoint.config, endpoint=endpoint)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return get_async_client(self.config.lightning_endpoint, self.config.api_key)
+    
+    @property
+    def http(self) -> AsyncResilientClient:
+        # Se reconstruye solo si cambia el cliente (otro event loop)
+        client = self.client
+        if self._http is None or self._http.client is not client:
+            self._http = AsyncResilientClient(client, self.config.lightning_endpoint)
+        return self._http
+    
+    def _timeout(self, read_timeout: float) -> httpx.Timeout:
+        # Sin límite de espera por el pool: las requests se encolan hasta tener conexión
+        return httpx.Timeout(read_timeout, connect=CONNECT_TIMEOUT, pool=None)
+    
+    async def generate_response(self, prompt: str, image_urls: List[str] = None,
+                                max_tokens: int = None, temperature: float = None,
+                                request_type: str = 'chat', user=None,
+                                response_format: Dict = None) -> Dict[str, Any]:
+        """
+        Genera una respuesta del modelo Gemma 3 sin bloquear el event loop.
+        Mismos argumentos y resultado que Gemma3Service.generate_response
+        """
+        endpoint_start = self.endpoint.start_request() if self.endpoint else None
+        success = False
+        try:
+            result = await self._generate_response(
+                prompt, image_urls, max_tokens, temperature, request_type, user, response_format
+            )
+            success = result['success']
+            return result
+        finally:
+            # También si el cliente se desconecta (cancelación) o falla el registro
+            if self.endpoint:
+                self.endpoint.finish_request(endpoint_start, success)
+    
+    async def _generate_response(self, prompt: str, image_urls: List[str] = None,
+                                 max_tokens: int = None, temperature: float = None,
+                                 request_type: str = 'chat', user=None,
+                                 response_format: Dict = None) -> Dict[str, Any]:
+        start_time = time.time()
+        
+        # El almacén de blobs escribe en disco: fuera del event loop
+        with metrics.span('ai.request_record'):
+            ai_request = await sync_to_async(self._new_request_record, thread_sensitive=False)(
+                prompt, image_urls, max_tokens, temperature, request_type, user
+            )
+        
+        try:
+            with metrics.span('ai.build_payload'):
+                payload = self._build_payload(
+                    prompt, image_urls, max_tokens, temperature, response_format=response_format
+                )
+            
+            with metrics.span('ai.http'):
+                response = await self.http.post(
+                    f"{self.config.lightning_endpoint}/v1/chat/completions",
+                    json=payload,
+                    timeout=self._timeout(self.config.timeout_seconds)
+                )
+                response.raise_for_status()
+            
+            with metrics.span('ai.parse_completion'):
+                response_text, tokens_used = self._parse_completion(response.json())
+            processing_time = time.time() - start_time
+            
+            ai_request.status = 'completed'
+            ai_request.response_text = response_text
+            ai_request.response_tokens = tokens_used
+            ai_request.processing_time = processing_time
+            await self._log_request(ai_request)
+            
+            return self._success_result(ai_request, response_text, tokens_used, processing_time)
+            
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            error_msg = f"Request error: {str(e)}"
+        except Exception as e:
+            error_msg = f"Unexpected error: {str(e)}"
+        
+        processing_time = time.time() - start_time
+        ai_request.status = 'failed'
+        ai_request.error_message = error_msg
+        ai_request.processing_time = processing_time
+        await self._log_request(ai_request)
+        
+        return self._error_result(ai_request, error_msg, processing_time)
+    
+    async def stream_response(self, prompt: str, image_urls: List[str] = None,
+                              max_tokens: int = None, temperature: float = None,
+                              request_type: str = 'chat', user=None,
+                              response_format: Dict = None) -> AsyncIterator[str]:
+        """
+        Variante asíncrona de Gemma3Service.stream_response
+        """
+        start_time = time.time()
+        ai_request = await sync_to_async(self._new_request_record, thread_sensitive=False)(
+            prompt, image_urls, max_tokens, temperature, request_type, user
+        )
+        chunks = []
+        # El finally de abajo lo equilibra siempre, también al cancelar el stream
+        endpoint_start = self.endpoint.start_request() if self.endpoint else None
+        
+        try:
+            payload = self._build_payload(
+                prompt, image_urls, max_tokens, temperature, stream=True, response_format=response_format
+            )
+            
+            response = await self.http.post(
+                f"{self.config.lightning_endpoint}/v1/chat/completions",
+                json=payload,
+                timeout=self._timeout(self.config.timeout_seconds),
+                stream=True
+            )
+            try:
+                response.raise_for_status()
+                
+                async for line in response.aiter_lines():
+                    chunk = parse_sse_line(line)
+                    if chunk == STREAM_DONE:
+                        break
+                    if chunk is None:
+                        continue
+                    delta = chunk_delta(chunk)
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+                    if chunk.get('usage'):
+                        ai_request.response_tokens = chunk['usage'].get('total_tokens', 0)
+            finally:
+                await response.aclose()
+            
+            ai_request.status = 'completed'
+        
+        except Exception as e:
+            ai_request.status = 'failed'
+            ai_request.error_message = f"Stream error: {str(e)}"
+            raise
+        
+        finally:
+            ai_request.response_text = ''.join(chunks)
+            ai_request.processing_time = time.time() - start_time
+            if ai_request.status == 'pending':
+                ai_request.status = 'failed'
+                ai_request.error_message = 'Stream cancelled by client'
+            if self.endpoint:
+                self.endpoint.finish_request(endpoint_start, ai_request.status == 'completed')
+            await self._log_request(ai_request)
+    
+    @staticmethod
+    async def _log_request(ai_request: AIRequest):
+        # En modo buffered log() no toca la base de datos y puede llamarse desde el event loop
+        with metrics.span('ai.audit_log'):
+            if audit_logger.is_buffered:
+                audit_logger.log(ai_request)
+            else:
+                await sync_to_async(audit_logger.log)(ai_request)
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """
+        Verifica el estado del servicio de IA
+        """
+        try:
+            response = await self.client.get(
+                f"{self.config.lightning_endpoint}/",
+                timeout=self._timeout(10)
+            )
+            
+            if response.status_code == 200:
+                result = {
+                    'status': 'healthy',
+                    'endpoint': self.config.lightning_endpoint,
+                    'model': self.config.model_name,
+                    'response': response.text
+                }
+            else:
+                result = {
+                    'status': 'unhealthy',
+                    'endpoint': self.config.lightning_endpoint,
+                    'error': f"HTTP {response.status_code}"
+                }
+        
+        except Exception as e:
+            result = {
+                'status': 'unhealthy',
+                'endpoint': self.config.lightning_endpoint,
+                'error': str(e)
+            }
+        
+        return self._with_breaker_state(result)
+
+
+def category_choices() -> List[str]:
+    """
+    Categorías de la tienda para el prompt, del mismo índice que resuelve
+    después la categoría sugerida (products.categories)
+    """
+    from products.categories import category_names
+    return category_names()
 
 
 class ProductAIService:
@@ -218,12 +627,12 @@ class ProductAIService:
     Servicio específico para funcionalidades de IA relacionadas con productos
     """
     
-    def __init__(self):
-        self.gemma_service = Gemma3Service()
+    def __init__(self, gemma_service: Gemma3Service = None):
+        self.gemma_service = gemma_service or Gemma3Service()
     
     # Funciones individuales eliminadas - solo se usa analyze_product_complete()
     
-    def analyze_product_complete(self, image_urls, user=None) -> Dict[str, Any]:
+    def analyze_product_complete(self, image_urls, user=None, ai_request: AIRequest = None) -> Dict[str, Any]:
         """
         Análisis completo de producto desde una o múltiples imágenes para auto-llenar formulario
         Genera título, descripción, categoría sugerida y tags automáticamente
@@ -231,36 +640,152 @@ class ProductAIService:
         Args:
             image_urls: String (una imagen) o lista de strings (múltiples imágenes)
             user: Usuario que realiza la petición
+            ai_request: AIRequest existente de la cola de tareas (opcional)
         """
         # Convertir a lista si es un solo string
         if isinstance(image_urls, str):
             image_urls = [image_urls]
 
-        # Ajustar prompt según número de imágenes
-        if len(image_urls) == 1:
-            prompt = """Analiza esta imagen de producto y genera información completa para un e-commerce.
+        category_names = category_choices()
+        cache_key = self._analysis_cache_key(image_urls, category_names)
+        cached_data = self._cached_analysis(cache_key)
+        if cached_data is not None:
+            return self._cached_analysis_result(cached_data, image_urls)
+
+        request = self._analysis_request(image_urls, user, category_names)
+        if ai_request is not None:
+            request['ai_request'] = ai_request
+        result = self.gemma_service.generate_response(**request)
+        analysis = self._parse_analysis_result(result, image_urls)
+        if analysis['success']:
+            get_analysis_cache().set(cache_key, analysis['data'])
+        return analysis
+
+    def stream_analysis(self, image_urls, user=None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Análisis completo en modo streaming. Produce eventos (nombre, datos):
+        'field' con el valor parcial de título/descripción a medida que se
+        generan, y al final 'done' con el mismo resultado que
+        analyze_product_complete o 'error'
+        """
+        if isinstance(image_urls, str):
+            image_urls = [image_urls]
+
+        category_names = category_choices()
+        cache_key = self._analysis_cache_key(image_urls, category_names)
+        cached_data = self._cached_analysis(cache_key)
+        if cached_data is not None:
+            yield 'done', self._cached_analysis_result(cached_data, image_urls)
+            return
+
+        start_time = time.time()
+        extractor = PartialFieldExtractor()
+        try:
+            for delta in self.gemma_service.stream_response(**self._analysis_request(image_urls, user, category_names)):
+                for field, value in extractor.feed(delta):
+                    yield 'field', {'field': field, 'value': value}
+        except Exception as e:
+            yield 'error', {'success': False, 'error': f"Request error: {str(e)}"}
+            return
+
+        yield 'done', self._finish_stream_analysis(extractor.text, image_urls, cache_key, start_time)
+
+    def _finish_stream_analysis(self, response_text: str, image_urls: List[str],
+                                cache_key: str, start_time: float) -> Dict[str, Any]:
+        result = {
+            'success': True,
+            'response': response_text,
+            'request_id': None,
+            'processing_time': time.time() - start_time
+        }
+        analysis = self._parse_analysis_result(result, image_urls)
+        if analysis['success']:
+            get_analysis_cache().set(cache_key, analysis['data'])
+        return analysis
+
+    def _analysis_cache_key(self, image_urls: List[str], category_names: List[str]) -> str:
+        config = self.gemma_service.config
+        with metrics.span('ai.analysis.cache_key'):
+            return analysis_cache_key(
+                image_urls, ANALYSIS_PROMPT_VERSION, config.model_name, category_names, config.pk
+            )
+
+    @staticmethod
+    def _cached_analysis(cache_key: str):
+        """
+        Análisis guardado en la caché (o None), contando aciertos y fallos
+        """
+        with metrics.span('ai.analysis.cache_get'):
+            data = get_analysis_cache().get(cache_key)
+        metrics.counter(
+            'ai_analysis_cache_total', 'Consultas a la caché de análisis por resultado',
+            labels={'result': 'miss' if data is None else 'hit'},
+        ).inc()
+        return data
+
+    @staticmethod
+    def _cached_analysis_result(data: Dict[str, Any], image_urls: List[str]) -> Dict[str, Any]:
+        """
+        Resultado de un análisis servido desde la caché, sin llamar al modelo
+        """
+        return {
+            'success': True,
+            'data': data,
+            'request_id': None,
+            'processing_time': 0.0,
+            'images_count': len(image_urls),
+            'cached': True
+        }
+
+    def _analysis_request(self, image_urls: List[str], user=None, category_names: List[str] = None) -> Dict[str, Any]:
+        """
+        Argumentos de generate_response para el análisis completo de producto
+        """
+        if category_names is None:
+            category_names = category_choices()
+        request = {
+            'prompt': self._build_analysis_prompt(len(image_urls), category_names),
+            'image_urls': image_urls,
+            'max_tokens': 600,
+            'temperature': 0.7,
+            'request_type': 'product_analysis',
+            'user': user
+        }
+        if STRUCTURED_OUTPUT:
+            request['response_format'] = product_analysis_response_format(category_names)
+        return request
+
+    @staticmethod
+    def _build_analysis_prompt(images_count: int, category_names: List[str]) -> str:
+        """
+        Prompt de análisis ajustado según el número de imágenes, con las
+        categorías que existen en la tienda
+        """
+        choices = ', '.join(category_names) or 'General'
+        if images_count == 1:
+            prompt = f"""Analiza esta imagen de producto y genera información completa para un e-commerce.
             Responde SOLO en formato JSON con la siguiente estructura exacta:
-            {
+            {{
                 "title": "Título atractivo del producto (máximo 60 caracteres)",
                 "description": "Descripción detallada y convincente del producto (máximo 200 palabras)",
-                "suggested_category": "Categoría más apropiada para este producto (debe ser una de: Ropa, Electrónicos, Hogar, Deportes, Libros, Juguetes, Belleza, Automotriz, Jardín, Oficina)",
+                "suggested_category": "Categoría más apropiada para este producto (debe ser una de: {choices})",
                 "tags": "tag1, tag2, tag3, tag4, tag5",
                 "price_suggestion": "Precio estimado en USD basado en el producto"
-            }
+            }}
 
             El título debe ser atractivo y optimizado para SEO.
             La descripción debe destacar características clave y beneficios.
-            La categoría DEBE ser una de estas opciones exactas: Ropa, Electrónicos, Hogar, Deportes, Libros, Juguetes, Belleza, Automotriz, Jardín, Oficina.
+            La categoría DEBE ser una de estas opciones exactas: {choices}.
             Los tags deben ser palabras clave útiles para búsqueda.
             El precio debe ser realista basado en el tipo de producto."""
         else:
-            prompt = f"""Analiza estas {len(image_urls)} imágenes del mismo producto y genera información completa para un e-commerce.
+            prompt = f"""Analiza estas {images_count} imágenes del mismo producto y genera información completa para un e-commerce.
             Considera TODAS las imágenes para generar una descripción más completa y precisa.
             Responde SOLO en formato JSON con la siguiente estructura exacta:
             {{
                 "title": "Título atractivo del producto (máximo 60 caracteres)",
                 "description": "Descripción detallada y convincente basada en TODAS las imágenes (máximo 250 palabras)",
-                "suggested_category": "Categoría más apropiada (debe ser una de: Ropa, Electrónicos, Hogar, Deportes, Libros, Juguetes, Belleza, Automotriz, Jardín, Oficina)",
+                "suggested_category": "Categoría más apropiada (debe ser una de: {choices})",
                 "tags": "tag1, tag2, tag3, tag4, tag5, tag6",
                 "price_suggestion": "Precio estimado en USD basado en el producto"
             }}
@@ -268,53 +793,103 @@ class ProductAIService:
             IMPORTANTE: Analiza TODAS las imágenes proporcionadas para crear una descripción completa.
             El título debe ser atractivo y optimizado para SEO.
             La descripción debe integrar detalles visibles en todas las imágenes.
-            La categoría DEBE ser una de estas opciones exactas: Ropa, Electrónicos, Hogar, Deportes, Libros, Juguetes, Belleza, Automotriz, Jardín, Oficina.
+            La categoría DEBE ser una de estas opciones exactas: {choices}.
             Los tags deben cubrir aspectos visibles en las diferentes imágenes.
             El precio debe ser realista basado en el tipo de producto."""
+        return prompt
 
-        result = self.gemma_service.generate_response(
-            prompt=prompt,
-            image_urls=image_urls,
-            max_tokens=600,
-            temperature=0.7,
-            request_type='product_analysis',
-            user=user
+    @staticmethod
+    @metrics.span('ai.analysis.parse')
+    def _parse_analysis_result(result: Dict[str, Any], image_urls: List[str]) -> Dict[str, Any]:
+        """
+        Valida la respuesta del modelo como ProductAnalysis. Se toleran prosa
+        alrededor del JSON, comas finales y salidas truncadas (ver AI_API.parsing)
+        """
+        if not result['success']:
+            return result
+        try:
+            analysis = parse_product_analysis(result['response'])
+        except AnalysisParseError as e:
+            return {
+                'success': False,
+                'error': f'Error procesando respuesta de IA: {e}',
+                'raw_response': result['response']
+            }
+        return {
+            'success': True,
+            'data': analysis.to_dict(),
+            'repaired': analysis.repaired,
+            'request_id': result.get('request_id'),
+            'processing_time': result.get('processing_time'),
+            'images_count': len(image_urls)
+        }
+
+
+class AsyncProductAIService(ProductAIService):
+    """
+    Variante asíncrona de ProductAIService basada en AsyncGemma3Service
+    """
+
+    def __init__(self, gemma_service: AsyncGemma3Service):
+        self.gemma_service = gemma_service
+
+    @classmethod
+    async def create(cls) -> 'AsyncProductAIService':
+        return cls(await AsyncGemma3Service.create())
+
+    async def analyze_product_complete(self, image_urls, user=None) -> Dict[str, Any]:
+        """
+        Análisis completo de producto sin bloquear el event loop
+        """
+        if isinstance(image_urls, str):
+            image_urls = [image_urls]
+
+        category_names = await sync_to_async(category_choices)()
+        # Decodificar y hashear imágenes de varios MB: fuera del event loop
+        cache_key = await sync_to_async(self._analysis_cache_key, thread_sensitive=False)(
+            image_urls, category_names
         )
+        cached_data = await sync_to_async(self._cached_analysis)(cache_key)
+        if cached_data is not None:
+            return self._cached_analysis_result(cached_data, image_urls)
 
-        if result['success']:
-            try:
-                # Intentar parsear la respuesta como JSON
-                import json
-                response_text = result['response']
-
-                # Limpiar la respuesta para extraer solo el JSON
-                if '```json' in response_text:
-                    json_start = response_text.find('```json') + 7
-                    json_end = response_text.find('```', json_start)
-                    json_text = response_text[json_start:json_end].strip()
-                elif '{' in response_text and '}' in response_text:
-                    json_start = response_text.find('{')
-                    json_end = response_text.rfind('}') + 1
-                    json_text = response_text[json_start:json_end]
-                else:
-                    json_text = response_text
-
-                parsed_data = json.loads(json_text)
-
-                return {
-                    'success': True,
-                    'data': parsed_data,
-                    'request_id': result.get('request_id'),
-                    'processing_time': result.get('processing_time'),
-                    'images_count': len(image_urls)
-                }
+        result = await self.gemma_service.generate_response(
+            **self._analysis_request(image_urls, user, category_names)
+        )
+        analysis = self._parse_analysis_result(result, image_urls)
+        if analysis['success']:
+            await sync_to_async(get_analysis_cache().set)(cache_key, analysis['data'])
+        return analysis
 
-            except json.JSONDecodeError as e:
+    async def stream_analysis(self, image_urls, user=None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Variante asíncrona de ProductAIService.stream_analysis
+        """
+        if isinstance(image_urls, str):
+            image_urls = [image_urls]
 
-                return {
-                    'success': False,
-                    'error': 'Error procesando respuesta de IA',
-                    'raw_response': result['response']
-                }
-        else:
-            return result
\ No newline at end of file
+        category_names = await sync_to_async(category_choices)()
+        # Decodificar y hashear imágenes de varios MB: fuera del event loop
+        cache_key = await sync_to_async(self._analysis_cache_key, thread_sensitive=False)(
+            image_urls, category_names
+        )
+        cached_data = await sync_to_async(self._cached_analysis)(cache_key)
+        if cached_data is not None:
+            yield 'done', self._cached_analysis_result(cached_data, image_urls)
+            return
+
+        start_time = time.time()
+        extractor = PartialFieldExtractor()
+        try:
+            async for delta in self.gemma_service.stream_response(
+                **self._analysis_request(image_urls, user, category_names)
+            ):
+                for field, value in extractor.feed(delta):
+                    yield 'field', {'field': field, 'value': value}
+        except Exception as e:
+            yield 'error', {'success': False, 'error': f"Request error: {str(e)}"}
+            return
+
+        yield 'done', await sync_to_async(self._finish_stream_analysis)(
+            extractor.text, image_urls, cache_key, start_time
+        )
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import registry
+from .models import AIConfiguration
+
+
+@receiver(post_save, sender=AIConfiguration)
+@receiver(post_delete, sender=AIConfiguration)
+def reload_ai_configuration(sender, **kwargs):
+    """
+    Invalida el servicio de IA cacheado cuando cambia una configuración
+    """
+    registry.invalidate()
@@ -0,0 +1,72 @@
+"""
+Utilidades para el modo streaming (SSE) del endpoint OpenAI-compatible y para
+reenviar al navegador los campos del producto a medida que se generan
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+from .parsing import IncrementalJSONParser
+
+STREAM_DONE = '[DONE]'
+
+
+def parse_sse_line(line: str) -> Optional[Dict]:
+    """
+    Parsea una línea "data: {...}" del stream de chat completions.
+    Devuelve None para líneas vacías/comentarios y STREAM_DONE al terminar
+    """
+    if not line or not line.startswith('data:'):
+        return None
+    data = line[5:].strip()
+    if data == STREAM_DONE:
+        return STREAM_DONE
+    return json.loads(data)
+
+
+def chunk_delta(chunk: Dict) -> str:
+    """
+    Texto incremental de un chunk de chat completions
+    """
+    choices = chunk.get('choices') or []
+    if not choices:
+        return ''
+    return (choices[0].get('delta') or {}).get('content') or ''
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """
+    Serializa un evento server-sent events
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class PartialFieldExtractor:
+    """
+    Extrae de un JSON aún incompleto el valor parcial de campos de texto
+    ("title", "description"...) para mostrarlos mientras el modelo genera.
+    Usa el mismo parser incremental que valida el resultado final
+    """
+
+    def __init__(self, fields=('title', 'description')):
+        self.fields = fields
+        self.parser = IncrementalJSONParser()
+        self._values = {}
+
+    @property
+    def text(self) -> str:
+        return self.parser.text
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        """
+        Añade texto generado y devuelve los campos cuyo valor cambió
+        """
+        data = self.parser.feed(delta).value()
+        if not isinstance(data, dict):
+            return []
+        changed = []
+        for field in self.fields:
+            value = data.get(field)
+            if isinstance(value, str) and value != self._values.get(field):
+                self._values[field] = value
+                changed.append((field, value))
+        return changed
@@ -0,0 +1,263 @@
+"""
+Cola de tareas de IA respaldada por la base de datos, sin broker externo.
+
+Cada tarea es un AIRequest con 'task' no vacío que reutiliza sus estados:
+pending (en cola o esperando reintento hasta run_after) -> processing (con un
+lease de AI_TASK_LEASE_SECONDS a nombre de un worker) -> completed / failed.
+
+- enqueue_analysis guarda las imágenes en el almacén de blobs y crea la tarea;
+  la request HTTP responde enseguida (202) y el cliente consulta el resultado
+- claim toma una tarea con un UPDATE condicional: si dos workers compiten por
+  la misma fila solo uno actualiza 1 fila. Funciona igual en SQLite y
+  PostgreSQL y recupera las tareas cuyo lease caducó (worker caído)
+- run_task ejecuta la tarea y renueva el lease mientras corre (LeaseHeartbeat):
+  los reintentos, el failover entre endpoints o la cola del scheduler pueden
+  alargar una llamada más allá del lease. Si falla vuelve a 'pending' con
+  backoff exponencial (AI_API.resilience.RetryPolicy) hasta AI_TASK_MAX_ATTEMPTS
+- Worker es el bucle de los hilos de "manage.py run_ai_workers". El número de
+  workers acota las inferencias concurrentes de todo el despliegue
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from productplatform import metrics
+from .blobs import load_image_url, store_image_urls
+from .models import AIRequest
+from .resilience import RetryPolicy
+
+LEASE_SECONDS = getattr(settings, 'AI_TASK_LEASE_SECONDS', 600)
+MAX_ATTEMPTS = getattr(settings, 'AI_TASK_MAX_ATTEMPTS', 3)
+RETRY_BACKOFF_BASE = getattr(settings, 'AI_TASK_RETRY_BACKOFF_BASE', 5.0)
+RETRY_BACKOFF_MAX = getattr(settings, 'AI_TASK_RETRY_BACKOFF_MAX', 300.0)
+POLL_INTERVAL = getattr(settings, 'AI_TASK_POLL_INTERVAL', 1.0)
+
+ANALYZE_PRODUCT = 'analyze_product'
+TERMINAL_STATUSES = ('completed', 'failed')
+# Tareas candidatas revisadas por cada intento de claim
+CLAIM_CANDIDATES = 10
+
+
+def _analyze_product(ai_request: AIRequest) -> Dict[str, Any]:
+    from .registry import get_product_ai_service
+
+    image_urls = [load_image_url(ref) for ref in ai_request.image_urls]
+    return get_product_ai_service().analyze_product_complete(
+        image_urls, user=ai_request.user, ai_request=ai_request
+    )
+
+
+# Nombre de tarea -> función (AIRequest) -> resultado con 'success'
+HANDLERS: Dict[str, Callable[[AIRequest], Dict[str, Any]]] = {
+    ANALYZE_PRODUCT: _analyze_product,
+}
+
+
+def enqueue_analysis(image_urls: List[str], user=None) -> AIRequest:
+    """
+    Encola un análisis de producto. Las data URLs se guardan como referencias
+    al almacén de blobs, igual que en la auditoría
+    """
+    return AIRequest.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        request_type='image_analysis',
+        status='pending',
+        task=ANALYZE_PRODUCT,
+        prompt='',
+        image_urls=store_image_urls(image_urls),
+        run_after=timezone.now(),
+    )
+
+
+def _claimable(now) -> Q:
+    return (
+        Q(status='pending', run_after__lte=now)
+        | Q(status='processing', lease_expires_at__lt=now)
+    )
+
+
+def claim(worker_id: str) -> Optional[AIRequest]:
+    """
+    Toma la tarea más antigua disponible, o None si no hay ninguna
+    """
+    now = timezone.now()
+    # exclude(task='') repite la condición del índice parcial airequest_task_queue_idx
+    queue = AIRequest.objects.exclude(task='').filter(task__in=HANDLERS)
+    candidates = list(
+        queue.filter(_claimable(now)).order_by('run_after', 'pk').values_list('pk', flat=True)[:CLAIM_CANDIDATES]
+    )
+    for pk in candidates:
+        claimed = queue.filter(_claimable(now), pk=pk).update(
+            status='processing',
+            leased_by=worker_id,
+            lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return AIRequest.objects.select_related('user').get(pk=pk)
+    return None
+
+
+def _finish(ai_request: AIRequest, worker_id: str, **fields) -> bool:
+    """
+    Guarda el desenlace solo si el lease sigue siendo de este worker
+    """
+    updated = AIRequest.objects.filter(
+        pk=ai_request.pk, status='processing', leased_by=worker_id
+    ).update(lease_expires_at=None, updated_at=timezone.now(), **fields)
+    return bool(updated)
+
+
+class LeaseHeartbeat:
+    """
+    Hilo que extiende el lease de una tarea cada tercio de su duración hasta
+    que el handler termina, mientras siga siendo de este worker
+    """
+
+    def __init__(self, ai_request: AIRequest, worker_id: str, lease_seconds: float = None):
+        self.ai_request = ai_request
+        self.worker_id = worker_id
+        self.lease_seconds = LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def renew(self) -> bool:
+        updated = AIRequest.objects.filter(
+            pk=self.ai_request.pk, status='processing', leased_by=self.worker_id
+        ).update(lease_expires_at=timezone.now() + timedelta(seconds=self.lease_seconds))
+        return bool(updated)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                if not self.renew():
+                    return
+        finally:
+            connection.close()
+
+    def __enter__(self) -> 'LeaseHeartbeat':
+        self._thread = threading.Thread(
+            target=self._run, name=f'ai-lease-{self.ai_request.pk}', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_task(ai_request: AIRequest, worker_id: str) -> str:
+    """
+    Ejecuta una tarea tomada con claim. Devuelve el estado en que queda
+    ('completed', 'failed', 'pending' si se reintentará o 'lost' si otro
+    worker se quedó con el lease)
+    """
+    start = time.time()
+    try:
+        with LeaseHeartbeat(ai_request, worker_id), metrics.span(f'ai.task.{ai_request.task}'):
+            result = HANDLERS[ai_request.task](ai_request)
+    except Exception as e:
+        result = {'success': False, 'error': f'Unexpected error: {str(e)}'}
+
+    output = {
+        'response_text': ai_request.response_text,
+        'response_tokens': ai_request.response_tokens,
+        'processing_time': time.time() - start,
+        'prompt': ai_request.prompt,
+        'model_name': ai_request.model_name,
+        'max_tokens': ai_request.max_tokens,
+        'temperature': ai_request.temperature,
+    }
+    if result.get('success'):
+        status = 'completed'
+        saved = _finish(ai_request, worker_id, status=status, result=result, error_message=None, **output)
+    elif ai_request.attempts < MAX_ATTEMPTS:
+        status = 'pending'
+        delay = RetryPolicy(MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX).delay(ai_request.attempts - 1)
+        saved = _finish(
+            ai_request, worker_id, status=status, error_message=result.get('error'),
+            run_after=timezone.now() + timedelta(seconds=delay), leased_by='', **output
+        )
+    else:
+        status = 'failed'
+        saved = _finish(ai_request, worker_id, status=status, result=result,
+                        error_message=result.get('error'), **output)
+
+    metrics.counter('ai_tasks_total', 'Tareas de IA ejecutadas por desenlace',
+                    labels={'task': ai_request.task, 'status': status if saved else 'lost'}).inc()
+    return status if saved else 'lost'
+
+
+def task_state(ai_request: AIRequest) -> Dict[str, Any]:
+    """
+    Estado público de una tarea para la API de consulta
+    """
+    state = {
+        'job_id': ai_request.pk,
+        'task': ai_request.task,
+        'status': ai_request.status,
+        'attempts': ai_request.attempts,
+        'created_at': ai_request.created_at.isoformat(),
+        'updated_at': ai_request.updated_at.isoformat(),
+    }
+    if ai_request.status == 'completed':
+        state['result'] = ai_request.result
+    elif ai_request.error_message:
+        state['error'] = ai_request.error_message
+    return state
+
+
+def default_worker_id(index: int) -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+class Worker:
+    """
+    Bucle de un worker: toma tareas mientras haya y espera POLL_INTERVAL si
+    la cola está vacía. stop_event detiene el bucle al terminar la tarea en curso
+    """
+
+    def __init__(self, worker_id: str, stop_event: threading.Event = None,
+                 poll_interval: float = POLL_INTERVAL, on_task: Callable = None):
+        self.worker_id = worker_id
+        self.stop_event = stop_event or threading.Event()
+        self.poll_interval = poll_interval
+        self.on_task = on_task
+        self.processed = 0
+
+    def run_once(self) -> bool:
+        """
+        Procesa una tarea si la hay. Devuelve si encontró alguna
+        """
+        close_old_connections()
+        ai_request = claim(self.worker_id)
+        if ai_request is None:
+            return False
+        status = run_task(ai_request, self.worker_id)
+        self.processed += 1
+        if self.on_task:
+            self.on_task(self, ai_request, status)
+        return True
+
+    def run(self, drain: bool = False):
+        """
+        drain: terminar en cuanto la cola esté vacía
+        """
+        try:
+            while not self.stop_event.is_set():
+                if not self.run_once():
+                    if drain:
+                        return
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,798 @@
+import asyncio
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from productplatform import metrics
+
+from . import blobs, registry, tasks, views
+from .audit import AIRequestAuditLogger
+from .balancer import Endpoint, EndpointPool
+from .cache import BaseAnalysisCache, DatabaseAnalysisCache, FileAnalysisCache
+from .images import encode_data_url, image_to_data_url, parse_data_url, prepare_image
+from .mock_server import MockGemmaServer
+from .models import AIAnalysisCache, AIConfiguration, AIRequest
+from .parsing import AnalysisParseError, IncrementalJSONParser, parse_product_analysis
+from .resilience import (
+    HEDGE_MIN_SAMPLES, CircuitBreaker, CircuitOpenError, LatencyTracker, ResilientSession, RetryPolicy,
+)
+from .scheduler import BatchScheduler
+from .services import AsyncGemma3Service
+from .streaming import STREAM_DONE, PartialFieldExtractor, chunk_delta, parse_sse_line, sse_event
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResilientSessionTests(SimpleTestCase):
+    """
+    Circuit breaker y reintentos (AI_API.resilience) contra el servidor simulado
+    """
+
+    def setUp(self):
+        self.server = MockGemmaServer(latency=0.0).start()
+        self.addCleanup(self.server.stop)
+        self.clock = FakeClock()
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        self.http = ResilientSession(self.session, self.server.url, retry=RetryPolicy(3, 0, 0),
+                                     sleep=lambda seconds: None, hedge=False)
+        self.http.breaker = CircuitBreaker(failure_rate=0.5, window=10, min_requests=3,
+                                           reset_timeout=30, clock=self.clock)
+
+    def post(self, timeout=(1, 5)):
+        return self.http.post(f'{self.server.url}/v1/chat/completions', json={'messages': []}, timeout=timeout)
+
+    def fail_with(self, status_code):
+        self.server.error_rate = 1.0
+        self.server.error_status = status_code
+
+    def test_503_is_retried_until_attempts_run_out(self):
+        self.fail_with(503)
+        self.assertEqual(self.post().status_code, 503)
+        self.assertEqual(self.server.stats['requests'], 3)
+
+        self.server.error_rate = 0.0
+        self.http.breaker = CircuitBreaker(clock=self.clock)
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.server.stats['requests'], 4)
+
+    def test_400_is_not_retried_and_does_not_trip_the_breaker(self):
+        self.fail_with(400)
+        for _ in range(5):
+            self.assertEqual(self.post().status_code, 400)
+        self.assertEqual(self.server.stats['requests'], 5)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_500_trips_the_breaker(self):
+        self.fail_with(500)
+        for _ in range(3):
+            self.assertEqual(self.post().status_code, 500)
+        self.assertEqual(self.server.stats['requests'], 3)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            self.post()
+        self.assertEqual(self.server.stats['requests'], 3)
+
+    def test_half_open_probe_closes_or_reopens_the_circuit(self):
+        self.fail_with(500)
+        for _ in range(3):
+            self.post()
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.OPEN)
+
+        # La prueba falla: el circuito vuelve a abrirse sin más requests
+        self.clock.now += 31
+        self.assertEqual(self.post().status_code, 500)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.server.stats['requests'], 4)
+
+        # La prueba funciona: el circuito se cierra
+        self.server.error_rate = 0.0
+        self.clock.now += 31
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_read_timeout_is_not_retried(self):
+        self.server.latency = 0.5
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.post(timeout=(1, 0.1))
+        self.assertEqual(self.server.stats['requests'], 1)
+
+    def test_connection_errors_are_retried_within_the_deadline(self):
+        self.server.stop()
+        attempts = []
+        self.http.sleep = attempts.append
+        self.http.retry = RetryPolicy(3, 0.01, 0.01)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.post()
+        self.assertEqual(len(attempts), 2)
+
+        # Un backoff de 10 s no cabe en el deadline (el read timeout de 5 s): no se reintenta
+        attempts.clear()
+        self.http.retry = RetryPolicy(3, 10, 10)
+        self.http.retry.delay = lambda attempt: 10
+        self.http.breaker = CircuitBreaker(clock=self.clock)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.post()
+        self.assertEqual(attempts, [])
+
+    def test_unexpected_error_releases_the_half_open_probe(self):
+        self.fail_with(500)
+        for _ in range(3):
+            self.post()
+        self.clock.now += 31
+        with mock.patch.object(self.http, '_send', side_effect=RuntimeError('bug')):
+            with self.assertRaises(RuntimeError):
+                self.post()
+
+        self.server.error_rate = 0.0
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_health_check_is_one_failure_in_the_window(self):
+        for _ in range(5):
+            self.assertEqual(self.post().status_code, 200)
+        self.http.breaker.record_health(False)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.CLOSED)
+
+        self.fail_with(500)
+        for _ in range(4):
+            self.post()
+        self.http.breaker.record_health(False)
+        self.assertEqual(self.http.breaker.state, CircuitBreaker.OPEN)
+
+    def test_slow_request_is_hedged(self):
+        self.http.hedge = True
+        self.http.latency = LatencyTracker()
+        for _ in range(HEDGE_MIN_SAMPLES):
+            self.http.latency.record(0.05)
+        self.server.latency = 0.3
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.server.stats['requests'], 2)
+        # Dejar terminar la request perdedora antes de cerrar la sesión
+        time.sleep(0.4)
+
+
+class EndpointPoolTests(SimpleTestCase):
+    """
+    Balanceo 'ewma' entre endpoints (AI_API.balancer)
+    """
+
+    def setUp(self):
+        self.services = [
+            mock.Mock(config=AIConfiguration(name=name, lightning_endpoint=f'http://{name}.invalid'))
+            for name in ('a', 'b')
+        ]
+        self.pool = EndpointPool(self.services, strategy='ewma', failure_penalty=10.0)
+
+    def test_failing_endpoint_loses_to_a_healthy_one(self):
+        failing, healthy = self.services
+        failing.generate_response.return_value = {'success': False, 'error': 'Connection refused'}
+        healthy.generate_response.return_value = {'success': True}
+
+        for _ in range(10):
+            self.pool.generate_response('hola')
+
+        self.assertEqual(failing.generate_response.call_count, 1)
+        self.assertEqual(healthy.generate_response.call_count, 9)
+        self.assertGreaterEqual(self.pool.endpoints[0].ewma_latency, 10.0)
+
+    def test_unmeasured_endpoint_scores_with_the_pool_mean(self):
+        measured, unmeasured = self.pool.endpoints
+        measured.ewma_latency = 0.5
+        self.assertIs(self.pool.choose(), unmeasured)
+
+        unmeasured.outstanding = 1
+        self.assertIs(self.pool.choose(), measured)
+
+    def test_probe_errors_are_logged(self):
+        def broken_probe():
+            self.pool._stop.set()
+            raise KeyError('status')
+
+        with mock.patch.object(self.pool, 'probe', broken_probe), \
+                self.assertLogs('AI_API.balancer', level='ERROR') as logs:
+            self.pool._run_prober(0)
+        self.assertIn("KeyError: 'status'", logs.output[0])
+
+
+class AsyncGemma3ServiceTests(SimpleTestCase):
+    """
+    El servicio asíncrono (AI_API.services) siempre devuelve al pool las requests en curso
+    """
+
+    def setUp(self):
+        config = AIConfiguration(name='a', lightning_endpoint='http://a.invalid')
+        self.endpoint = Endpoint(mock.Mock(config=config))
+        self.service = AsyncGemma3Service(config, endpoint=self.endpoint)
+
+    def test_failed_record_does_not_leak_the_outstanding_counter(self):
+        with mock.patch.object(self.service, '_new_request_record', side_effect=RuntimeError('disco lleno')):
+            with self.assertRaises(RuntimeError):
+                async_to_sync(self.service.generate_response)('hola')
+        self.assertEqual(self.endpoint.outstanding, 0)
+
+    def test_cancelled_request_does_not_leak_the_outstanding_counter(self):
+        async def hang(*args):
+            await asyncio.sleep(10)
+
+        async def cancel_midway():
+            with mock.patch.object(self.service, '_generate_response', hang):
+                task = asyncio.ensure_future(self.service.generate_response('hola'))
+                await asyncio.sleep(0.01)
+                self.assertEqual(self.endpoint.outstanding, 1)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        async_to_sync(cancel_midway)()
+        self.assertEqual(self.endpoint.outstanding, 0)
+
+    def test_http_client_is_reused(self):
+        async def clients():
+            return self.service.http, self.service.http
+
+        first, second = async_to_sync(clients)()
+        self.assertIs(first, second)
+
+
+class IncrementalJSONParserTests(SimpleTestCase):
+    """
+    Decodificación tolerante de la salida del modelo (AI_API.parsing)
+    """
+
+    def feed_by_char(self, text):
+        parser = IncrementalJSONParser()
+        for char in text:
+            parser.feed(char)
+        return parser
+
+    def test_fenced_object_after_prose(self):
+        text = 'Aquí tienes el análisis:\n```json\n{"title": "Lámpara", "description": "LED"}\n```\nSaludos'
+        analysis = parse_product_analysis(text)
+        self.assertEqual((analysis.title, analysis.description), ('Lámpara', 'LED'))
+        self.assertFalse(analysis.repaired)
+
+    def test_fence_is_preferred_over_an_earlier_object_in_the_prose(self):
+        text = 'Formato {"x": 1}:\n```json\n{"title": "Lámpara", "description": "LED"}\n```'
+        self.assertEqual(self.feed_by_char(text).value(), {'title': 'Lámpara', 'description': 'LED'})
+        self.assertEqual(parse_product_analysis(text).title, 'Lámpara')
+
+    def test_prose_containing_braces_is_skipped(self):
+        for text in (
+            'Rellené {el título} y {la descripción}: {"title": "Mesa", "description": "Roble"}',
+            'Tallas {S, M}\n```\n{"title": "Mesa", "description": "Roble"}\n```',
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(self.feed_by_char(text).value(), {'title': 'Mesa', 'description': 'Roble'})
+                self.assertEqual(parse_product_analysis(text).title, 'Mesa')
+
+    def test_trailing_commas(self):
+        parser = self.feed_by_char('{"title": "Mesa", "tags": ["a", "b",], "description": "Roble",}')
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.value(), {'title': 'Mesa', 'tags': ['a', 'b'], 'description': 'Roble'})
+
+    def test_truncated_string_is_closed(self):
+        analysis = parse_product_analysis('{"title": "Mesa", "description": "Mesa de roble maci')
+        self.assertEqual(analysis.description, 'Mesa de roble maci')
+        self.assertTrue(analysis.repaired)
+
+    def test_half_written_unicode_escape(self):
+        for cut in ('\\', '\\u', '\\u00', '\\u00e'):
+            with self.subTest(cut=cut):
+                parser = self.feed_by_char('{"title": "Caf\\u00e9", "description": "Caf' + cut)
+                self.assertEqual(parser.value(), {'title': 'Café', 'description': 'Caf'})
+
+    def test_text_without_json(self):
+        with self.assertRaises(AnalysisParseError):
+            parse_product_analysis('Lo siento, no puedo analizar {esta imagen}.')
+
+
+class AITaskQueueTests(TestCase):
+    """
+    Cola de tareas de IA en la base de datos (AI_API.tasks): claim, lease y reintentos
+    """
+
+    def setUp(self):
+        self.tasks = tasks
+        self.job = AIRequest.objects.create(
+            request_type='image_analysis', status='pending', task=tasks.ANALYZE_PRODUCT,
+            prompt='', image_urls=[], run_after=timezone.now(),
+        )
+
+    def run_with(self, handler):
+        with mock.patch.dict(self.tasks.HANDLERS, {self.tasks.ANALYZE_PRODUCT: handler}):
+            ai_request = self.tasks.claim('worker-a')
+            return ai_request, self.tasks.run_task(ai_request, 'worker-a')
+
+    def test_claimed_task_is_leased_to_one_worker(self):
+        ai_request = self.tasks.claim('worker-a')
+        self.assertEqual((ai_request.pk, ai_request.status, ai_request.attempts), (self.job.pk, 'processing', 1))
+        self.assertIsNone(self.tasks.claim('worker-b'))
+
+        # Lease caducado: otro worker recupera la tarea y el primero ya no puede cerrarla
+        AIRequest.objects.filter(pk=self.job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.tasks.claim('worker-b').attempts, 2)
+        with mock.patch.dict(self.tasks.HANDLERS, {self.tasks.ANALYZE_PRODUCT: lambda job: {'success': True}}):
+            self.assertEqual(self.tasks.run_task(ai_request, 'worker-a'), 'lost')
+
+    def test_failures_are_retried_until_max_attempts(self):
+        def failing(job):
+            raise ConnectionError('modelo caído')
+
+        for _ in range(1, self.tasks.MAX_ATTEMPTS):
+            ai_request, outcome = self.run_with(failing)
+            self.assertEqual(outcome, 'pending')
+            AIRequest.objects.filter(pk=self.job.pk).update(run_after=timezone.now())
+        ai_request, outcome = self.run_with(failing)
+
+        self.assertEqual(outcome, 'failed')
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), ('failed', self.tasks.MAX_ATTEMPTS))
+        self.assertIn('modelo caído', self.job.error_message)
+
+    def test_job_status_returns_result_to_its_owner(self):
+        owner = User.objects.create_user('queue-owner', password='x')
+        AIRequest.objects.filter(pk=self.job.pk).update(user=owner)
+        self.run_with(lambda job: {'success': True, 'data': {'title': 'Lámpara'}})
+
+        url = reverse('ai_api:analyze_product_job_status', args=[self.job.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(owner)
+        body = self.client.get(url, {'wait': 1}).json()
+        self.assertEqual((body['status'], body['result']['data']['title']), ('completed', 'Lámpara'))
+
+    def test_job_status_long_poll_waits_for_the_result(self):
+        owner = User.objects.create_user('queue-owner', password='x')
+        AIRequest.objects.filter(pk=self.job.pk).update(user=owner)
+        self.async_client.force_login(owner)
+        url = reverse('ai_api:analyze_product_job_status', args=[self.job.pk])
+
+        async def finish_later():
+            await asyncio.sleep(0.3)
+            await AIRequest.objects.filter(pk=self.job.pk).aupdate(status='completed', result={'success': True})
+
+        async def poll():
+            response, _ = await asyncio.gather(self.async_client.get(url, {'wait': 5}), finish_later())
+            return response
+
+        response = async_to_sync(poll)()
+        self.assertEqual(response.json()['status'], 'completed')
+
+
+class LeaseHeartbeatTests(TransactionTestCase):
+    """
+    El lease de una tarea se renueva mientras el handler sigue corriendo
+    """
+
+    def test_long_task_keeps_its_lease(self):
+        AIRequest.objects.create(
+            request_type='image_analysis', status='pending', task=tasks.ANALYZE_PRODUCT,
+            prompt='', image_urls=[], run_after=timezone.now(),
+        )
+        stolen = []
+
+        def slow(job):
+            # Dura tres leases: sin renovarlo, otro worker tomaría la tarea
+            time.sleep(0.9)
+            stolen.append(tasks.claim('worker-b'))
+            return {'success': True}
+
+        with mock.patch.object(tasks, 'LEASE_SECONDS', 0.3), \
+                mock.patch.dict(tasks.HANDLERS, {tasks.ANALYZE_PRODUCT: slow}):
+            ai_request = tasks.claim('worker-a')
+            self.assertEqual(tasks.run_task(ai_request, 'worker-a'), 'completed')
+        self.assertEqual(stolen, [None])
+
+
+class AuditLoggerTests(TransactionTestCase):
+    """
+    Escrituras agrupadas de la auditoría de AIRequest (AI_API.audit)
+    """
+
+    def setUp(self):
+        # Los loggers de prueba no deben escribir al salir, con la base de datos ya destruida
+        self.enterContext(mock.patch('AI_API.audit.atexit.register'))
+
+    @staticmethod
+    def record(**fields):
+        return AIRequest(**{'request_type': 'chat', 'status': 'completed', 'prompt': 'hola', **fields})
+
+    def wait_for_rows(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while AIRequest.objects.count() < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return AIRequest.objects.count()
+
+    def test_sync_mode_saves_immediately(self):
+        logger = AIRequestAuditLogger(mode='sync')
+        self.assertIsNotNone(logger.log(self.record()).pk)
+
+    def test_buffer_is_flushed_when_the_batch_is_full(self):
+        logger = AIRequestAuditLogger(mode='buffered', batch_size=3, flush_interval=60)
+        for _ in range(2):
+            logger.log(self.record())
+        time.sleep(0.1)
+        self.assertEqual(AIRequest.objects.count(), 0)
+
+        logger.log(self.record())
+        self.assertEqual(self.wait_for_rows(3), 3)
+
+    def test_buffer_is_flushed_after_the_interval(self):
+        logger = AIRequestAuditLogger(mode='buffered', batch_size=100, flush_interval=0.1)
+        logger.log(self.record())
+        self.assertEqual(self.wait_for_rows(1), 1)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        logger = AIRequestAuditLogger(mode='buffered', batch_size=100, flush_interval=60)
+        logger.log(self.record(prompt='válido'))
+        logger.log(self.record(prompt=None))    # viola NOT NULL: hace fallar el lote
+        logger.log(self.record(prompt='también válido'))
+        dropped = metrics.counter('ai_audit_dropped_total')
+        before = dropped.value
+
+        with self.assertLogs('AI_API.audit', level='ERROR') as logs:
+            logger.flush()
+
+        self.assertEqual(len(logs.records), 2)    # el lote y la fila inválida
+        self.assertEqual(
+            sorted(AIRequest.objects.values_list('prompt', flat=True)), ['también válido', 'válido']
+        )
+        self.assertEqual(dropped.value, before + 1)
+
+    def test_buffer_is_flushed_at_exit(self):
+        with mock.patch('AI_API.audit.atexit.register') as register:
+            logger = AIRequestAuditLogger(mode='buffered', batch_size=100, flush_interval=60)
+            logger.log(self.record())
+            logger.log(self.record())
+        register.assert_called_once_with(logger.flush)
+
+        exit_flush = register.call_args.args[0]
+        exit_flush()
+        self.assertEqual(AIRequest.objects.count(), 2)
+
+
+class AnalysisCacheTests(TestCase):
+    """
+    Backends de la caché de análisis (AI_API.cache): recorte a MAX_ENTRIES cada CULL_EVERY escrituras
+    """
+
+    options = {'MAX_ENTRIES': 2, 'CULL_EVERY': 3}
+
+    def fill(self, cache, count):
+        for index in range(count):
+            cache.set(f'clave{index}', {'title': str(index)})
+
+    def test_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseAnalysisCache()
+
+    def test_file_cache_culls_every_n_sets(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        cache = FileAnalysisCache({**self.options, 'LOCATION': location})
+
+        self.fill(cache, 2)
+        with mock.patch('AI_API.cache.os.scandir', wraps=os.scandir) as scandir:
+            cache.set('clave2', {'title': '2'})
+            cache.set('clave3', {'title': '3'})
+        self.assertEqual(scandir.call_count, 1)
+        # Tras el recorte de la tercera escritura quedan 2; la cuarta aún no recorta
+        self.assertEqual(len(os.listdir(location)), 3)
+        self.assertEqual(cache.get('clave3'), {'title': '3'})
+
+    def test_database_cache_culls_every_n_sets(self):
+        cache = DatabaseAnalysisCache({**self.options, 'MAX_ENTRIES': 1})
+        self.fill(cache, 2)
+        self.assertEqual(AIAnalysisCache.objects.count(), 2)
+        cache.set('clave2', {'title': '2'})
+        self.assertEqual(AIAnalysisCache.objects.count(), 1)
+        self.assertEqual(cache.get('clave2'), {'title': '2'})
+
+
+class RegistryTests(TestCase):
+    """
+    El pool compartido (AI_API.registry) solo se reconstruye si cambia la configuración
+    """
+
+    def setUp(self):
+        self.config = AIConfiguration.objects.create(
+            name='principal', lightning_endpoint='http://a.invalid', api_key='x'
+        )
+        self.enterContext(mock.patch.multiple(
+            registry, _service=None, _service_version=None, _service_fingerprint=None,
+            _checked_at=0.0, HEALTH_PROBE_INTERVAL=0,
+        ))
+
+    def test_pool_survives_max_age_without_changes(self):
+        pool = registry.get_gemma_service()
+        with mock.patch.object(registry, 'CONFIG_MAX_AGE', 0):
+            self.assertIs(registry.get_gemma_service(), pool)
+
+    def test_pool_is_rebuilt_on_signal_or_external_change(self):
+        pool = registry.get_gemma_service()
+        self.config.timeout_seconds = 60
+        self.config.save()
+        rebuilt = registry.get_gemma_service()
+        self.assertIsNot(rebuilt, pool)
+
+        # Cambio sin señal (otro proceso): se detecta al pasar CONFIG_MAX_AGE
+        AIConfiguration.objects.filter(pk=self.config.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertIs(registry.get_gemma_service(), rebuilt)
+        with mock.patch.object(registry, 'CONFIG_MAX_AGE', 0):
+            self.assertIsNot(registry.get_gemma_service(), rebuilt)
+
+
+class BlobStoreTests(TestCase):
+    """
+    Almacén de imágenes por contenido (AI_API.blobs) y migración 0004 que compacta AIRequest.image_urls
+    """
+
+    content = b'\xff\xd8\xff imagen jpeg'
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=self.location, base_url=None, allow_overwrite=True)
+        self.enterContext(mock.patch.object(blobs, 'blob_storage', self.storage))
+        self.data_url = encode_data_url('image/jpeg', self.content)
+        self.ref = f'sha256:{hashlib.sha256(self.content).hexdigest()}.jpg'
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.location) for name in names]
+
+    def test_data_url_is_stored_once_by_content(self):
+        self.assertEqual(blobs.store_image_urls([self.data_url, 'https://example.com/a.jpg']),
+                         [self.ref, 'https://example.com/a.jpg'])
+        self.assertEqual(blobs.load_image_url(self.ref), self.data_url)
+
+        # Dos escrituras que compiten (ambas ven que no existe) no dejan copias renombradas
+        with mock.patch.object(self.storage, 'exists', return_value=False):
+            blobs.store_image_url(self.data_url)
+            blobs.store_image_url(self.data_url)
+        self.assertEqual(self.stored_files(), [self.ref[len('sha256:'):]])
+
+    def test_blobs_are_served_only_to_staff(self):
+        blobs.store_image_url(self.data_url)
+        url = blobs.blob_url(self.ref)
+        self.assertFalse(url.startswith(settings.MEDIA_URL))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/jpeg'))
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_migration_compacts_only_data_urls(self):
+        migration = importlib.import_module('AI_API.migrations.0004_compact_airequest_image_urls')
+        ai_request = AIRequest.objects.create(
+            prompt='hola', image_urls=[self.data_url, self.ref, 'https://example.com/a.jpg'],
+        )
+        with mock.patch.object(migration, 'blob_storage', self.storage):
+            migration.compact_image_urls(django_apps, None)
+
+        ai_request.refresh_from_db()
+        self.assertEqual(ai_request.image_urls, [self.ref, self.ref, 'https://example.com/a.jpg'])
+        self.assertEqual(blobs.load_image_url(self.ref), self.data_url)
+
+
+class BatchSchedulerTests(SimpleTestCase):
+    """
+    Micro-lotes y control de admisión del planificador (AI_API.scheduler)
+    """
+
+    def make_scheduler(self, service, **kwargs):
+        return BatchScheduler(lambda: service, name=f'test_scheduler_{id(service)}', **kwargs)
+
+    def test_concurrent_calls_are_grouped_in_one_batch(self):
+        service = mock.Mock()
+        service.generate_response.side_effect = lambda **kwargs: {'success': True, 'prompt': kwargs['prompt']}
+        scheduler = self.make_scheduler(service, max_batch_size=4, max_wait=0.2)
+
+        futures = [scheduler.submit(prompt=f'p{i}') for i in range(3)]
+
+        self.assertEqual([f.result(timeout=2)['prompt'] for f in futures], ['p0', 'p1', 'p2'])
+        batches = scheduler.stats()['batch_size']
+        self.assertEqual((batches['count'], batches['sum']), (1, 3))
+
+    def test_in_flight_calls_never_exceed_the_limit(self):
+        lock, release = threading.Lock(), threading.Event()
+        state = {'active': 0, 'peak': 0}
+
+        def generate_response(**kwargs):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            release.wait(2)
+            with lock:
+                state['active'] -= 1
+            return {'success': True}
+
+        service = mock.Mock(generate_response=generate_response)
+        scheduler = self.make_scheduler(service, max_batch_size=8, max_wait=0, max_in_flight=2)
+
+        futures = [scheduler.submit(prompt='p') for _ in range(5)]
+        deadline = time.monotonic() + 2
+        while state['active'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        self.assertEqual(state['peak'], 2)
+        self.assertEqual(sum(f.done() for f in futures), 0)
+
+        release.set()
+        self.assertTrue(all(f.result(timeout=2)['success'] for f in futures))
+        self.assertEqual(state['peak'], 2)
+
+
+class SchedulerStatsViewTests(TestCase):
+    """
+    /api/ai/scheduler/stats/ exige staff o METRICS_TOKEN y no crea el planificador si está desactivado
+    """
+
+    def setUp(self):
+        self.url = reverse('ai_api:scheduler_stats')
+        self.enterContext(mock.patch.object(registry, '_scheduler', None))
+
+    def test_requires_staff_or_metrics_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        user = User.objects.create_user('vendedor', password='x')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_metrics_token_is_accepted(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_disabled_scheduler_is_not_created(self):
+        with mock.patch.object(registry, 'BATCH_SCHEDULER', False):
+            response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.json(), {'enabled': False})
+        self.assertIsNone(registry._scheduler)
+
+        with mock.patch.object(registry, 'BATCH_SCHEDULER', True):
+            response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertTrue(response.json()['enabled'])
+        self.assertIn('batch_size', response.json())
+        self.assertIsNotNone(registry._scheduler)
+
+
+class ImagePreparationTests(SimpleTestCase):
+    """
+    Normalización de las imágenes antes de enviarlas al modelo (AI_API.images)
+    """
+
+    def make_image(self, size=(400, 200), mode='RGB', color=(200, 30, 30), image_format='JPEG', **save_kwargs):
+        buffer = io.BytesIO()
+        Image.new(mode, size, color).save(buffer, format=image_format, **save_kwargs)
+        buffer.seek(0)
+        return buffer
+
+    def decode(self, content):
+        return Image.open(io.BytesIO(content))
+
+    def test_exif_orientation_is_applied_and_image_downscaled(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotar 90° en sentido horario
+        content_type, content = prepare_image(self.make_image(exif=exif), max_side=100)
+
+        self.assertEqual(content_type, 'image/jpeg')
+        image = self.decode(content)
+        self.assertEqual(image.size, (50, 100))
+        self.assertNotIn(0x0112, image.getexif())
+
+    def test_transparent_png_gets_a_white_background(self):
+        png = self.make_image(size=(10, 10), mode='RGBA', color=(0, 0, 0, 0), image_format='PNG')
+        content_type, content = prepare_image(png, output_format='jpeg')
+
+        image = self.decode(content)
+        self.assertEqual((content_type, image.format, image.mode), ('image/jpeg', 'JPEG', 'RGB'))
+        self.assertTrue(all(channel > 250 for channel in image.getpixel((5, 5))))
+
+    def test_small_images_are_not_upscaled(self):
+        _, content = prepare_image(self.make_image(size=(40, 30)), output_format='WEBP')
+        image = self.decode(content)
+        self.assertEqual((image.format, image.size), ('WEBP', (40, 30)))
+
+    def test_unreadable_file_is_sent_unchanged(self):
+        data_url = image_to_data_url(io.BytesIO(b'no es una imagen'), fallback_content_type='image/png')
+        self.assertEqual(parse_data_url(data_url), ('image/png', b'no es una imagen'))
+
+
+class StreamingTests(SimpleTestCase):
+    """
+    Lectura del stream de chat completions y reenvío como server-sent events (AI_API.streaming)
+    """
+
+    events = [
+        ('field', {'field': 'title', 'value': 'Taza'}),
+        ('done', {'success': True, 'data': {'title': 'Taza de cerámica'}}),
+    ]
+    expected_body = (
+        'event: field\ndata: {"field": "title", "value": "Taza"}\n\n'
+        'event: done\ndata: {"success": true, "data": {"title": "Taza de cerámica"}}\n\n'
+    )
+
+    def post(self):
+        image = SimpleUploadedFile('taza.jpg', b'no es una imagen', 'image/jpeg')
+        request = RequestFactory().post('/api/ai/analyze-product/stream/', {'image': image})
+        request.user = AnonymousUser()
+        request.auser = mock.AsyncMock(return_value=request.user)
+        return request
+
+    def test_sse_lines_are_parsed(self):
+        self.assertIsNone(parse_sse_line(''))
+        self.assertIsNone(parse_sse_line(': keep-alive'))
+        self.assertEqual(parse_sse_line('data: [DONE]'), STREAM_DONE)
+        chunk = parse_sse_line('data: {"choices": [{"delta": {"content": "Ho"}}]}')
+        self.assertEqual(chunk_delta(chunk), 'Ho')
+        self.assertEqual(chunk_delta({'choices': [{'delta': {}}]}), '')
+        self.assertEqual(chunk_delta({'choices': []}), '')
+
+    def test_event_framing(self):
+        self.assertEqual(sse_event('field', {'value': 'Año'}), 'event: field\ndata: {"value": "Año"}\n\n')
+
+    def test_partial_fields_are_reported_once_per_change(self):
+        extractor = PartialFieldExtractor()
+        self.assertEqual(extractor.feed('{"title": "Ta'), [('title', 'Ta')])
+        self.assertEqual(extractor.feed(''), [])
+        self.assertEqual(extractor.feed('za", "description": "De'), [('title', 'Taza'), ('description', 'De')])
+        self.assertEqual(extractor.text, '{"title": "Taza", "description": "De')
+
+    def test_stream_view_sends_events(self):
+        service = mock.Mock()
+        service.stream_analysis.return_value = iter(self.events)
+        with mock.patch.object(views, 'get_product_ai_service', return_value=service):
+            response = views.analyze_product_stream(self.post())
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        self.assertEqual(b''.join(response.streaming_content).decode(), self.expected_body)
+
+    def test_async_stream_view_sends_events(self):
+        async def stream_analysis(image_urls, user=None):
+            for event in self.events:
+                yield event
+
+        service = mock.Mock(stream_analysis=stream_analysis)
+        request = self.post()
+
+        async def consume():
+            response = await views.analyze_product_stream_async(request)
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        with mock.patch.object(views.AsyncProductAIService, 'create', mock.AsyncMock(return_value=service)):
+            response, body = async_to_sync(consume)()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(body.decode(), self.expected_body)
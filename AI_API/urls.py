@@ -1,4 +1,5 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from . import views
 
 app_name = 'ai_api'
@@ -7,5 +8,19 @@ app_name = 'ai_api'
 urlpatterns = [
     # Endpoints principales
     path('health/', views.health_check, name='health_check'),
-    path('analyze-product/', views.analyze_product_image_upload, name='analyze_product_image_upload'),
+    path('scheduler/stats/', views.scheduler_stats, name='scheduler_stats'),
+    path(
+        'analyze-product/',
+        views.analyze_product_image_upload_async if settings.AI_ASYNC_VIEWS else views.analyze_product_image_upload,
+        name='analyze_product_image_upload'
+    ),
+    path('analyze-product/async/', views.analyze_product_image_upload_async, name='analyze_product_image_upload_async'),
+    path(
+        'analyze-product/stream/',
+        views.analyze_product_stream_async if settings.AI_ASYNC_VIEWS else views.analyze_product_stream,
+        name='analyze_product_stream'
+    ),
+    path('analyze-product/jobs/', views.analyze_product_enqueue, name='analyze_product_enqueue'),
+    path('analyze-product/jobs/<int:pk>/', views.analyze_product_job_status, name='analyze_product_job_status'),
+    re_path(r'^blobs/(?P<name>[0-9a-f]{64}\.[a-z]+)$', views.ai_blob, name='blob'),
 ]
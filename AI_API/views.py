@@ -1,13 +1,40 @@
-import base64
+import asyncio
+import mimetypes
+import time
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, BasePermission, IsAuthenticated
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .services import Gemma3Service, ProductAIService
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from productplatform import metrics
+from productplatform.views import has_metrics_token
+
+from . import blobs, registry, tasks
+from .images import image_to_data_url
+from .models import AIRequest
+from .registry import get_gemma_service, get_product_ai_service, get_scheduler
+from .services import AsyncProductAIService
+from .streaming import sse_event
+
+
+class IsStaffOrMetricsToken(BasePermission):
+    """
+    Staff o cabecera "Authorization: Bearer <METRICS_TOKEN>"
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_staff) or has_metrics_token(request)
 
 
 
@@ -23,7 +50,7 @@ def health_check(request):
     Verifica el estado del servicio de IA
     """
     try:
-        gemma_service = Gemma3Service()
+        gemma_service = get_gemma_service()
         health_status = gemma_service.health_check()
         
         if health_status['status'] == 'healthy':
@@ -39,6 +66,22 @@ def health_check(request):
         )
 
 
+@swagger_auto_schema(
+    method='get',
+    operation_description="Estado del planificador de micro-lotes: cola e histogramas de tamaño de lote y espera",
+)
+@api_view(['GET'])
+@permission_classes([IsStaffOrMetricsToken])
+def scheduler_stats(request):
+    """
+    Histogramas del planificador de micro-lotes (AI_API.scheduler). Con
+    AI_BATCH_SCHEDULER desactivado no crea el planificador
+    """
+    if not registry.BATCH_SCHEDULER:
+        return Response({'enabled': False}, status=status.HTTP_200_OK)
+    return Response({'enabled': True, **get_scheduler().stats()}, status=status.HTTP_200_OK)
+
+
 @swagger_auto_schema(
     method='post',
     operation_description="Analiza una o múltiples imágenes de producto y genera información completa",
@@ -57,15 +100,7 @@ def analyze_product_image_upload(request):
     Analiza una o múltiples imágenes de producto subidas directamente y genera información completa para auto-llenar formulario
     """
     try:
-        image_urls = []
-
-        single_image = request.FILES.get('image')
-        if single_image:
-            image_urls.append(convert_image_to_data_url(single_image))
-
-        multiple_images = request.FILES.getlist('images')
-        for img in multiple_images:
-            image_urls.append(convert_image_to_data_url(img))
+        image_urls = collect_image_urls(request)
 
         if not image_urls:
             return Response(
@@ -73,23 +108,11 @@ def analyze_product_image_upload(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ai_service = ProductAIService()
+        ai_service = get_product_ai_service()
         result = ai_service.analyze_product_complete(image_urls, user=request.user)
 
-        if result['success']:
-            return Response({
-                'success': True,
-                'data': result['data'],
-                'request_id': result.get('request_id'),
-                'processing_time': result.get('processing_time'),
-                'images_analyzed': len(image_urls)
-            })
-        else:
-            return Response({
-                'success': False,
-                'error': result.get('error', 'Error en el análisis de IA'),
-                'raw_response': result.get('raw_response')
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        body, status_code = analysis_response(result, image_urls)
+        return Response(body, status=status_code)
 
     except Exception as e:
 
@@ -99,11 +122,219 @@ def analyze_product_image_upload(request):
         )
 
 
+@require_POST
+async def analyze_product_image_upload_async(request):
+    """
+    Versión asíncrona de analyze_product_image_upload para despliegues ASGI:
+    la inferencia no ocupa un hilo del servidor mientras espera al modelo
+    """
+    try:
+        image_urls = await collect_image_urls_async(request)
+
+        if not image_urls:
+            return JsonResponse(
+                {'error': 'No se proporcionó ninguna imagen'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user = await request.auser()
+        ai_service = await AsyncProductAIService.create()
+        result = await ai_service.analyze_product_complete(
+            image_urls, user=user if user.is_authenticated else None
+        )
+
+        body, status_code = analysis_response(result, image_urls)
+        return JsonResponse(body, status=status_code)
+
+    except Exception as e:
+
+        return JsonResponse(
+            {'error': 'Error interno del servidor'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_POST
+def analyze_product_stream(request):
+    """
+    Analiza las imágenes en modo streaming y reenvía como server-sent events el
+    título y la descripción parciales a medida que el modelo los genera
+    """
+    image_urls = collect_image_urls(request)
+    if not image_urls:
+        return JsonResponse(
+            {'error': 'No se proporcionó ninguna imagen'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user = request.user if request.user.is_authenticated else None
+    events = get_product_ai_service().stream_analysis(image_urls, user=user)
+    return event_stream_response(sse_event(event, data) for event, data in events)
+
+
+@require_POST
+async def analyze_product_stream_async(request):
+    """
+    Versión asíncrona de analyze_product_stream para despliegues ASGI
+    """
+    image_urls = await collect_image_urls_async(request)
+    if not image_urls:
+        return JsonResponse(
+            {'error': 'No se proporcionó ninguna imagen'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user = await request.auser()
+    ai_service = await AsyncProductAIService.create()
+
+    async def events():
+        async for event, data in ai_service.stream_analysis(
+            image_urls, user=user if user.is_authenticated else None
+        ):
+            yield sse_event(event, data)
+
+    return event_stream_response(events())
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="Encola el análisis de una o múltiples imágenes de producto y devuelve el id de la tarea",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'image': openapi.Schema(type=openapi.TYPE_FILE, description='Archivo de imagen del producto'),
+            'images': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_FILE), description='Múltiples imágenes del producto'),
+        },
+    ),
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def analyze_product_enqueue(request):
+    """
+    Encola el análisis en la cola de tareas de IA (AI_API.tasks) y responde
+    enseguida; el resultado se consulta en analyze_product_job_status
+    """
+    image_urls = collect_image_urls(request)
+    if not image_urls:
+        return Response(
+            {'error': 'No se proporcionó ninguna imagen'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    ai_request = tasks.enqueue_analysis(image_urls, user=request.user)
+    return Response({
+        'job_id': ai_request.pk,
+        'status': ai_request.status,
+        'status_url': reverse('ai_api:analyze_product_job_status', args=[ai_request.pk]),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@require_GET
+async def analyze_product_job_status(request, pk):
+    """
+    Estado de una tarea de análisis del usuario. Con ?wait=<segundos> la request
+    espera hasta que la tarea termine o pase el plazo (máximo
+    AI_TASK_LONG_POLL_MAX). Es asíncrona para que en ASGI la espera no ocupe un
+    hilo del servidor; en WSGI cada long-poll sigue reteniendo un worker
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=status.HTTP_403_FORBIDDEN)
+
+    ai_request = await AIRequest.objects.exclude(task='').filter(pk=pk, user=user).afirst()
+    if ai_request is None:
+        return JsonResponse({'error': 'Tarea no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = 0
+    deadline = time.monotonic() + min(max(wait, 0), getattr(settings, 'AI_TASK_LONG_POLL_MAX', 30))
+    while ai_request.status not in tasks.TERMINAL_STATUSES and time.monotonic() < deadline:
+        await asyncio.sleep(min(0.25, max(deadline - time.monotonic(), 0)))
+        await ai_request.arefresh_from_db()
+
+    return JsonResponse(tasks.task_state(ai_request), status=status.HTTP_200_OK)
+
+
+@staff_member_required
+@require_GET
+def ai_blob(request, name):
+    """
+    Imagen del almacén de blobs (previews del admin de AIRequest). El almacén
+    está fuera de MEDIA_ROOT: solo staff puede verlas
+    """
+    ref = f'{blobs.BLOB_PREFIX}{name}'
+    try:
+        blob = blobs.open_blob(ref)
+    except FileNotFoundError:
+        raise Http404('Imagen no encontrada')
+    return FileResponse(blob, content_type=blobs.content_type(ref))
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el stream antes de enviarlo
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def collect_image_urls(request):
+    """
+    Convierte las imágenes subidas ('image' y/o 'images') en data URLs
+    """
+    image_urls = []
+
+    single_image = request.FILES.get('image')
+    if single_image:
+        image_urls.append(convert_image_to_data_url(single_image))
+
+    multiple_images = request.FILES.getlist('images')
+    for img in multiple_images:
+        image_urls.append(convert_image_to_data_url(img))
+
+    return image_urls
+
+
+async def collect_image_urls_async(request):
+    """
+    collect_image_urls en un hilo del pool: decodificar y redimensionar con
+    Pillow bloquearía el event loop y con él todas las requests del worker
+    """
+    return await sync_to_async(collect_image_urls, thread_sensitive=False)(request)
+
+
+def analysis_response(result, image_urls):
+    """
+    Cuerpo y código HTTP de la respuesta de un análisis de producto
+    """
+    if result['success']:
+        return {
+            'success': True,
+            'data': result['data'],
+            'request_id': result.get('request_id'),
+            'processing_time': result.get('processing_time'),
+            'images_analyzed': len(image_urls),
+            'cached': result.get('cached', False)
+        }, status.HTTP_200_OK
+
+    return {
+        'success': False,
+        'error': result.get('error', 'Error en el análisis de IA'),
+        'raw_response': result.get('raw_response')
+    }, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+@metrics.span('ai.image.convert')
 def convert_image_to_data_url(image_file):
     """
-    Convierte un archivo de imagen en una data URL base64
+    Convierte un archivo de imagen en una data URL base64, redimensionada y
+    re-codificada para el modelo (ver AI_API.images.prepare_image)
     """
-    image_content = image_file.read()
-    image_base64 = base64.b64encode(image_content).decode('utf-8')
-    content_type = image_file.content_type or 'image/jpeg'
-    return f"data:{content_type};base64,{image_base64}"
\ No newline at end of file
+    content_type = (
+        getattr(image_file, 'content_type', None)
+        or mimetypes.guess_type(image_file.name or '')[0]
+        or 'image/jpeg'
+    )
+    return image_to_data_url(image_file, fallback_content_type=content_type)
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'productplatform.settings')
+# Bajo ASGI el análisis de productos usa las vistas async y el cliente HTTP pooled,
+# de modo que un solo proceso atiende cientos de inferencias en curso
+os.environ.setdefault('AI_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
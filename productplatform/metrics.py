@@ -0,0 +1,230 @@
+"""
+Métricas en memoria del proceso.
+
+Histogram acumula observaciones en buckets fijos (acumulativos, al estilo
+Prometheus) y guarda una muestra de las últimas observaciones para calcular
+percentiles. Counter es un contador monótono. Ambos se registran por nombre y
+etiquetas con histogram() y counter(), que devuelven siempre la misma instancia.
+
+span() mide etapas del código (como context manager o decorador) en el
+histograma span_seconds{span="..."}; render_prometheus() expone todo en el
+formato de texto de Prometheus (vista /metrics).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from typing import Dict, Optional, Sequence
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Etapas internas: desde décimas de milisegundo (parseo, caché) hasta la llamada al modelo
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SAMPLE_SIZE = 1024
+SPAN_METRIC = 'span_seconds'
+
+
+def _label_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + pairs + '}'
+
+
+def _key(name: str, labels: Dict[str, str]) -> str:
+    return name + _label_text(labels)
+
+
+class Histogram:
+    """
+    Histograma thread-safe con buckets fijos y percentiles sobre una muestra reciente
+    """
+
+    def __init__(self, name: str, description: str = '', buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 labels: Dict[str, str] = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._samples = deque(maxlen=SAMPLE_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._samples.append(value)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets['+Inf'] = count
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'buckets': buckets,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class Counter:
+    """
+    Contador monótono thread-safe
+    """
+
+    def __init__(self, name: str, description: str = '', labels: Dict[str, str] = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, Counter] = {}
+_lock = threading.Lock()
+
+
+def histogram(name: str, description: str = '', buckets: Sequence[float] = DEFAULT_BUCKETS,
+              labels: Dict[str, str] = None) -> Histogram:
+    """
+    Histograma registrado con ese nombre y etiquetas (se crea la primera vez)
+    """
+    key = _key(name, labels)
+    histogram_ = _histograms.get(key)
+    if histogram_ is None:
+        with _lock:
+            if key not in _histograms:
+                _histograms[key] = Histogram(name, description, buckets, labels)
+            histogram_ = _histograms[key]
+    return histogram_
+
+
+def counter(name: str, description: str = '', labels: Dict[str, str] = None) -> Counter:
+    """
+    Contador registrado con ese nombre y etiquetas (se crea la primera vez)
+    """
+    key = _key(name, labels)
+    counter_ = _counters.get(key)
+    if counter_ is None:
+        with _lock:
+            if key not in _counters:
+                _counters[key] = Counter(name, description, labels)
+            counter_ = _counters[key]
+    return counter_
+
+
+class span:
+    """
+    Mide la duración de una etapa en span_seconds{span=name}. Cada "with"
+    crea su propia instancia, así que es seguro entre hilos y corrutinas:
+
+        with metrics.span('ai.http'):
+            ...
+
+        @metrics.span('ai.image.convert')
+        def convert(...):
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.histogram = histogram(
+            SPAN_METRIC, 'Duración de las etapas instrumentadas', LATENCY_BUCKETS, labels={'span': name}
+        )
+        self._start = None
+
+    def __enter__(self) -> 'span':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.histogram.observe(time.perf_counter() - start)
+        return wrapper
+
+
+def snapshot(prefix: str = '') -> Dict[str, Dict]:
+    """
+    Estado de los histogramas registrados cuyo nombre empieza por prefix,
+    por nombre con etiquetas (p. ej. 'span_seconds{span="ai.http"}')
+    """
+    with _lock:
+        histograms = [(key, h) for key, h in _histograms.items() if h.name.startswith(prefix)]
+    return {key: h.snapshot() for key, h in histograms}
+
+
+def counters_snapshot(prefix: str = '') -> Dict[str, int]:
+    with _lock:
+        counters = [(key, c) for key, c in _counters.items() if c.name.startswith(prefix)]
+    return {key: c.value for key, c in counters}
+
+
+def render_prometheus() -> str:
+    """
+    Histogramas y contadores en el formato de texto de Prometheus 0.0.4
+    """
+    with _lock:
+        histograms = sorted(_histograms.values(), key=lambda h: (h.name, _label_text(h.labels)))
+        counters = sorted(_counters.values(), key=lambda c: (c.name, _label_text(c.labels)))
+
+    lines, described = [], set()
+    for h in histograms:
+        if h.name not in described:
+            described.add(h.name)
+            lines.append(f'# HELP {h.name} {h.description}')
+            lines.append(f'# TYPE {h.name} histogram')
+        data = h.snapshot()
+        for bound, count in data['buckets'].items():
+            labels = _label_text(h.labels)
+            le = 'le="%s"' % bound
+            labels = '{' + (labels[1:-1] + ',' if labels else '') + le + '}'
+            lines.append(f'{h.name}_bucket{labels} {count}')
+        lines.append(f'{h.name}_sum{_label_text(h.labels)} {data["sum"]}')
+        lines.append(f'{h.name}_count{_label_text(h.labels)} {data["count"]}')
+    for c in counters:
+        if c.name not in described:
+            described.add(c.name)
+            lines.append(f'# HELP {c.name} {c.description}')
+            lines.append(f'# TYPE {c.name} counter')
+        lines.append(f'{c.name}{_label_text(c.labels)} {c.value}')
+    return '\n'.join(lines) + '\n'
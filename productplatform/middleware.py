@@ -0,0 +1,109 @@
+"""
+Middleware de métricas por vista (ver productplatform.metrics).
+
+Registra por vista y método la latencia de la request, el número de consultas
+SQL (sin depender de DEBUG, con connection.execute_wrapper) y las respuestas por
+código de estado. En respuestas streaming la latencia es hasta el primer byte.
+
+En vistas asíncronas el ORM corre en hilos de sync_to_async, cada uno con su
+conexión: ahí el contador de la request viaja en una ContextVar (sync_to_async
+copia el contexto al hilo) y un execute_wrapper instalado en cada conexión lo
+incrementa.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class QueryCounter:
+    """
+    execute_wrapper que cuenta las consultas de la request actual
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+_request_queries: contextvars.ContextVar = contextvars.ContextVar('request_queries', default=None)
+
+
+def _count_request_query(execute, sql, params, many, context):
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection=connection, **kwargs):
+    if _count_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_request_query)
+
+
+connection_created.connect(_install_query_counter, dispatch_uid='metrics_query_counter')
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        try:
+            # La conexión del hilo de sync_to_async puede ser anterior a la señal
+            await sync_to_async(_install_query_counter)()
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries.count)
+        return response
+
+    @staticmethod
+    def record(request, response, duration: float, query_count: int):
+        labels = {'view': _view_name(request), 'method': request.method}
+        metrics.histogram(
+            'http_request_duration_seconds', 'Latencia de las requests por vista',
+            metrics.LATENCY_BUCKETS, labels=labels,
+        ).observe(duration)
+        metrics.histogram(
+            'http_request_db_queries', 'Consultas SQL por request y vista',
+            QUERY_BUCKETS, labels=labels,
+        ).observe(query_count)
+        metrics.counter(
+            'http_requests_total', 'Requests por vista y código de estado',
+            labels={**labels, 'status': str(response.status_code)},
+        ).inc()
@@ -19,6 +19,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Almacén de las imágenes enviadas a la IA (AI_API.blobs): fuera de MEDIA_ROOT, no se sirve públicamente
+AI_BLOB_ROOT = os.getenv('AI_BLOB_ROOT', os.path.join(BASE_DIR, 'private_media'))
+
+# Cargas masivas: hasta BULK_INGESTION_MAX_ITEMS imágenes en una sola request multipart
+BULK_INGESTION_MAX_ITEMS = int(os.getenv('BULK_INGESTION_MAX_ITEMS', '500'))
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_INGESTION_MAX_ITEMS
+# Trabajos sin actividad durante este tiempo se reanudan con manage.py resume_bulk_jobs
+BULK_INGESTION_STALE_SECONDS = int(os.getenv('BULK_INGESTION_STALE_SECONDS', '1800'))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -49,6 +58,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'productplatform.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,13 +90,85 @@ WSGI_APPLICATION = 'productplatform.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_ENGINE: 'sqlite' (archivo local en modo WAL) o 'postgresql' (producción)
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'productplatform'),
+            'USER': os.getenv('DB_USER', 'productplatform'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Conexiones persistentes por hilo, verificadas antes de reutilizarlas
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
+    }
+    # Pool de psycopg 3 (requiere psycopg[pool]); incompatible con CONN_MAX_AGE
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '0'))
+    if DB_POOL_MAX_SIZE:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    # WAL: los lectores no bloquean al escritor; synchronous=NORMAL es seguro en WAL.
+    # BEGIN IMMEDIATE toma el lock de escritura al abrir la transacción, así que
+    # busy_timeout puede esperar en lugar de fallar con "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '20000')),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),  # negativo: KiB
+        'temp_store': 'MEMORY',
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'locmem' (por proceso) o 'file' (compartida entre procesos del mismo servidor)
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000'))},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'productplatform',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000'))},
+        }
     }
-}
+
+# Páginas anónimas, tarjetas de producto y lista de categorías (products.caching)
+STOREFRONT_CACHE_TIMEOUT = int(os.getenv('STOREFRONT_CACHE_TIMEOUT', '300'))
 
 
 # Password validation
@@ -139,6 +221,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LIGHTNING_AI_ENDPOINT = os.getenv('LIGHTNING_AI_ENDPOINT', 'https://8001-01k4ap2fswtrsc3fyamsj261fp.cloudspaces.litng.ai')
 LIGHTNING_AI_API_KEY = os.getenv('LIGHTNING_AI_API_KEY', 'gemma3-litserve')
 
+# Servicio de IA compartido por proceso: calentar al arrancar y cada cuántos segundos buscar
+# cambios de AIConfiguration hechos desde otros procesos
+AI_WARM_UP = os.getenv('AI_WARM_UP', 'False') == 'True'
+AI_CONFIG_MAX_AGE = int(os.getenv('AI_CONFIG_MAX_AGE', '300'))
+AI_HTTP_POOL_MAXSIZE = int(os.getenv('AI_HTTP_POOL_MAXSIZE', '32'))
+
+# Vistas de IA asíncronas (activadas automáticamente al servir con productplatform/asgi.py)
+AI_ASYNC_VIEWS = os.getenv('AI_ASYNC_VIEWS', 'False') == 'True'
+# Pool HTTP/1.1 keep-alive del cliente asíncrono, por endpoint de Lightning AI
+AI_ASYNC_MAX_CONNECTIONS = int(os.getenv('AI_ASYNC_MAX_CONNECTIONS', '100'))
+AI_ASYNC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('AI_ASYNC_MAX_KEEPALIVE_CONNECTIONS', '20'))
+
+# Preprocesado de imágenes antes de enviarlas al modelo
+AI_IMAGE_MAX_SIDE = int(os.getenv('AI_IMAGE_MAX_SIDE', '896'))
+AI_IMAGE_FORMAT = os.getenv('AI_IMAGE_FORMAT', 'JPEG')  # JPEG o WEBP
+AI_IMAGE_QUALITY = int(os.getenv('AI_IMAGE_QUALITY', '85'))
+
+# Auditoría de AIRequest: 'sync' (un INSERT por request) o 'buffered' (bulk_create
+# diferido; las respuestas devuelven 'request_id': None)
+AI_AUDIT_MODE = os.getenv('AI_AUDIT_MODE', 'sync')
+AI_AUDIT_BATCH_SIZE = int(os.getenv('AI_AUDIT_BATCH_SIZE', '50'))
+AI_AUDIT_FLUSH_INTERVAL = float(os.getenv('AI_AUDIT_FLUSH_INTERVAL', '2.0'))
+
+# Caché de análisis de producto por contenido de imagen
+# Backends: AI_API.cache.LocalMemoryAnalysisCache, FileAnalysisCache o DatabaseAnalysisCache
+AI_ANALYSIS_CACHE = {
+    'BACKEND': os.getenv('AI_ANALYSIS_CACHE_BACKEND', 'AI_API.cache.LocalMemoryAnalysisCache'),
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.getenv('AI_ANALYSIS_CACHE_MAX_ENTRIES', '1000')),
+        'TIMEOUT': int(os.getenv('AI_ANALYSIS_CACHE_TIMEOUT', str(60 * 60 * 24 * 7))),
+        # Los backends de archivo y base de datos recortan a MAX_ENTRIES cada CULL_EVERY escrituras
+        'CULL_EVERY': int(os.getenv('AI_ANALYSIS_CACHE_CULL_EVERY', '20')),
+    },
+}
+
+# Resiliencia frente al endpoint de Lightning AI (AI_API.resilience)
+AI_CONNECT_TIMEOUT = float(os.getenv('AI_CONNECT_TIMEOUT', '10'))
+# Circuit breaker: se abre si la tasa de error de las últimas AI_BREAKER_WINDOW llamadas supera el umbral
+AI_BREAKER_FAILURE_RATE = float(os.getenv('AI_BREAKER_FAILURE_RATE', '0.5'))
+AI_BREAKER_WINDOW = int(os.getenv('AI_BREAKER_WINDOW', '20'))
+AI_BREAKER_MIN_REQUESTS = int(os.getenv('AI_BREAKER_MIN_REQUESTS', '5'))
+AI_BREAKER_RESET_TIMEOUT = float(os.getenv('AI_BREAKER_RESET_TIMEOUT', '30'))
+# Reintentos con backoff exponencial y jitter (errores al conectar, 429, 502, 503, 504; nunca read timeouts)
+AI_RETRY_MAX_ATTEMPTS = int(os.getenv('AI_RETRY_MAX_ATTEMPTS', '3'))
+AI_RETRY_BACKOFF_BASE = float(os.getenv('AI_RETRY_BACKOFF_BASE', '0.5'))
+AI_RETRY_BACKOFF_MAX = float(os.getenv('AI_RETRY_BACKOFF_MAX', '8'))
+# Tiempo total para todos los intentos de una llamada (0: el timeout_seconds de la configuración)
+AI_RETRY_DEADLINE = float(os.getenv('AI_RETRY_DEADLINE', '0'))
+# Hedging: segunda request si la primera supera el percentil de latencia reciente
+AI_HEDGE_ENABLED = os.getenv('AI_HEDGE_ENABLED', 'False') == 'True'
+AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', '95'))
+AI_HEDGE_MIN_SAMPLES = int(os.getenv('AI_HEDGE_MIN_SAMPLES', '20'))
+# Hilos del pool de hedging: acota las llamadas síncronas con hedging en curso a la vez
+AI_HEDGE_MAX_WORKERS = int(os.getenv('AI_HEDGE_MAX_WORKERS', '64'))
+
+# Balanceo entre todos los AIConfiguration activos: 'least_outstanding' o 'ewma'
+AI_LOAD_BALANCING = os.getenv('AI_LOAD_BALANCING', 'least_outstanding')
+AI_EWMA_ALPHA = float(os.getenv('AI_EWMA_ALPHA', '0.3'))
+# Latencia mínima (s) con la que un fallo entra en la media EWMA del endpoint
+AI_EWMA_FAILURE_PENALTY = float(os.getenv('AI_EWMA_FAILURE_PENALTY', '10'))
+# Intervalo de la sonda de salud por endpoint (0 la desactiva)
+AI_HEALTH_PROBE_INTERVAL = float(os.getenv('AI_HEALTH_PROBE_INTERVAL', '30'))
+
+# Micro-lotes: agrupar análisis concurrentes antes de enviarlos (AI_API.scheduler)
+AI_BATCH_SCHEDULER = os.getenv('AI_BATCH_SCHEDULER', 'False') == 'True'
+AI_BATCH_MAX_SIZE = int(os.getenv('AI_BATCH_MAX_SIZE', '8'))
+AI_BATCH_MAX_WAIT = float(os.getenv('AI_BATCH_MAX_WAIT', '0.01'))
+AI_BATCH_MAX_IN_FLIGHT = int(os.getenv('AI_BATCH_MAX_IN_FLIGHT', '16'))
+AI_BATCH_MAX_QUEUE = int(os.getenv('AI_BATCH_MAX_QUEUE', '256'))
+
+# Salida estructurada: enviar el JSON schema del análisis como response_format
+# (solo si el endpoint OpenAI-compatible lo soporta)
+AI_STRUCTURED_OUTPUT = os.getenv('AI_STRUCTURED_OUTPUT', 'False') == 'True'
+
+# Cola de tareas de IA en la base de datos (AI_API.tasks, manage.py run_ai_workers).
+# El worker renueva el lease cada tercio de AI_TASK_LEASE_SECONDS mientras la tarea corre:
+# el lease solo decide cuánto tarda en recuperarse la tarea de un worker caído
+AI_TASK_LEASE_SECONDS = int(os.getenv('AI_TASK_LEASE_SECONDS', '600'))
+AI_TASK_MAX_ATTEMPTS = int(os.getenv('AI_TASK_MAX_ATTEMPTS', '3'))
+AI_TASK_RETRY_BACKOFF_BASE = float(os.getenv('AI_TASK_RETRY_BACKOFF_BASE', '5'))
+AI_TASK_RETRY_BACKOFF_MAX = float(os.getenv('AI_TASK_RETRY_BACKOFF_MAX', '300'))
+AI_TASK_POLL_INTERVAL = float(os.getenv('AI_TASK_POLL_INTERVAL', '1.0'))
+# Espera máxima de la consulta de resultado con ?wait=<segundos> (long-poll)
+AI_TASK_LONG_POLL_MAX = float(os.getenv('AI_TASK_LONG_POLL_MAX', '30'))
+
+# Endpoint /metrics: exige 'Authorization: Bearer <METRICS_TOKEN>'; vacío, solo responde con DEBUG
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Public domain configuration for AI image URLs
 PUBLIC_DOMAIN = os.getenv('PUBLIC_DOMAIN', 'localhost:8000')  
 PUBLIC_PROTOCOL = os.getenv('PUBLIC_PROTOCOL', 'http')  
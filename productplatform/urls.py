@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from .views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('products.urls')),
@@ -28,6 +30,8 @@ urlpatterns = [
     # AI API endpoints
     path('api/ai/', include('AI_API.urls')),
 
+    # Métricas del proceso (Prometheus)
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Vistas del proyecto que no pertenecen a ninguna app
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import metrics
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def has_metrics_token(request) -> bool:
+    """
+    True si la request trae "Authorization: Bearer <METRICS_TOKEN>" válido
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return False
+    provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return hmac.compare_digest(provided, token)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Histogramas y contadores del proceso en formato Prometheus, o en JSON con
+    ?format=json (con percentiles p50/p95/p99). Exige la cabecera
+    "Authorization: Bearer <METRICS_TOKEN>"; sin METRICS_TOKEN solo responde
+    con DEBUG activo (expone nombres de vistas y volumen de tráfico)
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return JsonResponse({'error': 'Métricas deshabilitadas: define METRICS_TOKEN'}, status=403)
+    elif not has_metrics_token(request):
+        return JsonResponse({'error': 'No autorizado'}, status=401)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'histograms': metrics.snapshot(),
+            'counters': metrics.counters_snapshot(),
+        })
+    return HttpResponse(metrics.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
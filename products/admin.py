@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Category, Product
+from django.utils.html import format_html
+from .models import Category, Product, BulkUploadJob, BulkUploadItem
+from .thumbnails import thumbnail_url
 
 # Register your models here.
 
@@ -10,8 +12,33 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['title', 'price', 'category', 'seller', 'status', 'created_at']
+    list_display = ['image_preview', 'title', 'price', 'category', 'seller', 'status', 'created_at']
+    list_display_links = ['image_preview', 'title']
     list_filter = ['status', 'category', 'created_at']
     search_fields = ['title', 'description']
     list_editable = ['status']
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    list_select_related = ['category', 'seller']
+    date_hierarchy = 'created_at'
+
+    @admin.display(description='Imagen')
+    def image_preview(self, obj):
+        if not obj.image:
+            return '-'
+        return format_html(
+            '<img src="{}" loading="lazy" style="max-height: 60px; max-width: 80px;">',
+            thumbnail_url(obj, 'admin'),
+        )
+
+class BulkUploadItemInline(admin.TabularInline):
+    model = BulkUploadItem
+    extra = 0
+    fields = ['position', 'original_name', 'status', 'product', 'error_message']
+    readonly_fields = fields
+
+
+@admin.register(BulkUploadJob)
+class BulkUploadJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'seller', 'status', 'product_status', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['created_at', 'updated_at', 'finished_at']
+    inlines = [BulkUploadItemInline]
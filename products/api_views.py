@@ -1,7 +1,12 @@
+import json
+
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_http_methods
-from .models import Product, Category
+from .models import Product, Category, BulkUploadJob
+from . import caching, ingestion, search, tags, thumbnails
 
 
 @login_required
@@ -18,6 +23,7 @@ def bulk_create_product(request):
         category_id = request.POST.get('category')
         suggested_category = request.POST.get('suggested_category')
         status = request.POST.get('status', 'draft')
+        tag_names = request.POST.get('tags')
 
         if not image:
             return JsonResponse({
@@ -31,44 +37,27 @@ def bulk_create_product(request):
                 'error': 'Título y descripción son requeridos'
             }, status=400)
 
-        category = None
-        if category_id:
-            try:
-                category = Category.objects.get(id=category_id)
-            except Category.DoesNotExist:
-                pass
-
-        if not category and suggested_category:
-            category = Category.objects.filter(
-                name__icontains=suggested_category
-            ).first()
-
-        if not category:
-            category = Category.objects.first()
-
+        match = ingestion.CategoryMap().match(category_id, suggested_category)
+        category = match.category
         if not category:
             return JsonResponse({
                 'success': False,
                 'error': 'No hay categorías disponibles en el sistema'
             }, status=400)
 
-        try:
-            price_value = float(price) if price else 0.0
-            if price_value < 0:
-                price_value = 0.0
-        except (ValueError, TypeError):
-            price_value = 0.0
-
         product = Product.objects.create(
             title=title,
             description=description,
-            price=price_value,
+            price=ingestion.extract_price(price),
             category=category,
             image=image,
             seller=request.user,
             status=status
         )
-
+        if tag_names:
+            tags.attach_tags([product], [tag_names])
+            # El INSERT en bloque no envía m2m_changed
+            search.index_product(product)
 
         return JsonResponse({
             'success': True,
@@ -78,7 +67,9 @@ def bulk_create_product(request):
                 'description': product.description,
                 'price': str(product.price),
                 'category': product.category.name,
+                'category_confidence': match.confidence,
                 'status': product.status,
+                'tags': tags.parse_tags(tag_names),
             }
         })
 
@@ -86,4 +77,189 @@ def bulk_create_product(request):
         return JsonResponse({
             'success': False,
             'error': f'Error creando producto: {str(e)}'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_create_batch(request):
+    """
+    API endpoint para crear muchos productos en una sola request.
+
+    Multipart con:
+    - items: JSON con una lista de objetos {title, description, price,
+      category, suggested_category, status, tags, image}; tags es una lista o
+      el texto separado por comas que devuelve la IA
+    - images: archivos; cada elemento usa images[image] (por defecto, el de su misma posición)
+
+    Las categorías se resuelven en memoria y todo se inserta con bulk_create en
+    una sola transacción. Los elementos inválidos se informan sin impedir el
+    resto: 201 si se crearon todos, 207 si solo algunos (success es False y
+    results dice cuáles fallaron) y 400 si ninguno
+    """
+    try:
+        items = json.loads(request.POST.get('items') or '[]')
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'items debe ser una lista JSON'
+        }, status=400)
+
+    if not isinstance(items, list) or not items:
+        return JsonResponse({
+            'success': False,
+            'error': 'No se proporcionaron elementos'
+        }, status=400)
+
+    if len(items) > ingestion.MAX_ITEMS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Máximo {ingestion.MAX_ITEMS} productos por request'
+        }, status=400)
+
+    images = request.FILES.getlist('images')
+    category_map = ingestion.CategoryMap()
+    statuses = dict(Product.STATUS_CHOICES)
+    results = [None] * len(items)
+    products, positions, tag_names, matches = [], [], [], []
+
+    for position, item in enumerate(items):
+        error = None
+        if not isinstance(item, dict):
+            error = 'Elemento inválido'
+        else:
+            image_index = item.get('image', position)
+            image = images[image_index] if isinstance(image_index, int) and 0 <= image_index < len(images) else None
+            match = category_map.match(item.get('category'), item.get('suggested_category'))
+            category = match.category
+            if not image:
+                error = 'No se proporcionó imagen'
+            elif not item.get('title') or not item.get('description'):
+                error = 'Título y descripción son requeridos'
+            elif not category:
+                error = 'No hay categorías disponibles en el sistema'
+        if error:
+            results[position] = {'index': position, 'success': False, 'error': error}
+            continue
+
+        status = item.get('status', 'draft')
+        products.append(Product(
+            title=str(item['title'])[:200],
+            description=str(item['description']),
+            price=ingestion.extract_price(item.get('price')),
+            category=category,
+            image=image,
+            seller=request.user,
+            status=status if status in statuses else 'draft',
+        ))
+        positions.append(position)
+        matches.append(match)
+        tag_names.append(item.get('tags'))
+
+    try:
+        with transaction.atomic():
+            ingestion.insert_products(products, tag_names)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error creando productos: {str(e)}'
+        }, status=500)
+
+    caching.invalidate_products(products)
+    thumbnails.schedule_bulk_thumbnails(products)
+
+    for position, product, match in zip(positions, products, matches):
+        results[position] = {
+            'index': position,
+            'success': True,
+            'product': {
+                'id': product.id,
+                'title': product.title,
+                'price': str(product.price),
+                'category': product.category.name,
+                'category_confidence': match.confidence,
+                'status': product.status,
+            }
+        }
+
+    failed = len(items) - len(products)
+    if not products:
+        status_code = 400
+    elif failed:
+        status_code = 207
+    else:
+        status_code = 201
+    return JsonResponse({
+        'success': not failed,
+        'created': len(products),
+        'failed': failed,
+        'results': results,
+    }, status=status_code)
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_upload_job_create(request):
+    """
+    API endpoint que recibe todas las imágenes en una sola subida y crea un
+    trabajo de ingesta que se procesa en el servidor
+    """
+    try:
+        images = request.FILES.getlist('images')
+        category_id = request.POST.get('default_category')
+        status = request.POST.get('status', 'draft')
+
+        if not images:
+            return JsonResponse({
+                'success': False,
+                'error': 'No se proporcionaron imágenes'
+            }, status=400)
+
+        if len(images) > ingestion.MAX_ITEMS:
+            return JsonResponse({
+                'success': False,
+                'error': f'Máximo {ingestion.MAX_ITEMS} imágenes por carga'
+            }, status=400)
+
+        if status not in dict(Product.STATUS_CHOICES):
+            status = 'draft'
+
+        default_category = None
+        if category_id:
+            default_category = Category.objects.filter(id=category_id).first()
+
+        job = ingestion.create_job(
+            seller=request.user,
+            images=images,
+            default_category=default_category,
+            product_status=status
+        )
+        ingestion.start_job(job)
+
+        return JsonResponse({
+            'success': True,
+            'job': {
+                'id': job.id,
+                'status': job.status,
+                'total': len(images),
+            }
+        }, status=202)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error creando carga masiva: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def bulk_upload_job_status(request, pk):
+    """
+    API endpoint con el progreso de un trabajo de carga masiva y de cada imagen
+    """
+    job = get_object_or_404(BulkUploadJob, pk=pk, seller=request.user)
+    return JsonResponse({
+        'success': True,
+        'job': ingestion.job_progress(job)
+    })
@@ -0,0 +1,158 @@
+"""
+Caché del storefront con invalidación por versiones.
+
+Cada grupo de contenido tiene un número de versión en la caché:
+
+- 'catalog': cualquier cambio de producto (listado de home sin filtro)
+- 'category:<id>': productos de esa categoría (home filtrado por categoría)
+- 'categories': lista de categorías y nombres que aparecen en las tarjetas
+- 'product:<id>': página de detalle de un producto
+- 'tags': nombres de tags mostrados en el detalle
+
+Las claves de la caché incluyen las versiones de las que dependen, así que
+invalidar es incrementar una versión (las entradas antiguas dejan de leerse y
+caducan solas). Las señales de Product, Category y Tag (products.signals)
+hacen esos incrementos.
+
+Las versiones se inicializan con la hora actual en milisegundos en lugar de 1:
+si una versión se expulsa de la caché, la nueva nunca coincide con claves
+antiguas. Con el backend local-memory cada proceso tiene su propia caché y solo
+ve las invalidaciones propias (hasta STOREFRONT_CACHE_TIMEOUT); con varios
+procesos conviene el backend de archivos (CACHE_BACKEND=file).
+"""
+import hashlib
+import time
+from functools import wraps
+from typing import Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from productplatform import metrics
+
+from .models import Category
+
+CACHE_TIMEOUT = getattr(settings, 'STOREFRONT_CACHE_TIMEOUT', 300)
+KEY_PREFIX = 'storefront'
+
+
+def _version_key(namespace: str) -> str:
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def get_versions(*namespaces: str) -> List[int]:
+    """
+    Versiones actuales de los grupos pedidos (una sola lectura de la caché)
+    """
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() // 1_000_000 for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*namespaces: str):
+    """
+    Invalida todo lo cacheado que depende de esos grupos
+    """
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns() // 1_000_000, timeout=None)
+
+
+def invalidate_products(products: Iterable):
+    """
+    Invalida listados y detalle de productos creados sin post_save (bulk_create, update)
+    """
+    namespaces = {'catalog'}
+    for product in products:
+        namespaces.add(f'product:{product.pk}')
+        category_id = product.__dict__.get('category_id')
+        if category_id is not None:
+            namespaces.add(f'category:{category_id}')
+    bump(*namespaces)
+
+
+def versioned_key(name: str, namespaces: Iterable[str], *parts) -> str:
+    """
+    Clave que cambia cuando cambia cualquiera de las versiones de namespaces
+    """
+    namespaces = list(namespaces)
+    versions = '.'.join(str(version) for version in get_versions(*namespaces))
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{versions}:{digest}'
+
+
+def get_categories() -> List[Category]:
+    """
+    Lista de categorías cacheada (formularios, filtros de home, ingesta)
+    """
+    key = versioned_key('categories', ['categories'])
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.all())
+        cache.set(key, categories, CACHE_TIMEOUT)
+    return categories
+
+
+def is_cacheable_request(request) -> bool:
+    """
+    Solo GET anónimos sin mensajes flash pendientes: su HTML es igual para todos
+    """
+    if request.method != 'GET' or request.user.is_authenticated:
+        return False
+    if 'messages' in request.COOKIES:
+        return False
+    session = getattr(request, 'session', None)
+    return not (session is not None and session.get('_messages'))
+
+
+def cache_anonymous_page(namespaces):
+    """
+    Decorador: cachea la respuesta de visitantes anónimos. namespaces es una
+    función (request, **kwargs) -> grupos de versión de los que depende la página
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = versioned_key(
+                f'view:{view.__name__}', namespaces(request, **kwargs), request.get_full_path()
+            )
+            cached = cache.get(key)
+            metrics.counter(
+                'storefront_page_cache_total', 'Páginas anónimas servidas desde la caché o generadas',
+                labels={'view': view.__name__, 'result': 'miss' if cached is None else 'hit'},
+            ).inc()
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Storefront-Cache'] = 'hit'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, response['Content-Type']), CACHE_TIMEOUT)
+                response['X-Storefront-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+def home_namespaces(request, **kwargs) -> List[str]:
+    category = request.GET.get('category')
+    # Con búsqueda, tag o sin filtro de categoría la página depende de todo el catálogo
+    if category and category.isdigit() and not request.GET.get('searchProduct') and not request.GET.get('tag'):
+        return ['categories', f'category:{category}']
+    return ['categories', 'catalog']
+
+
+def product_detail_namespaces(request, pk=None, **kwargs) -> List[str]:
+    return ['categories', 'tags', f'product:{pk}']
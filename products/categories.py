@@ -0,0 +1,154 @@
+"""
+Resolución difusa de la categoría sugerida por la IA.
+
+CategoryIndex se construye en memoria a partir de las categorías (de
+products.caching) y de SYNONYMS. Resuelve un texto como "Electrónicos" o
+"Belleza" en este orden:
+
+1. 'exact': el nombre o un sinónimo coincide sin acentos ni mayúsculas
+2. 'token': comparte palabras (con el mismo stemming que la búsqueda)
+3. 'fuzzy': similitud de trigramas de caracteres por encima de MIN_SIMILARITY
+4. 'default': ninguna coincidencia; la primera categoría con confianza 0
+
+El índice se reconstruye cuando cambia la versión 'categories' de la caché del
+storefront, que incrementan las señales de Category. Así cada proceso lo
+recarga sin consultas extra y el prompt de análisis (category_names) lista
+siempre las categorías reales.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from django.conf import settings
+
+from . import caching
+from .search import analyze, fold
+
+# Sinónimos por nombre de categoría (sin acentos, minúsculas): incluye los
+# nombres que usaba el prompt antiguo de la IA
+SYNONYMS = getattr(settings, 'CATEGORY_SYNONYMS', {
+    'electronica': ['electrónicos', 'tecnología', 'computación', 'informática', 'celulares', 'gadgets'],
+    'ropa': ['moda', 'vestimenta', 'calzado', 'zapatos'],
+    'hogar': ['casa', 'decoración', 'muebles', 'cocina', 'iluminación'],
+    'deportes': ['deporte', 'fitness', 'ejercicio', 'aire libre'],
+    'libros': ['revistas', 'papelería', 'oficina', 'material educativo'],
+    'juguetes': ['juegos', 'niños', 'bebés', 'entretenimiento'],
+    'automoviles': ['automotriz', 'autos', 'coches', 'vehículos', 'motor', 'repuestos'],
+    'jardin': ['jardinería', 'plantas', 'exteriores'],
+    'salud y belleza': ['belleza', 'salud', 'cosmética', 'maquillaje', 'cuidado personal'],
+    'mascotas': ['perros', 'gatos', 'animales'],
+})
+MIN_SIMILARITY = getattr(settings, 'CATEGORY_MIN_SIMILARITY', 0.3)
+MEMO_SIZE = 1024
+
+
+class CategoryMatch(NamedTuple):
+    category: Optional[object]
+    confidence: float
+    method: str
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f'  {text} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class CategoryIndex:
+    """
+    Índice en memoria de nombres, sinónimos, tokens y trigramas de las categorías
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self.tokens: Dict[str, Set[int]] = {}
+        self.aliases: List[tuple] = []
+        self.by_id = {category.pk: category for category in self.categories}
+        self._memo: 'OrderedDict[str, CategoryMatch]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Los nombres reales tienen prioridad sobre los sinónimos de otra categoría
+        self.exact = {fold(category.name).strip(): category for category in self.categories}
+        for category in self.categories:
+            name = fold(category.name).strip()
+            for alias in [name] + [fold(synonym) for synonym in SYNONYMS.get(name, [])]:
+                self.exact.setdefault(alias, category)
+                for token in analyze(alias):
+                    self.tokens.setdefault(token, set()).add(category.pk)
+                self.aliases.append((trigrams(alias), category))
+
+    @property
+    def names(self) -> List[str]:
+        return [category.name for category in self.categories]
+
+    def resolve(self, text) -> CategoryMatch:
+        """
+        Mejor categoría para el texto, con confianza entre 0 y 1
+        """
+        key = fold(str(text or '')).strip()
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        match = self._resolve(key)
+        with self._lock:
+            self._memo[key] = match
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return match
+
+    def _resolve(self, key: str) -> CategoryMatch:
+        if not self.categories:
+            return CategoryMatch(None, 0.0, 'default')
+        if key in self.exact:
+            return CategoryMatch(self.exact[key], 1.0, 'exact')
+
+        tokens = analyze(key)
+        if tokens:
+            scores = {}
+            for token in tokens:
+                for category_id in self.tokens.get(token, ()):
+                    scores[category_id] = scores.get(category_id, 0) + 1
+            if scores:
+                category_id, hits = max(scores.items(), key=lambda item: item[1])
+                return CategoryMatch(self.by_id[category_id], round(0.6 + 0.3 * hits / len(tokens), 2), 'token')
+
+        if key:
+            query = trigrams(key)
+            similarity, category = max(
+                ((len(query & grams) / len(query | grams), category) for grams, category in self.aliases),
+                key=lambda item: item[0],
+            )
+            if similarity >= MIN_SIMILARITY:
+                return CategoryMatch(category, round(similarity * 0.9, 2), 'fuzzy')
+
+        return CategoryMatch(self.categories[0], 0.0, 'default')
+
+
+_index: Optional[CategoryIndex] = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> CategoryIndex:
+    """
+    Índice actual; se reconstruye si cambió la versión 'categories'
+    """
+    global _index, _index_version
+    version = caching.get_versions('categories')[0]
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                _index = CategoryIndex(caching.get_categories())
+                _index_version = version
+    return _index
+
+
+def resolve(text) -> CategoryMatch:
+    return get_index().resolve(text)
+
+
+def category_names() -> List[str]:
+    """
+    Nombres de las categorías existentes, para el prompt de la IA
+    """
+    return get_index().names
@@ -2,6 +2,18 @@ from django import forms
 from .models import Product
 
 class ProductForm(forms.ModelForm):
+    # Tags separados por comas (los rellena el análisis de IA en create_product.html)
+    tags_input = forms.CharField(
+        required=False,
+        label='Etiquetas',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'tag1, tag2, tag3'}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and not self.is_bound:
+            self.fields['tags_input'].initial = ', '.join(tag.name for tag in self.instance.tags.all())
+
     class Meta:
         model = Product
         fields = ['title', 'description', 'price', 'category', 'image', 'status']
@@ -0,0 +1,339 @@
+"""
+Motor de ingesta masiva de productos en el servidor.
+
+Una sola subida multipart crea un BulkUploadJob con un BulkUploadItem por imagen.
+Un hilo coordinador reparte las imágenes entre un pool de workers con
+concurrencia acotada que llaman a ProductAIService.analyze_product_complete, y
+crea los productos en lotes con bulk_create a medida que llegan los resultados.
+
+insert_products es el alta masiva compartida con la API de creación por lotes
+(products.api_views.bulk_create_batch): bulk_create, tags e índice de búsqueda
+en unas pocas consultas, sin importar cuántos productos sean.
+
+Los coordinadores son hilos del proceso web: si el proceso se reinicia o cae,
+el trabajo queda a medias. resume_stale_jobs (manage.py resume_bulk_jobs,
+p. ej. tras cada despliegue o desde cron) reanuda los trabajos sin actividad
+durante BULK_INGESTION_STALE_SECONDS.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import caching, categories, search, tags, thumbnails
+from .models import BulkUploadItem, BulkUploadJob, Product
+
+MAX_WORKERS = getattr(settings, 'BULK_INGESTION_MAX_WORKERS', 4)
+BATCH_SIZE = getattr(settings, 'BULK_INGESTION_BATCH_SIZE', 20)
+MAX_ITEMS = getattr(settings, 'BULK_INGESTION_MAX_ITEMS', 500)
+# Sin actividad en el trabajo ni en sus elementos durante este tiempo: coordinador perdido
+STALE_SECONDS = getattr(settings, 'BULK_INGESTION_STALE_SECONDS', 1800)
+
+PRICE_PATTERN = re.compile(r'\d[\d.,]*')
+MAX_PRICE = Decimal('99999999.99')
+
+
+def create_job(seller, images, default_category=None, product_status='draft') -> BulkUploadJob:
+    """
+    Crea el trabajo y sus elementos guardando las imágenes en disco, de modo que
+    el procesamiento no depende de que el navegador siga abierto
+    """
+    with transaction.atomic():
+        job = BulkUploadJob.objects.create(
+            seller=seller,
+            default_category=default_category,
+            product_status=product_status,
+        )
+        BulkUploadItem.objects.bulk_create([
+            BulkUploadItem(job=job, position=position, image=image, original_name=image.name[:255])
+            for position, image in enumerate(images)
+        ])
+    return job
+
+
+def start_job(job: BulkUploadJob):
+    """
+    Lanza el coordinador del trabajo en un hilo en segundo plano una vez
+    confirmada la transacción que lo creó
+    """
+    def _launch():
+        threading.Thread(
+            target=run_job,
+            args=(job.pk,),
+            name=f'bulk-upload-job-{job.pk}',
+            daemon=True,
+        ).start()
+
+    transaction.on_commit(_launch)
+
+
+def run_job(job_id: int):
+    """
+    Procesa todos los elementos pendientes de un trabajo
+    """
+    try:
+        job = BulkUploadJob.objects.select_related('seller', 'default_category').get(pk=job_id)
+        job.status = 'processing'
+        job.save(update_fields=['status', 'updated_at'])
+
+        items = list(job.items.filter(status='pending'))
+        category_map = CategoryMap()
+        pending = []
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix=f'bulk-{job_id}') as pool:
+            futures = {pool.submit(_analyze_item, item, job.seller): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                result = future.result()
+                if result['success']:
+                    item.ai_data = result['data']
+                else:
+                    item.status = 'failed'
+                    item.error_message = result.get('error', 'Error en el análisis de IA')
+                pending.append(item)
+
+                if len(pending) >= BATCH_SIZE:
+                    _flush_batch(job, pending, category_map)
+                    pending = []
+
+        _flush_batch(job, pending, category_map)
+
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    except Exception as e:
+        BulkUploadJob.objects.filter(pk=job_id).update(
+            status='failed',
+            error_message=str(e),
+            finished_at=timezone.now(),
+        )
+    finally:
+        connection.close()
+
+
+def stale_jobs(stale_after: float = STALE_SECONDS):
+    """
+    Trabajos sin terminar en los que ni el trabajo ni ninguno de sus elementos
+    se ha actualizado en stale_after segundos
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return (
+        BulkUploadJob.objects.filter(status__in=('pending', 'processing'), updated_at__lt=cutoff)
+        .annotate(last_activity=Max('items__updated_at'))
+        .filter(Q(last_activity__lt=cutoff) | Q(last_activity__isnull=True))
+        .order_by('created_at')
+    )
+
+
+def resume_job(job: BulkUploadJob) -> bool:
+    """
+    Reanuda un trabajo abandonado en el hilo actual: los elementos que se
+    quedaron en 'processing' vuelven a 'pending' y se analizan de nuevo (los ya
+    completados no se tocan). El UPDATE condicional evita que dos procesos
+    reanuden el mismo trabajo. Devuelve si este proceso lo reanudó
+    """
+    now = timezone.now()
+    claimed = BulkUploadJob.objects.filter(
+        pk=job.pk, status=job.status, updated_at=job.updated_at
+    ).update(status='processing', updated_at=now)
+    if not claimed:
+        return False
+    job.items.filter(status='processing').update(status='pending', updated_at=now)
+    run_job(job.pk)
+    return True
+
+
+def resume_stale_jobs(stale_after: float = STALE_SECONDS):
+    """
+    Reanuda uno tras otro los trabajos abandonados. Devuelve los ids reanudados
+    """
+    return [job.pk for job in stale_jobs(stale_after) if resume_job(job)]
+
+
+def _analyze_item(item: BulkUploadItem, seller):
+    """
+    Analiza una imagen con IA dentro de un worker del pool
+    """
+    from AI_API.registry import get_product_ai_service
+    from AI_API.views import convert_image_to_data_url
+
+    try:
+        BulkUploadItem.objects.filter(pk=item.pk).update(status='processing', updated_at=timezone.now())
+        with item.image.open('rb') as image_file:
+            image_url = convert_image_to_data_url(image_file)
+        return get_product_ai_service().analyze_product_complete(image_url, user=seller)
+    except Exception as e:
+        return {'success': False, 'error': f'Error procesando imagen: {str(e)}'}
+    finally:
+        connection.close()
+
+
+def _flush_batch(job: BulkUploadJob, items, category_map: 'CategoryMap'):
+    """
+    Crea con bulk_create los productos de los elementos analizados y actualiza
+    el estado de todos los elementos del lote en una sola operación
+    """
+    if not items:
+        return
+
+    analyzed = [item for item in items if item.status != 'failed']
+    products = []
+    for item in analyzed:
+        data = item.ai_data
+        if job.default_category:
+            category = job.default_category
+        else:
+            match = category_map.match(suggested_category=data.get('suggested_category'))
+            category = match.category
+            data['category_match'] = {'confidence': match.confidence, 'method': match.method}
+        if not category:
+            item.status = 'failed'
+            item.error_message = 'No hay categorías disponibles en el sistema'
+            continue
+        products.append((item, Product(
+            title=(data.get('title') or 'Producto sin título')[:200],
+            description=data.get('description') or 'Sin descripción',
+            price=extract_price(data.get('price_suggestion')),
+            category=category,
+            image=item.image.name,
+            seller=job.seller,
+            status=job.product_status,
+        )))
+
+    now = timezone.now()
+    with transaction.atomic():
+        insert_products(
+            [product for _, product in products],
+            [item.ai_data.get('tags') for item, _ in products],
+        )
+        for item, product in products:
+            item.product = product
+            item.status = 'completed'
+        for item in items:
+            item.updated_at = now
+        BulkUploadItem.objects.bulk_update(
+            items, ['status', 'ai_data', 'product', 'error_message', 'updated_at']
+        )
+    caching.invalidate_products([product for _, product in products])
+
+    # Ya estamos en un hilo de fondo: generar las miniaturas aquí mismo
+    for _, product in products:
+        thumbnails.generate_thumbnails(product)
+
+
+def insert_products(products, tag_names=None):
+    """
+    Inserta los productos con bulk_create y hace lo que haría post_save
+    (tags e índice de búsqueda). Llamar dentro de transaction.atomic();
+    invalidar la caché y generar miniaturas queda para después del commit.
+    tag_names, si se da, tiene los tags de cada producto (lista o texto de la IA)
+    """
+    if not products:
+        return products
+    Product.objects.bulk_create(products)
+    if tag_names:
+        tags.attach_tags(products, tag_names)
+    # bulk_create no envía post_save: indexar explícitamente para la búsqueda
+    search.index_products(products)
+    return products
+
+
+class CategoryMap:
+    """
+    Resuelve las categorías de muchos elementos contra el índice en memoria de
+    products.categories, sin consultas adicionales
+    """
+
+    def __init__(self):
+        self.index = categories.get_index()
+
+    def match(self, category_id=None, suggested_category=None) -> categories.CategoryMatch:
+        """
+        Por id; si no, por la categoría sugerida (difusa); si no, la primera
+        """
+        try:
+            category = self.index.by_id.get(int(category_id)) if category_id else None
+        except (TypeError, ValueError):
+            category = None
+        if category:
+            return categories.CategoryMatch(category, 1.0, 'id')
+        return self.index.resolve(suggested_category)
+
+    def resolve(self, category_id=None, suggested_category=None):
+        return self.match(category_id, suggested_category).category
+
+
+def extract_price(price_suggestion) -> Decimal:
+    """
+    Extrae el primer número del precio sugerido por la IA, con separadores de
+    miles y decimales de cualquiera de los dos estilos ("1,299.99", "1.299,99")
+    """
+    match = PRICE_PATTERN.search(str(price_suggestion or ''))
+    try:
+        price = Decimal(normalize_number(match.group(0))) if match else Decimal('0')
+    except InvalidOperation:
+        price = Decimal('0')
+    return min(max(price, Decimal('0')), MAX_PRICE).quantize(Decimal('0.01'))
+
+
+def normalize_number(text: str) -> str:
+    """
+    Número con '.' como único separador decimal. Si aparecen ',' y '.', el
+    último es el decimal; si solo aparece uno, es de miles cuando se repite o
+    va seguido de exactamente tres cifras ("1,299", "1.000.000")
+    """
+    text = text.rstrip('.,')
+    if ',' in text and '.' in text:
+        decimal, thousands = ('.', ',') if text.rfind('.') > text.rfind(',') else (',', '.')
+        return text.replace(thousands, '').replace(decimal, '.')
+    for separator in (',', '.'):
+        if separator in text:
+            whole, _, fraction = text.rpartition(separator)
+            if text.count(separator) > 1 or len(fraction) == 3:
+                return text.replace(separator, '')
+            return f'{whole}.{fraction}'
+    return text
+
+
+def job_progress(job: BulkUploadJob):
+    """
+    Resumen serializable del progreso de un trabajo y de cada elemento
+    """
+    items = list(job.items.select_related('product__category'))
+    counts = {key: 0 for key, _ in BulkUploadJob.STATUS_CHOICES}
+    for item in items:
+        counts[item.status] += 1
+
+    finished = counts['completed'] + counts['failed']
+    return {
+        'id': job.id,
+        'status': job.status,
+        'total': len(items),
+        'processed': finished,
+        'counts': counts,
+        'progress': round(finished * 100 / len(items), 1) if items else 100.0,
+        'error': job.error_message,
+        'items': [
+            {
+                'position': item.position,
+                'filename': item.original_name,
+                'status': item.status,
+                'error': item.error_message,
+                'product': {
+                    'id': item.product.id,
+                    'title': item.product.title,
+                    'price': str(item.product.price),
+                    'category': item.product.category.name,
+                    'status': item.product.status,
+                } if item.product else None,
+            }
+            for item in items
+        ],
+    }
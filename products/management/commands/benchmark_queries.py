@@ -0,0 +1,153 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from AI_API.models import AIRequest
+from products.models import Category, Product
+from wishlist.models import Wishlist
+
+PAGE_SIZE = 25
+SELLERS = 20
+SELLER_PREFIX = 'bench_seller_'
+BATCH_SIZE = 1000
+
+
+def is_scan(plan: str) -> bool:
+    """
+    El plan recorre la tabla completa u ordena en memoria. SQLite: "SCAN <tabla>"
+    sin "USING INDEX" o "USE TEMP B-TREE"; PostgreSQL: "Seq Scan" o "Sort"
+    """
+    for line in plan.splitlines():
+        if 'SCAN' in line and 'USING' not in line and 'CONSTANT ROW' not in line:
+            return True
+        if 'TEMP B-TREE' in line or 'Seq Scan' in line or line.strip().startswith('Sort'):
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra un catálogo de N productos y compara planes EXPLAIN y tiempos de las '
+        'consultas del storefront sin y con los índices compuestos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000, help='Productos publicados/borrador a sembrar como mínimo')
+        parser.add_argument('--repeat', type=int, default=20, help='Repeticiones por consulta')
+        parser.add_argument('--plans', action='store_true', help='Mostrar los planes EXPLAIN completos')
+
+    def handle(self, *args, **options):
+        missing = options['products'] - Product.objects.count()
+        if missing > 0:
+            self.stdout.write(f'🌱 Sembrando {missing} productos...')
+            self.seed(missing)
+
+        queries = self.build_queries()
+        indexes = self.model_indexes()
+
+        # "Antes": se eliminan los índices dentro de una transacción que se revierte
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index_name in indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index_name)}')
+            before = self.measure(queries, options['repeat'])
+            transaction.set_rollback(True)
+
+        after = self.measure(queries, options['repeat'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n📊 {Product.objects.count()} productos · {len(indexes)} índices comparados · '
+            f'{options["repeat"]} repeticiones (mediana / p95 en ms)\n'
+        ))
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, results in (('sin índices', before), ('con índices', after)):
+                result = results[name]
+                scan = '⚠️  scan/sort' if result['scan'] else '✅ índice'
+                self.stdout.write(
+                    f'  {label:<12} {result["median"]:>8.2f} / {result["p95"]:>8.2f}  {scan}'
+                )
+                if options['plans']:
+                    for line in result['plan'].splitlines():
+                        self.stdout.write(f'      {line}')
+
+    @staticmethod
+    def seed(count):
+        """
+        Catálogo mínimo para medir: productos con bulk_create (sin señales ni
+        índice de búsqueda) y listas de deseos para 5 vendedores
+        """
+        rng = random.Random(0)
+        usernames = [f'{SELLER_PREFIX}{index}' for index in range(SELLERS)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([User(username=name) for name in usernames if name not in existing])
+        sellers = list(User.objects.filter(username__in=usernames).order_by('id'))
+        categories = list(Category.objects.all()) or [Category.objects.create(name='General')]
+
+        for start in range(0, count, BATCH_SIZE):
+            Product.objects.bulk_create([
+                Product(
+                    title=f'Producto {start + index}',
+                    description='Producto sembrado para benchmark_queries',
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                    category=rng.choice(categories),
+                    image='products/images/seed.jpg',
+                    seller=rng.choice(sellers),
+                    status='published' if rng.random() < 0.8 else 'draft',
+                )
+                for index in range(min(BATCH_SIZE, count - start))
+            ])
+
+        product_ids = list(Product.objects.filter(status='published').values_list('id', flat=True)[:10000])
+        Wishlist.objects.bulk_create([
+            Wishlist(user=seller, product_id=product_id)
+            for seller in sellers[:5]
+            for product_id in rng.sample(product_ids, min(200, len(product_ids)))
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    def build_queries(self):
+        published = Product.objects.filter(status='published')
+        category = Category.objects.order_by('id').first()
+        seller = Product.objects.order_by('id').values_list('seller_id', flat=True).first()
+        wishlist_user = Wishlist.objects.order_by('id').values_list('user_id', flat=True).first()
+        recent = ('-created_at', '-id')
+        return {
+            'home': published.order_by(*recent)[:PAGE_SIZE],
+            'home + categoría': published.filter(category=category).order_by(*recent)[:PAGE_SIZE],
+            'home + rango de precio': published.filter(price__gte=10, price__lte=12).order_by(*recent)[:PAGE_SIZE],
+            'mis productos': Product.objects.filter(seller_id=seller).order_by(*recent)[:PAGE_SIZE],
+            'mi wishlist': Wishlist.objects.filter(user_id=wishlist_user).select_related('product').order_by('-added_at', '-id')[:PAGE_SIZE],
+            'admin AIRequest por estado': AIRequest.objects.filter(status='completed').order_by('-created_at')[:100],
+        }
+
+    @staticmethod
+    def model_indexes():
+        return [
+            index.name
+            for model in (Product, Wishlist, AIRequest)
+            for index in model._meta.indexes
+        ]
+
+    @staticmethod
+    def measure(queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                'plan': plan,
+                'scan': is_scan(plan),
+                'median': statistics.median(timings),
+                'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            }
+        return results
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products import thumbnails
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas (WebP/JPEG) de los productos existentes en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Hilos de generación en paralelo')
+        parser.add_argument('--batch-size', type=int, default=200, help='Productos leídos por lote')
+        parser.add_argument('--force', action='store_true', help='Regenerar aunque ya existan')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        generated = skipped = 0
+        last_id = 0
+
+        def _generate(product):
+            try:
+                return thumbnails.generate_thumbnails(product, force=force) is not None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                batch = list(
+                    Product.objects.filter(pk__gt=last_id).exclude(image='')
+                    .order_by('pk').only('id', 'image', 'thumbnails')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                for done in executor.map(_generate, batch):
+                    if done:
+                        generated += 1
+                    else:
+                        skipped += 1
+                last_id = batch[-1].pk
+                self.stdout.write(f'  ... {generated + skipped} productos procesados')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Miniaturas generadas: {generated} · sin cambios o sin imagen válida: {skipped}'
+        ))
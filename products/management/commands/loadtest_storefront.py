@@ -0,0 +1,305 @@
+"""
+Prueba de carga del storefront sobre un catálogo sintético.
+
+Siembra en bloque (products.seeding) el catálogo que falte hasta --products:
+vendedores, compradores, productos, tags y listas de deseos, y reconstruye el
+índice de búsqueda. Después reproduce con el cliente de pruebas una mezcla de
+búsquedas, listados filtrados, fichas de producto, listas de deseos y
+altas/bajas en la lista de deseos, y reporta por operación las latencias
+p50/p95/p99, las consultas SQL por request y los aciertos de la caché de
+páginas anónimas.
+
+Escribe en la base de datos configurada: pensado para una base de pruebas.
+Con --cleanup borra al terminar los usuarios sembrados (seed_seller_*,
+seed_shopper_*) y sus productos. La caché no se vacía: solo se invalidan las
+páginas del storefront (products.caching) para empezar en frío.
+"""
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from products import caching, search, seeding
+from products.models import Category, Product, Tag
+
+DEFAULT_MIX = 'search=30,filter=25,detail=30,wishlist=10,toggle=5'
+OPERATIONS = ('search', 'filter', 'detail', 'wishlist', 'toggle')
+# Operaciones que requieren sesión
+AUTHENTICATED = ('wishlist', 'toggle')
+
+
+def percentile(values, percent: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra un catálogo sintético (productos, tags, usuarios y listas de deseos) y '
+        'mide latencias y consultas por vista de home, product_detail y my_wishlist'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Tamaño mínimo del catálogo (se siembra lo que falte)')
+        parser.add_argument('--sellers', type=int, default=200)
+        parser.add_argument('--shoppers', type=int, default=1000, help='Compradores con lista de deseos')
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--tags-per-product', type=int, default=3)
+        parser.add_argument('--wishlist-size', type=int, default=30, help='Productos por lista de deseos')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por INSERT al sembrar')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests a reproducir')
+        parser.add_argument('--warmup', type=int, default=50, help='Requests previas que no se miden')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Pesos de las operaciones ({DEFAULT_MIX})')
+        parser.add_argument('--anonymous-ratio', type=float, default=0.5,
+                            help='Fracción de búsquedas, filtros y fichas hechas sin sesión (caché de páginas)')
+        parser.add_argument('--no-index', action='store_true',
+                            help='No reconstruir el índice de búsqueda tras sembrar (lo más lento con 10⁶ productos)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='', help='Guardar el resultado JSON en este archivo')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Borrar al terminar los usuarios sembrados y sus productos y listas de deseos')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        mix = self.parse_mix(options['mix'])
+
+        seeding_report = self.seed(options)
+
+        self.prepare_pools(options)
+        self.clients = {}
+        self.reset_storefront_cache()
+
+        for _ in range(options['warmup']):
+            self.run_operation(self.rng.choices(list(mix), weights=list(mix.values()))[0], options)
+
+        samples = {operation: [] for operation in mix}
+        start = time.perf_counter()
+        for _ in range(options['requests']):
+            operation = self.rng.choices(list(mix), weights=list(mix.values()))[0]
+            samples[operation].append(self.run_operation(operation, options))
+        duration = time.perf_counter() - start
+
+        report = {
+            'catalog': {
+                'products': Product.objects.count(),
+                'published': Product.objects.filter(status='published').count(),
+                'tags': Tag.objects.count(),
+                'categories': Category.objects.count(),
+            },
+            'seeding': seeding_report,
+            'requests': options['requests'],
+            'duration_s': round(duration, 3),
+            'requests_per_s': round(options['requests'] / duration, 2) if duration else None,
+            'operations': {
+                operation: self.summarize(operation_samples)
+                for operation, operation_samples in samples.items() if operation_samples
+            },
+        }
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'📄 Resultado guardado en {options["output"]}'))
+        if options['cleanup']:
+            self.stdout.write('🧹 Borrando los datos sembrados...')
+            self.timed('filas borradas', seeding.delete_seeded, batch_size=options['batch_size'])
+
+    @staticmethod
+    def parse_mix(value: str) -> dict:
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in OPERATIONS:
+                raise CommandError(f'Operación desconocida en --mix: {name}')
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'Peso inválido en --mix: {part}')
+        if not any(mix.values()):
+            raise CommandError('--mix necesita al menos una operación con peso')
+        return mix
+
+    def timed(self, label: str, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'   {label}: {result} en {elapsed:.1f} s')
+        return {'rows': result, 'seconds': round(elapsed, 2)}
+
+    def seed(self, options) -> dict:
+        """
+        Siembra lo que falte del catálogo con escrituras por lotes
+        """
+        missing = options['products'] - Product.objects.count()
+        if missing <= 0:
+            self.stdout.write(f'📦 Catálogo existente: {Product.objects.count()} productos')
+            return {}
+
+        self.stdout.write(f'🌱 Sembrando {missing} productos...')
+        seed = options['seed']
+        last_id = Product.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        report = {}
+        report['products'] = self.timed(
+            'productos', seeding.seed_catalog, missing, sellers=options['sellers'],
+            batch_size=options['batch_size'], seed=seed,
+        )
+        tag_ids = seeding.seed_tags(options['tags'], seed=seed)
+        report['product_tags'] = self.timed(
+            'tags de productos', seeding.seed_product_tags, tag_ids, per_product=options['tags_per_product'],
+            after_id=last_id, batch_size=options['batch_size'], seed=seed,
+        )
+        shoppers = seeding.get_or_create_sellers(options['shoppers'], prefix=seeding.SHOPPER_PREFIX)
+        report['wishlists'] = self.timed(
+            'listas de deseos', seeding.seed_wishlists, shoppers, per_user=options['wishlist_size'],
+            seed=seed, candidates=50000,
+        )
+        if not options['no_index']:
+            report['search_index'] = self.timed('índice de búsqueda', search.rebuild_index)
+        return report
+
+    def prepare_pools(self, options):
+        """
+        Valores reales del catálogo para construir las requests
+        """
+        published = Product.objects.filter(status='published')
+        bounds = list(published.order_by('pk').values_list('pk', flat=True)[:1]) + \
+            list(published.order_by('-pk').values_list('pk', flat=True)[:1])
+        if not bounds:
+            raise CommandError('No hay productos publicados: ejecutar con --products > 0')
+        # Muestra de ids repartida por todo el catálogo, sin cargarlo entero
+        sample = set()
+        for _ in range(2000):
+            candidate = self.rng.randint(bounds[0], bounds[-1])
+            found = published.filter(pk__gte=candidate).order_by('pk').values_list('pk', flat=True).first()
+            if found:
+                sample.add(found)
+        self.product_ids = sorted(sample)
+        self.category_ids = list(Category.objects.values_list('pk', flat=True))
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True)[:1000])
+        self.search_terms = seeding.NOUNS + seeding.ADJECTIVES + [
+            f'{noun} {adjective}' for noun, adjective in zip(seeding.NOUNS, seeding.ADJECTIVES)
+        ]
+        self.shoppers = seeding.get_or_create_sellers(
+            min(options['shoppers'], 50) or 1, prefix=seeding.SHOPPER_PREFIX
+        )
+
+    def reset_storefront_cache(self):
+        """
+        Invalida las páginas del storefront que va a pedir la prueba (sin
+        cache.clear(), que borraría sesiones y demás entradas de la caché compartida)
+        """
+        caching.bump(
+            'catalog', 'categories', 'tags',
+            *(f'category:{pk}' for pk in self.category_ids),
+            *(f'product:{pk}' for pk in self.product_ids),
+        )
+
+    def client_for(self, operation: str, options) -> Client:
+        anonymous = operation not in AUTHENTICATED and self.rng.random() < options['anonymous_ratio']
+        if anonymous:
+            key = None
+        else:
+            key = self.rng.choice(self.shoppers).pk
+        if key not in self.clients:
+            client = Client()
+            if key is not None:
+                client.force_login(next(user for user in self.shoppers if user.pk == key))
+            self.clients[key] = client
+        return self.clients[key]
+
+    def build_request(self, operation: str):
+        """
+        (etiqueta, url, parámetros) de una request de la operación
+        """
+        rng = self.rng
+        if operation == 'search':
+            params = {'searchProduct': rng.choice(self.search_terms)}
+            if rng.random() < 0.3 and self.category_ids:
+                params['category'] = rng.choice(self.category_ids)
+            return 'home', reverse('home'), params
+        if operation == 'filter':
+            choice = rng.random()
+            if choice < 0.4 and self.category_ids:
+                params = {'category': rng.choice(self.category_ids)}
+            elif choice < 0.7:
+                low = rng.randint(1, 900)
+                params = {'price_min': low, 'price_max': low + rng.choice((5, 20, 100))}
+            elif self.tag_slugs:
+                params = {'tag': rng.choice(self.tag_slugs)}
+            else:
+                params = {}
+            return 'home', reverse('home'), params
+        if operation == 'detail':
+            return 'product_detail', reverse('product_detail', args=[rng.choice(self.product_ids)]), {}
+        if operation == 'wishlist':
+            return 'my_wishlist', reverse('wishlist:my_wishlist'), {}
+        return 'toggle_wishlist', reverse('wishlist:toggle_wishlist', args=[rng.choice(self.product_ids)]), {}
+
+    def run_operation(self, operation: str, options) -> dict:
+        client = self.client_for(operation, options)
+        view, url, params = self.build_request(operation)
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = client.get(url, params)
+        elapsed = time.perf_counter() - start
+        return {
+            'view': view,
+            'ms': elapsed * 1000,
+            'queries': queries.count,
+            'ok': response.status_code < 400,
+            'cache_hit': response.get('X-Storefront-Cache') == 'hit',
+        }
+
+    @staticmethod
+    def summarize(samples) -> dict:
+        latencies = [sample['ms'] for sample in samples]
+        queries = [sample['queries'] for sample in samples]
+        return {
+            'view': samples[0]['view'],
+            'count': len(samples),
+            'errors': sum(1 for sample in samples if not sample['ok']),
+            'cache_hit_ratio': round(sum(1 for sample in samples if sample['cache_hit']) / len(samples), 3),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(max(latencies), 2),
+            },
+            'queries': {
+                'mean': round(statistics.mean(queries), 2),
+                'max': max(queries),
+            },
+        }
+
+    def print_report(self, report):
+        catalog = report['catalog']
+        self.stdout.write(self.style.SUCCESS(
+            f'\n📊 {catalog["products"]} productos ({catalog["published"]} publicados) · {catalog["tags"]} tags · '
+            f'{report["requests"]} requests en {report["duration_s"]} s ({report["requests_per_s"]} req/s)\n'
+        ))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'operación  vista            n    p50 ms   p95 ms   p99 ms  consultas (media/máx)  caché'
+        ))
+        for operation, summary in report['operations'].items():
+            latency, queries = summary['latency_ms'], summary['queries']
+            self.stdout.write(
+                f'{operation:<10} {summary["view"]:<15} {summary["count"]:>4} {latency["p50"]:>9} '
+                f'{latency["p95"]:>8} {latency["p99"]:>8} {queries["mean"]:>12} / {queries["max"]:<8} '
+                f'{summary["cache_hit_ratio"]:>5.0%}'
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from products import search
+from products.models import SearchPosting
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de productos (necesario tras cargas con bulk_create o importaciones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=search.INDEX_BATCH_SIZE,
+            help='Productos indexados por lote',
+        )
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Índice reconstruido: {indexed} productos, {SearchPosting.objects.count()} entradas'
+            )
+        )
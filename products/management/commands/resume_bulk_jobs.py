@@ -0,0 +1,40 @@
+"""
+Comando para reanudar las cargas masivas que quedaron a medias cuando el
+proceso web que las coordinaba se reinició o cayó (products.ingestion)
+"""
+from django.core.management.base import BaseCommand
+
+from products import ingestion
+from products.models import BulkUploadJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Reanuda las cargas masivas sin actividad (coordinador perdido tras un despliegue '
+        'o una caída). Pensado para ejecutarse tras cada despliegue o periódicamente'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-seconds', type=float, default=ingestion.STALE_SECONDS,
+                            help='Segundos sin actividad para considerar abandonado un trabajo')
+        parser.add_argument('--dry-run', action='store_true', help='Solo listar los trabajos abandonados')
+
+    def handle(self, *args, **options):
+        jobs = list(ingestion.stale_jobs(options['stale_seconds']))
+        if not jobs:
+            self.stdout.write('No hay cargas masivas abandonadas')
+            return
+
+        for job in jobs:
+            if options['dry_run']:
+                self.stdout.write(f'   Carga {job.pk} ({job.status}, última actividad {job.last_activity or job.updated_at})')
+                continue
+            self.stdout.write(f'🔁 Reanudando la carga {job.pk}...')
+            if not ingestion.resume_job(job):
+                self.stdout.write('   Otro proceso ya la reanudó')
+                continue
+            job = BulkUploadJob.objects.get(pk=job.pk)
+            counts = ingestion.job_progress(job)['counts']
+            self.stdout.write(
+                f'   {job.status}: {counts["completed"]} completados, {counts["failed"]} fallidos'
+            )
@@ -0,0 +1,124 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:46
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# Copia congelada del analizador de products.search (pesos, normalización,
+# stopwords y stemming) para que la migración no dependa del código actual de
+# la app. Si el analizador cambia, reconstruir con manage.py rebuild_search_index
+FIELD_WEIGHTS = {
+    'title': 3,
+    'tags': 2,
+    'category': 2,
+    'description': 1,
+}
+TOKEN_PATTERN = re.compile(r'[a-z0-9ñ]+')
+MAX_TERM_LENGTH = 64
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuando de del desde
+donde durante e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos
+fue ha hasta la las le les lo los mas me mi muy ni no nos o otra otro para pero poco por porque
+que se sea ser si sin sobre son su sus tambien tan te tiene todo todos tu un una uno unos y ya
+""".split())
+
+
+def _fold(text):
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def _stem(token):
+    if len(token) > 4 and token.endswith('es') and not token.endswith('ies'):
+        token = token[:-2]
+    elif len(token) > 3 and token.endswith('s'):
+        token = token[:-1]
+    if len(token) > 4 and token[-1] in 'aoe':
+        token = token[:-1]
+    return token
+
+
+def analyze(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(_fold(text or '')):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        tokens.append(_stem(token)[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def index_existing_products(apps, schema_editor):
+    """
+    Indexa los productos publicados existentes con el analizador congelado
+    """
+    Product = apps.get_model('products', 'Product')
+    SearchDocument = apps.get_model('products', 'SearchDocument')
+    SearchPosting = apps.get_model('products', 'SearchPosting')
+
+    documents, postings = [], []
+    products = Product.objects.filter(status='published').select_related('category').prefetch_related('tags')
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        fields = {
+            'title': product.title,
+            'description': product.description,
+            'tags': ' '.join(tag.name for tag in product.tags.all()),
+            'category': product.category.name,
+        }
+        terms = Counter()
+        for field, text in fields.items():
+            for token in analyze(text):
+                terms[token] += FIELD_WEIGHTS[field]
+        length = sum(terms.values())
+        documents.append(SearchDocument(product_id=product.pk, length=length))
+        postings.extend(
+            SearchPosting(term=term, product_id=product.pk, weight=weight, doc_length=length)
+            for term, weight in terms.items()
+        )
+        if len(documents) >= BATCH_SIZE:
+            SearchDocument.objects.bulk_create(documents)
+            SearchPosting.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+            documents, postings = [], []
+    SearchDocument.objects.bulk_create(documents)
+    SearchPosting.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_bulkuploadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='products.product')),
+                ('length', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('doc_length', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Entrada del índice de búsqueda',
+                'verbose_name_plural': 'Índice de búsqueda',
+                'constraints': [models.UniqueConstraint(fields=('term', 'product'), name='unique_search_posting')],
+            },
+        ),
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Rutas de las variantes generadas (ver products.thumbnails)', verbose_name='Miniaturas'),
+        ),
+    ]
@@ -44,6 +44,7 @@ class Product(models.Model):
     seller = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Vendedor")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Borrador', verbose_name="Estado")
     tags = models.ManyToManyField(Tag, blank=True, verbose_name="Etiquetas")
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Miniaturas", help_text="Rutas de las variantes generadas (ver products.thumbnails)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
     
@@ -53,3 +54,96 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
+        # Índices alineados con los listados: filtro por estado (y categoría o
+        # precio) ordenado por recencia, y "mis productos" del vendedor
+        indexes = [
+            models.Index(fields=['status', '-created_at', '-id'], name='product_status_recent_idx'),
+            models.Index(fields=['status', 'category', '-created_at', '-id'], name='product_status_cat_recent_idx'),
+            models.Index(fields=['status', 'price'], name='product_status_price_idx'),
+            models.Index(fields=['seller', '-created_at', '-id'], name='product_seller_recent_idx'),
+        ]
+
+
+class BulkUploadJob(models.Model):
+    """
+    Trabajo de carga masiva procesado en el servidor: una subida crea el trabajo
+    y cada imagen se analiza con IA y se convierte en un producto
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('processing', 'Procesando'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bulk_upload_jobs', verbose_name="Vendedor")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    default_category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Categoría por defecto")
+    product_status = models.CharField(max_length=20, choices=Product.STATUS_CHOICES, default='draft', verbose_name="Estado de los productos")
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Fecha de finalización")
+
+    def __str__(self):
+        return f"Carga masiva {self.id} - {self.seller} - {self.status}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Carga masiva"
+        verbose_name_plural = "Cargas masivas"
+
+
+class BulkUploadItem(models.Model):
+    """
+    Imagen individual dentro de un trabajo de carga masiva
+    """
+    STATUS_CHOICES = BulkUploadJob.STATUS_CHOICES
+
+    job = models.ForeignKey(BulkUploadJob, on_delete=models.CASCADE, related_name='items')
+    position = models.PositiveIntegerField(default=0)
+    image = models.ImageField(upload_to='products/bulk/', verbose_name="Imagen")
+    original_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    ai_data = models.JSONField(default=dict, blank=True, help_text="Respuesta de IA parseada")
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='bulk_upload_items')
+    error_message = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.original_name or self.image.name} - {self.status}"
+
+    class Meta:
+        ordering = ['job', 'position']
+        verbose_name = "Elemento de carga masiva"
+        verbose_name_plural = "Elementos de carga masiva"
+
+
+class SearchDocument(models.Model):
+    """
+    Producto indexado para la búsqueda: longitud ponderada del documento (BM25)
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Documento de búsqueda"
+        verbose_name_plural = "Documentos de búsqueda"
+
+
+class SearchPosting(models.Model):
+    """
+    Entrada del índice invertido: término normalizado -> producto, con la
+    frecuencia ponderada del término y la longitud del documento desnormalizada
+    """
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_postings')
+    weight = models.PositiveIntegerField(default=1)
+    doc_length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Entrada del índice de búsqueda"
+        verbose_name_plural = "Índice de búsqueda"
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'product'], name='unique_search_posting'),
+        ]
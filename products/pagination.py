@@ -0,0 +1,151 @@
+"""
+Paginación por cursor (keyset) para los listados de productos.
+
+En lugar de OFFSET, cada página filtra por los valores de ordenación del último
+elemento de la anterior (p. ej. created_at < X o created_at = X y pk < Y), así
+que pedir la página 1000 cuesta lo mismo que la primera y los elementos
+insertados mientras se navega no desplazan los resultados. El cursor es opaco
+(JSON en base64) y viaja en el parámetro ?cursor=.
+"""
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.db.models import Q
+
+CURSOR_PARAM = 'cursor'
+DEFAULT_PAGE_SIZE = 24
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """
+    Una página de resultados con los enlaces a la siguiente y la anterior
+    """
+
+    def __init__(self, object_list: List, next_query: Optional[str], previous_query: Optional[str]):
+        self.object_list = object_list
+        self.next_query = next_query
+        self.previous_query = previous_query
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_query is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_query is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values: Sequence[Any], forward: bool) -> str:
+    payload = json.dumps({'v': [_serialize(value) for value in values], 'f': forward})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, model, ordering: Sequence[str]):
+    """
+    Devuelve (valores, hacia_adelante); lanza InvalidCursor si no es válido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, forward = payload['v'], bool(payload['f'])
+        if len(values) != len(ordering):
+            raise InvalidCursor(cursor)
+        fields = [_field(model, name.lstrip('-')) for name in ordering]
+        return [field.to_python(value) for field, value in zip(fields, values)], forward
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def paginate(request, queryset, ordering: Sequence[str] = ('-created_at', '-pk'),
+             per_page: int = DEFAULT_PAGE_SIZE) -> KeysetPage:
+    """
+    Pagina queryset por cursor según ordering, que debe terminar en un campo
+    único (pk) para que el orden sea total. Un cursor inválido muestra la
+    primera página
+    """
+    ordering = list(ordering)
+    cursor = request.GET.get(CURSOR_PARAM)
+    values, forward = None, True
+    if cursor:
+        try:
+            values, forward = decode_cursor(cursor, queryset.model, ordering)
+        except InvalidCursor:
+            values, forward = None, True
+
+    if values is not None:
+        queryset = queryset.filter(_keyset_filter(ordering, values, forward))
+    page_ordering = ordering if forward else [_reverse(field) for field in ordering]
+    rows = list(queryset.order_by(*page_ordering)[:per_page + 1])
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    has_next = has_more if forward else values is not None
+    has_previous = values is not None if forward else has_more
+    next_query = previous_query = None
+    if rows and has_next:
+        next_query = _query_with_cursor(request, encode_cursor(_values(rows[-1], ordering), True))
+    if rows and has_previous:
+        previous_query = _query_with_cursor(request, encode_cursor(_values(rows[0], ordering), False))
+    return KeysetPage(rows, next_query, previous_query)
+
+
+def _keyset_filter(ordering: Sequence[str], values: Sequence[Any], forward: bool) -> Q:
+    """
+    Comparación lexicográfica de la tupla de ordenación con los valores del cursor
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[index]})
+        for previous_field, previous_value in zip(ordering[:index], values[:index]):
+            term &= Q(**{previous_field.lstrip('-'): previous_value})
+        condition |= term
+    return condition
+
+
+def _values(obj, ordering: Sequence[str]) -> List[Any]:
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def _field(model, name: str):
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+def _reverse(field: str) -> str:
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _serialize(value: Any):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+def _query_with_cursor(request, cursor: str) -> str:
+    query = request.GET.copy()
+    query[CURSOR_PARAM] = cursor
+    query.pop('page', None)
+    return query.urlencode()
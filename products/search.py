@@ -0,0 +1,307 @@
+"""
+Búsqueda de productos con índice invertido y ranking BM25.
+
+El índice (SearchPosting/SearchDocument) cubre título, descripción, nombres de
+tags y nombre de categoría de los productos publicados, con pesos por campo.
+Los textos se normalizan igual al indexar y al buscar: minúsculas, sin acentos
+("Electrónica" -> "electronica"), sin stopwords y con un stemming ligero del
+español (plurales y vocal final), de modo que "lámparas" encuentra "Lámpara".
+
+Una búsqueda solo lee las entradas de los términos de la consulta (índice por
+término), así que su coste depende de cuántos productos contienen esos términos
+y no del tamaño del catálogo. El último término se expande por prefijo para
+que las búsquedas mientras se escribe ("lamp") también encuentren resultados.
+
+El índice se mantiene con señales (ver products.signals). Los caminos que usan
+bulk_create no disparan post_save y deben llamar a index_products().
+"""
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Sum, Value, When
+
+from .models import Product, SearchDocument, SearchPosting
+
+# Peso de cada campo en la frecuencia del término
+FIELD_WEIGHTS = {
+    'title': 3,
+    'tags': 2,
+    'category': 2,
+    'description': 1,
+}
+
+BM25_K1 = getattr(settings, 'SEARCH_BM25_K1', 1.2)
+BM25_B = getattr(settings, 'SEARCH_BM25_B', 0.75)
+PREFIX_EXPANSIONS = getattr(settings, 'SEARCH_PREFIX_EXPANSIONS', 20)
+STATS_MAX_AGE = getattr(settings, 'SEARCH_STATS_MAX_AGE', 60)
+INDEX_BATCH_SIZE = 500
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9ñ]+')
+MAX_TERM_LENGTH = 64
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuando de del desde
+donde durante e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos
+fue ha hasta la las le les lo los mas me mi muy ni no nos o otra otro para pero poco por porque
+que se sea ser si sin sobre son su sus tambien tan te tiene todo todos tu un una uno unos y ya
+""".split())
+
+
+def fold(text: str) -> str:
+    """
+    Minúsculas y sin acentos ni diéresis
+    """
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def stem(token: str) -> str:
+    """
+    Stemming ligero del español: quita el plural y la vocal final
+    """
+    if len(token) > 4 and token.endswith('es') and not token.endswith('ies'):
+        token = token[:-2]
+    elif len(token) > 3 and token.endswith('s'):
+        token = token[:-1]
+    if len(token) > 4 and token[-1] in 'aoe':
+        token = token[:-1]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    """
+    Tokens normalizados de un texto, en orden y con repeticiones
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(fold(text or '')):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        tokens.append(stem(token)[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def product_terms(product: Product, tag_names: Iterable[str] = None) -> Counter:
+    """
+    Frecuencias ponderadas de los términos de un producto
+    """
+    if tag_names is None:
+        tag_names = [tag.name for tag in product.tags.all()]
+    fields = {
+        'title': product.title,
+        'description': product.description,
+        'tags': ' '.join(tag_names),
+        'category': product.category.name,
+    }
+    terms = Counter()
+    for field, text in fields.items():
+        for token in analyze(text):
+            terms[token] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def index_products(products: Iterable[Product]):
+    """
+    (Re)indexa los productos dados. Los no publicados se quitan del índice
+    """
+    products = list(products)
+    if not products:
+        return
+    ids = [product.pk for product in products]
+    # Recargar con categoría y tags en tres consultas, sin importar cuántos productos sean
+    loaded = (
+        Product.objects.filter(pk__in=ids, status='published')
+        .select_related('category')
+        .prefetch_related('tags')
+    )
+
+    documents, postings = [], []
+    for product in loaded:
+        terms = product_terms(product, [tag.name for tag in product.tags.all()])
+        length = sum(terms.values())
+        documents.append(SearchDocument(product=product, length=length))
+        postings.extend(
+            SearchPosting(term=term, product=product, weight=weight, doc_length=length)
+            for term, weight in terms.items()
+        )
+
+    with transaction.atomic():
+        SearchPosting.objects.filter(product_id__in=ids).delete()
+        SearchDocument.objects.filter(product_id__in=ids).delete()
+        SearchDocument.objects.bulk_create(documents, batch_size=INDEX_BATCH_SIZE)
+        SearchPosting.objects.bulk_create(postings, batch_size=INDEX_BATCH_SIZE)
+
+
+def index_product(product: Product):
+    index_products([product])
+
+
+def rebuild_index(batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Reconstruye el índice completo por lotes. Devuelve los productos indexados
+    """
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Product.objects.filter(status='published', pk__gt=last_id)
+            .order_by('pk').only('pk')[:batch_size]
+        )
+        if not batch:
+            break
+        index_products(batch)
+        indexed += len(batch)
+        last_id = batch[-1].pk
+    invalidate_stats()
+    return indexed
+
+
+_stats_cache: Dict[str, float] = {}
+
+
+def invalidate_stats():
+    _stats_cache.clear()
+
+
+def _collection_stats():
+    """
+    Número de documentos y longitud media, recalculados como mucho cada
+    SEARCH_STATS_MAX_AGE segundos
+    """
+    if time.monotonic() - _stats_cache.get('loaded_at', -STATS_MAX_AGE) >= STATS_MAX_AGE:
+        stats = SearchDocument.objects.aggregate(documents=Count('pk'), total_length=Sum('length'))
+        documents = stats['documents'] or 0
+        _stats_cache.update(
+            documents=documents,
+            avg_length=(stats['total_length'] or 0) / documents if documents else 0.0,
+            loaded_at=time.monotonic(),
+        )
+    return _stats_cache['documents'], _stats_cache['avg_length']
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Términos de la consulta; el último se expande a los términos indexados
+    que empiezan por él
+    """
+    tokens = list(dict.fromkeys(analyze(query)))
+    if not tokens:
+        return []
+    last = tokens[-1]
+    if len(last) >= 3:
+        # Rango en lugar de startswith: LIKE no usa el índice por término en SQLite
+        upper = last[:-1] + chr(ord(last[-1]) + 1)
+        expansions = (
+            SearchPosting.objects.filter(term__gte=last, term__lt=upper)
+            .values_list('term', flat=True).distinct()[:PREFIX_EXPANSIONS]
+        )
+        tokens.extend(term for term in expansions if term not in tokens)
+    return tokens
+
+
+class RankedResults:
+    """
+    Resultados ordenados por BM25, compatibles con django.core.paginator.Paginator:
+    count() y slicing cargan solo la página pedida
+    """
+
+    def __init__(self, query: str, queryset=None):
+        self.query = query
+        self.terms = query_terms(query)
+        self._ranking = self._build_ranking(queryset)
+        self._count = None
+
+    def _build_ranking(self, queryset):
+        if not self.terms:
+            return None
+        postings = SearchPosting.objects.filter(term__in=self.terms)
+        if queryset is not None:
+            postings = postings.filter(product__in=queryset.values('pk'))
+
+        documents, avg_length = _collection_stats()
+        frequencies = dict(
+            SearchPosting.objects.filter(term__in=self.terms)
+            .values_list('term').annotate(df=Count('pk'))
+        )
+        if not frequencies:
+            return None
+        documents = max(documents, max(frequencies.values()))
+        idf = Case(
+            *[
+                When(term=term, then=Value(math.log(1 + (documents - df + 0.5) / (df + 0.5))))
+                for term, df in frequencies.items()
+            ],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        norm = BM25_K1 * BM25_B / avg_length if avg_length else 0.0
+        score = ExpressionWrapper(
+            idf * F('weight') * Value(BM25_K1 + 1) / (
+                F('weight') + Value(BM25_K1 * (1 - BM25_B)) + F('doc_length') * Value(norm)
+            ),
+            output_field=FloatField(),
+        )
+        return (
+            postings.values('product_id')
+            .annotate(score=Sum(score))
+            .order_by('-score', '-product_id')
+        )
+
+    def count(self) -> int:
+        if self._count is None:
+            self._count = self._ranking.count() if self._ranking is not None else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if self._ranking is None:
+            return []
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        rows = list(self._ranking[index])
+        products = (
+            Product.objects.select_related('category')
+            .in_bulk([row['product_id'] for row in rows])
+        )
+        results = []
+        for row in rows:
+            product = products.get(row['product_id'])
+            if product is not None:
+                product.search_score = row['score']
+                results.append(product)
+        return results
+
+
+def search(query: str, queryset=None) -> RankedResults:
+    """
+    Productos publicados que coinciden con la consulta, ordenados por relevancia.
+    queryset restringe los resultados (filtros de categoría, precio...)
+    """
+    return RankedResults(query, queryset)
+
+
+def reindex_products_of(category_id: Optional[int] = None, tag_id: Optional[int] = None):
+    """
+    Reindexa los productos de una categoría o con un tag (cuando cambia su nombre)
+    """
+    products = Product.objects.filter(status='published')
+    if category_id is not None:
+        products = products.filter(category_id=category_id)
+    if tag_id is not None:
+        products = products.filter(tags__id=tag_id)
+    batch = []
+    for product in products.only('pk').iterator(chunk_size=INDEX_BATCH_SIZE):
+        batch.append(product)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            index_products(batch)
+            batch = []
+    index_products(batch)
@@ -0,0 +1,159 @@
+"""
+Catálogos sintéticos para benchmarks y pruebas de carga.
+
+Crea vendedores, compradores, productos, tags y listas de deseos con
+bulk_create en lotes. Los productos sembrados no pasan por post_save: si se
+quiere buscarlos, ejecutar rebuild_search_index después. delete_seeded borra
+los usuarios con prefijo de siembra y sus productos (los tags se conservan:
+pueden coincidir con los de productos reales).
+"""
+import random
+from decimal import Decimal
+from typing import List
+
+from django.contrib.auth.models import User
+
+from wishlist.models import Wishlist
+from . import search, tags
+from .models import Category, Product
+
+SELLER_PREFIX = 'seed_seller_'
+SHOPPER_PREFIX = 'seed_shopper_'
+PLACEHOLDER_IMAGE = 'products/images/seed.jpg'
+
+ADJECTIVES = [
+    'moderno', 'clásico', 'ligero', 'resistente', 'compacto', 'elegante', 'ecológico',
+    'inalámbrico', 'portátil', 'artesanal', 'premium', 'infantil', 'deportivo', 'vintage',
+]
+NOUNS = [
+    'lámpara', 'silla', 'mesa', 'camiseta', 'zapatillas', 'reloj', 'auriculares', 'mochila',
+    'balón', 'novela', 'peluche', 'maceta', 'cafetera', 'teclado', 'bicicleta', 'collar',
+    'chaqueta', 'sartén', 'altavoz', 'cuaderno',
+]
+
+
+def get_or_create_sellers(count: int, prefix: str = SELLER_PREFIX) -> List[User]:
+    """
+    Usuarios de prueba (seed_seller_N por defecto), reutilizando los que ya existan
+    """
+    usernames = [f'{prefix}{index}' for index in range(count)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    User.objects.bulk_create([
+        User(username=username, email=f'{username}@example.com')
+        for username in usernames if username not in existing
+    ])
+    return list(User.objects.filter(username__in=usernames).order_by('id'))
+
+
+def seed_catalog(products: int, sellers: int = 20, published_ratio: float = 0.8,
+                 batch_size: int = 1000, seed: int = None) -> int:
+    """
+    Crea `products` productos repartidos entre vendedores y categorías.
+    Devuelve el número de productos creados
+    """
+    rng = random.Random(seed)
+    categories = list(Category.objects.all())
+    if not categories:
+        categories = [Category.objects.create(name='General')]
+    seller_list = get_or_create_sellers(sellers)
+
+    created = 0
+    while created < products:
+        size = min(batch_size, products - created)
+        batch = []
+        for _ in range(size):
+            noun, adjective = rng.choice(NOUNS), rng.choice(ADJECTIVES)
+            batch.append(Product(
+                title=f'{noun.capitalize()} {adjective} {rng.randint(1, 9999)}',
+                description=f'{noun.capitalize()} {adjective} de {rng.choice(NOUNS)}, ideal para el día a día.',
+                price=Decimal(rng.randint(100, 100000)) / 100,
+                category=rng.choice(categories),
+                image=PLACEHOLDER_IMAGE,
+                seller=rng.choice(seller_list),
+                status='published' if rng.random() < published_ratio else 'draft',
+            ))
+        Product.objects.bulk_create(batch, batch_size=batch_size)
+        created += size
+    return created
+
+
+def seed_tags(count: int, seed: int = None) -> List[int]:
+    """
+    Tags "<sustantivo>-<adjetivo>[-N]" creados en bloque. Devuelve sus ids
+    """
+    rng = random.Random(seed)
+    combinations = [f'{noun} {adjective}' for noun in NOUNS for adjective in ADJECTIVES]
+    rng.shuffle(combinations)
+    names = [
+        combinations[index % len(combinations)] + (f' {index // len(combinations)}' if index >= len(combinations) else '')
+        for index in range(count)
+    ]
+    return list(tags.tag_ids_for(names).values())
+
+
+def seed_product_tags(tag_ids: List[int], per_product: int = 3, after_id: int = 0,
+                      batch_size: int = 5000, seed: int = None) -> int:
+    """
+    Enlaza hasta per_product tags al azar a cada producto con id > after_id,
+    recorriendo el catálogo por lotes de claves. Devuelve los enlaces creados
+    """
+    if not tag_ids or per_product <= 0:
+        return 0
+    rng = random.Random(seed)
+    Through = Product.tags.through
+    created, last_id = 0, after_id
+    while True:
+        product_ids = list(
+            Product.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not product_ids:
+            return created
+        links = [
+            Through(product_id=product_id, tag_id=tag_id)
+            for product_id in product_ids
+            for tag_id in rng.sample(tag_ids, min(rng.randint(1, per_product), len(tag_ids)))
+        ]
+        Through.objects.bulk_create(links, batch_size=batch_size, ignore_conflicts=True)
+        created += len(links)
+        last_id = product_ids[-1]
+
+
+def seed_wishlists(users: List[User], per_user: int = 50, seed: int = None,
+                   candidates: int = 10000) -> int:
+    """
+    Añade productos publicados al azar (entre los primeros `candidates`) a la
+    lista de deseos de cada usuario
+    """
+    rng = random.Random(seed)
+    product_ids = list(Product.objects.filter(status='published').values_list('id', flat=True)[:candidates])
+    if not product_ids:
+        return 0
+    entries = [
+        Wishlist(user=user, product_id=product_id)
+        for user in users
+        for product_id in rng.sample(product_ids, min(per_user, len(product_ids)))
+    ]
+    Wishlist.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+    return len(entries)
+
+
+def delete_seeded(batch_size: int = 1000) -> dict:
+    """
+    Borra los vendedores y compradores sembrados (SELLER_PREFIX, SHOPPER_PREFIX)
+    con sus productos y listas de deseos. Los productos se borran por lotes para
+    no cargar el catálogo entero en el collector. Devuelve las filas borradas
+    """
+    users = User.objects.filter(username__startswith=SELLER_PREFIX) | \
+        User.objects.filter(username__startswith=SHOPPER_PREFIX)
+    products = Product.objects.filter(seller__in=users)
+    deleted = 0
+    while True:
+        batch = list(products.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        Product.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
+    user_count = users.count()
+    users.delete()
+    search.invalidate_stats()
+    return {'products': deleted, 'users': user_count}
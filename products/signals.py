@@ -1,7 +1,9 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save
 from django.dispatch import receiver
 from django.apps import apps
-from .models import Category
+from .models import Category, Product, Tag
+from . import caching, search, tags, thumbnails
 
 @receiver(post_migrate)
 def create_default_categories(sender, **kwargs):
@@ -65,3 +67,122 @@ def create_default_categories(sender, **kwargs):
         )
     
     print(f"✅ {len(default_categories)} categorías creadas automáticamente")
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """
+    Mantiene el índice de búsqueda al crear o editar un producto
+    (al borrarlo, sus entradas se eliminan en cascada)
+    """
+    if not raw:
+        search.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def generate_product_thumbnails(sender, instance, raw=False, **kwargs):
+    """
+    Genera las miniaturas cuando el producto tiene una imagen nueva
+    """
+    if raw or not instance.image:
+        return
+    if (instance.thumbnails or {}).get('source') != instance.image.name:
+        thumbnails.schedule_thumbnails(instance)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def reindex_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Reindexa cuando cambian los tags de un producto (o los productos de un tag)
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_product(instance)
+    elif action == 'post_clear':
+        search.reindex_products_of(tag_id=instance.pk)
+    else:
+        search.index_products(Product.objects.filter(pk__in=pk_set).only('pk'))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    """
+    El nombre de la categoría forma parte del índice de sus productos
+    """
+    if not created and not raw:
+        search.reindex_products_of(category_id=instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tag_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.reindex_products_of(tag_id=instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def update_tag_slug_cache(sender, instance, created=False, **kwargs):
+    """
+    Mantiene la caché slug -> id de products.tags (el slug puede cambiar en el admin)
+    """
+    if not created:
+        tags.forget(instance)
+    if kwargs['signal'] is post_save:
+        tags.remember({instance.slug: instance.pk})
+
+
+# Invalidación de la caché del storefront (products.caching). Las versiones se
+# incrementan tras el commit para que nadie cachee datos anteriores con la nueva
+
+def _bump_on_commit(*namespaces):
+    transaction.on_commit(lambda: caching.bump(*namespaces))
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    """
+    Guarda la categoría cargada para invalidar también la anterior si cambia
+    """
+    instance._loaded_category_id = instance.__dict__.get('category_id')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    namespaces = {'catalog', f'product:{instance.pk}', f'category:{instance.category_id}'}
+    previous = getattr(instance, '_loaded_category_id', None)
+    if previous is not None:
+        namespaces.add(f'category:{previous}')
+    instance._loaded_category_id = instance.category_id
+    _bump_on_commit(*namespaces)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def invalidate_product_tags_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # El listado de home puede filtrar por tag
+    if not reverse:
+        _bump_on_commit('catalog', f'product:{instance.pk}')
+    else:
+        _bump_on_commit('catalog', 'tags')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, raw=False, **kwargs):
+    """
+    El nombre de la categoría aparece en filtros, formularios y tarjetas
+    """
+    if not raw:
+        _bump_on_commit('categories', 'catalog', f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_on_commit('tags')
@@ -0,0 +1,157 @@
+"""
+Ingesta de tags sugeridos por la IA.
+
+La IA devuelve los tags como texto separado por comas ("tag1, tag2, ...").
+parse_tags los normaliza (espacios, mayúsculas, símbolos) y los deduplica por
+slug; tag_ids_for resuelve los slugs a ids con una caché en proceso
+slug -> id que se calienta con una sola consulta, y crea los que falten con un
+bulk_create(ignore_conflicts=True); attach_tags enlaza todos los productos de
+un lote con un único INSERT en la tabla intermedia.
+
+Ni bulk_create ni el INSERT en la tabla intermedia envían señales: quien llame
+debe reindexar los productos para la búsqueda (ingestion.insert_products ya lo
+hace). Las señales de Tag (products.signals) mantienen la caché al día cuando
+se editan o borran tags desde el admin.
+"""
+import threading
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Product, Tag
+
+MAX_TAGS_PER_PRODUCT = 10
+NAME_MAX_LENGTH = Tag._meta.get_field('name').max_length
+MIN_LENGTH = 2
+
+_slug_ids: Dict[str, int] = {}
+_warm = False
+_lock = threading.Lock()
+
+
+def normalize_tag(name) -> str:
+    """
+    'Hogar  Moderno ' -> 'hogar moderno'. Devuelve '' si no sirve como tag
+    """
+    name = ' '.join(str(name).replace('#', ' ').split()).strip(' .,;:-_"\'').lower()
+    name = name[:NAME_MAX_LENGTH].strip()
+    return name if len(name) >= MIN_LENGTH and slugify(name) else ''
+
+
+def parse_tags(value) -> List[str]:
+    """
+    Nombres normalizados y sin duplicados (por slug) a partir del texto de la IA
+    ("a, b, c") o de una lista
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    names, seen = [], set()
+    for raw in value:
+        name = normalize_tag(raw)
+        slug = slugify(name)[:NAME_MAX_LENGTH]
+        if name and slug not in seen:
+            seen.add(slug)
+            names.append(name)
+        if len(names) >= MAX_TAGS_PER_PRODUCT:
+            break
+    return names
+
+
+def _warm_cache():
+    global _warm
+    with _lock:
+        if not _warm:
+            _slug_ids.update(Tag.objects.values_list('slug', 'id'))
+            _warm = True
+
+
+def remember(slug_ids: Dict[str, int]):
+    """
+    Añade entradas a la caché cuando se confirma la transacción (si se
+    revierte, los ids no existirían)
+    """
+    def _update():
+        with _lock:
+            _slug_ids.update(slug_ids)
+
+    transaction.on_commit(_update)
+
+
+def forget(tag: Tag = None):
+    """
+    Quita un tag de la caché (o la vacía entera, para que se recargue)
+    """
+    global _warm
+    with _lock:
+        if tag is None:
+            _slug_ids.clear()
+            _warm = False
+        else:
+            for slug, tag_id in list(_slug_ids.items()):
+                if tag_id == tag.pk:
+                    del _slug_ids[slug]
+
+
+def tag_ids_for(names: Iterable[str]) -> Dict[str, int]:
+    """
+    {nombre: id} de los tags dados, creando en bloque los que no existan
+    """
+    _warm_cache()
+    by_slug = {slugify(name)[:NAME_MAX_LENGTH]: name for name in names}
+    result = {name: _slug_ids[slug] for slug, name in by_slug.items() if slug in _slug_ids}
+    missing = {slug: name for slug, name in by_slug.items() if slug not in _slug_ids}
+    if not missing:
+        return result
+
+    Tag.objects.bulk_create(
+        [Tag(name=name, slug=slug) for slug, name in missing.items()],
+        ignore_conflicts=True,
+    )
+    # Los que otro proceso creó antes, o que chocan por nombre con un slug distinto
+    found = Tag.objects.filter(Q(slug__in=missing) | Q(name__in=missing.values())).values_list('slug', 'name', 'id')
+    slug_for_name = {name: slug for slug, name in missing.items()}
+    slug_ids = {}
+    for slug, name, tag_id in found:
+        slug_ids[slug] = tag_id
+        if slug in missing:
+            result[missing[slug]] = tag_id
+        elif name in slug_for_name:
+            result[name] = tag_id
+            # El slug pedido también apunta a ese tag: la próxima vez no se vuelve a crear ni consultar
+            slug_ids[slug_for_name[name]] = tag_id
+    remember(slug_ids)
+    return result
+
+
+def attach_tags(products: List[Product], tag_names: List[Iterable[str]]):
+    """
+    Enlaza cada producto con sus tags (listas paralelas, nombres ya
+    normalizados o texto de la IA) con un solo INSERT en la tabla intermedia
+    """
+    wanted = {product.pk: parse_tags(names) for product, names in zip(products, tag_names)}
+    ids = tag_ids_for({name for names in wanted.values() for name in names})
+    if not ids:
+        return
+
+    Through = Product.tags.through
+    Through.objects.bulk_create(
+        [
+            Through(product_id=product_id, tag_id=ids[name])
+            for product_id, names in wanted.items()
+            for name in names if name in ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def set_product_tags(product: Product, value):
+    """
+    Sustituye los tags de un producto (formularios de alta y edición). Usa
+    product.tags.set, así que las señales m2m reindexan e invalidan la caché
+    """
+    ids = tag_ids_for(parse_tags(value))
+    product.tags.set(ids.values())
@@ -0,0 +1,30 @@
+from django import template
+
+from products.thumbnails import thumbnail_url as _thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(product, variant='card', extension='jpeg'):
+    """
+    {% thumbnail_url product 'card' 'webp' %}: URL de una variante de la imagen
+    """
+    return _thumbnail_url(product, variant, extension)
+
+
+@register.inclusion_tag('product_picture.html')
+def product_picture(product, variant='card', css_class='', style=''):
+    """
+    {% product_picture product 'card' 'card-img-top' %}: <picture> con WebP y
+    JPEG de respaldo, o la imagen original si aún no hay miniaturas
+    """
+    variants = (product.thumbnails or {}).get('variants', {}) if product.image else {}
+    has_variant = (product.thumbnails or {}).get('source') == product.image.name and variant in variants
+    return {
+        'product': product,
+        'webp_url': _thumbnail_url(product, variant, 'webp') if has_variant else None,
+        'image_url': _thumbnail_url(product, variant, 'jpeg'),
+        'css_class': css_class,
+        'style': style,
+    }
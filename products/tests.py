@@ -1,3 +1,624 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from productplatform import metrics
+from wishlist.models import Wishlist
+from . import categories, ingestion, search, seeding, tags, thumbnails
+from .models import BulkUploadJob, Category, Product, SearchPosting, Tag
+from .views import PAGE_SIZE
+
+
+class ProductListingQueryCountTests(TestCase):
+    """
+    Los listados paginados hacen el mismo número de consultas sin importar
+    cuántos productos haya en la página o en el catálogo
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('vendedor', password='clave-segura-123')
+        cls.categories = [
+            Category.objects.create(name=f'Categoría {index}') for index in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_products(self, count):
+        products = Product.objects.bulk_create([
+            Product(
+                title=f'Producto {index}',
+                description='Descripción del producto',
+                price=Decimal('10.00'),
+                category=self.categories[index % len(self.categories)],
+                image='products/images/test.jpg',
+                seller=self.seller,
+                status='published',
+            )
+            for index in range(count)
+        ])
+        Wishlist.objects.bulk_create([
+            Wishlist(user=self.seller, product=product) for product in products
+        ])
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def assert_constant_queries(self, url_name):
+        self.client.force_login(self.seller)
+        url = reverse(url_name)
+
+        self.create_products(2)
+        # Primera visita: llena la caché de categorías
+        self.count_queries(url)
+        small_page, _ = self.count_queries(url)
+
+        self.create_products(PAGE_SIZE * 3)
+        full_page, response = self.count_queries(url)
+        self.assertEqual(small_page, full_page)
+        self.assertEqual(len(response.context['page'].object_list), PAGE_SIZE)
+
+        # Las páginas siguientes (por cursor) tampoco añaden consultas
+        next_query = response.context['page'].next_query
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'{url}?{next_query}')
+        self.assertEqual(len(context.captured_queries), full_page)
+        self.assertTrue(response.context['page'].has_previous)
+
+    def test_home_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('home')
+
+    def test_seller_products_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('products')
+
+    def test_wishlist_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('wishlist:my_wishlist')
+
+    def test_keyset_pages_cover_catalog_without_duplicates(self):
+        self.create_products(PAGE_SIZE * 2 + 5)
+        seen = []
+        query = ''
+        while True:
+            response = self.client.get(f"{reverse('home')}?{query}")
+            page = response.context['page']
+            seen.extend(product.pk for product in page.object_list)
+            if not page.has_next:
+                break
+            query = page.next_query
+        self.assertEqual(len(seen), PAGE_SIZE * 2 + 5)
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_home_page_has_fixed_query_budget(self):
+        self.create_products(PAGE_SIZE)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('home'))
+
+
+class StorefrontCacheTests(TestCase):
+    """
+    Las páginas anónimas se sirven desde la caché hasta que una señal de
+    Product o Category invalida su versión
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('vendedor', password='clave-segura-123')
+        cls.category = Category.objects.create(name='Hogar')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_product(self, title, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                title=title,
+                description='Descripción del producto',
+                price=Decimal('10.00'),
+                category=self.category,
+                seller=self.seller,
+                status='published',
+                **fields,
+            )
+
+    def test_anonymous_home_is_served_from_cache(self):
+        self.create_product('Lámpara')
+        first = self.client.get(reverse('home'))
+        self.assertEqual(first['X-Storefront-Cache'], 'miss')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('home'))
+        self.assertEqual(second['X-Storefront-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+
+    def test_product_changes_invalidate_listing_and_detail(self):
+        product = self.create_product('Lámpara')
+        detail_url = reverse('product_detail', args=[product.pk])
+        self.client.get(reverse('home'))
+        self.client.get(detail_url)
+
+        self.create_product('Mesa plegable')
+        home = self.client.get(reverse('home'))
+        self.assertEqual(home['X-Storefront-Cache'], 'miss')
+        self.assertContains(home, 'Mesa plegable')
+        self.assertEqual(self.client.get(detail_url)['X-Storefront-Cache'], 'hit')
+
+        product.title = 'Lámpara de pie'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertContains(self.client.get(detail_url), 'Lámpara de pie')
+
+    def test_category_rename_invalidates_cached_pages(self):
+        self.create_product('Lámpara')
+        self.client.get(reverse('home'))
+
+        self.category.name = 'Casa y jardín'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Storefront-Cache'], 'miss')
+        self.assertContains(response, 'Casa y jardín')
+
+    def test_authenticated_users_bypass_page_cache(self):
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('X-Storefront-Cache', response)
+
+
+class MetricsEndpointTests(TestCase):
+    """
+    MetricsMiddleware registra latencia y consultas por vista y /metrics las
+    expone en formato Prometheus
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def get_metrics(self, **params):
+        return self.client.get(reverse('metrics'), params, HTTP_AUTHORIZATION='Bearer secreto')
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_home_request_is_recorded(self):
+        self.client.get(reverse('home'))
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="home"}', body)
+        self.assertIn('http_request_db_queries_bucket{method="GET",view="home",le="+Inf"}', body)
+        self.assertIn('span_seconds_count{span="storefront.home.render"}', body)
+
+        data = self.get_metrics(format='json').json()
+        self.assertIn('http_requests_total{method="GET",status="200",view="home"}', data['counters'])
+        self.assertIsNotNone(data['histograms']['span_seconds{span="storefront.home.query"}']['p95'])
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.get_metrics().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_endpoint_is_closed_without_token_unless_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    async def test_async_requests_count_queries(self):
+        key = 'http_request_db_queries{method="GET",view="home"}'
+        before = metrics.snapshot().get(key, {'count': 0, 'sum': 0})
+        await self.async_client.get(reverse('home'))
+        after = metrics.snapshot()[key]
+        self.assertEqual(after['count'], before['count'] + 1)
+        self.assertGreater(after['sum'], before['sum'])
+
+
+class BulkIngestionTests(TransactionTestCase):
+    """
+    Motor de cargas masivas (products.ingestion) con el servicio de IA simulado.
+    TransactionTestCase: los workers del pool usan sus propias conexiones
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user('carga-masiva', password='clave-segura-123')
+        self.category = Category.objects.create(name='Hogar')
+        self.ai_service = mock.Mock()
+        media_root = tempfile.mkdtemp(prefix='bulk-ingestion-tests-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.enterContext(mock.patch('AI_API.registry.get_product_ai_service', return_value=self.ai_service))
+        self.enterContext(mock.patch.object(ingestion, 'MAX_WORKERS', 1))
+
+    def create_job(self, count):
+        images = []
+        for index in range(count):
+            buffer = io.BytesIO()
+            Image.new('RGB', (32, 32), (index * 40, 0, 0)).save(buffer, 'JPEG')
+            images.append(SimpleUploadedFile(f'producto-{index}.jpg', buffer.getvalue(), 'image/jpeg'))
+        return ingestion.create_job(self.seller, images, product_status='published')
+
+    def test_run_job_creates_products_and_records_failures(self):
+        self.ai_service.analyze_product_complete.side_effect = [
+            {'success': True, 'data': {'title': 'Lámpara', 'description': 'LED', 'price_suggestion': '$25.99',
+                                       'suggested_category': 'Hogar', 'tags': 'lampara, led'}},
+            {'success': False, 'error': 'Modelo no disponible'},
+        ]
+        job = self.create_job(2)
+
+        ingestion.run_job(job.pk)
+
+        progress = ingestion.job_progress(BulkUploadJob.objects.get(pk=job.pk))
+        self.assertEqual((progress['status'], progress['counts']['completed'], progress['counts']['failed']),
+                         ('completed', 1, 1))
+        product = Product.objects.get(seller=self.seller)
+        self.assertEqual((product.title, product.price, product.category), ('Lámpara', Decimal('25.99'), self.category))
+        self.assertEqual(progress['items'][1]['error'], 'Modelo no disponible')
+
+    def test_stale_job_is_resumed(self):
+        self.ai_service.analyze_product_complete.return_value = {
+            'success': True, 'data': {'title': 'Silla', 'price_suggestion': '40', 'suggested_category': 'Hogar'},
+        }
+        job = self.create_job(2)
+        # Coordinador perdido a mitad del trabajo: un elemento se quedó en 'processing'
+        long_ago = timezone.now() - timedelta(seconds=ingestion.STALE_SECONDS + 60)
+        BulkUploadJob.objects.filter(pk=job.pk).update(status='processing', updated_at=long_ago)
+        job.items.update(updated_at=long_ago)
+        job.items.filter(position=0).update(status='processing')
+        recent = self.create_job(1)
+
+        self.assertEqual(list(ingestion.stale_jobs()), [BulkUploadJob.objects.get(pk=job.pk)])
+        self.assertEqual(ingestion.resume_stale_jobs(), [job.pk])
+
+        self.assertEqual(BulkUploadJob.objects.get(pk=job.pk).status, 'completed')
+        self.assertEqual(Product.objects.filter(bulk_upload_items__job=job).count(), 2)
+        self.assertEqual(BulkUploadJob.objects.get(pk=recent.pk).status, 'pending')
+        self.assertEqual(ingestion.resume_stale_jobs(), [])
+
+
+class SearchIndexTests(TestCase):
+    """
+    Índice invertido y ranking BM25 de la búsqueda (products.search)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('buscador', password='clave-segura-123')
+        cls.category = Category.objects.create(name='Iluminación')
+
+    def setUp(self):
+        search.invalidate_stats()
+
+    def create_product(self, title, description='Producto de la tienda', status='published'):
+        return Product.objects.create(
+            title=title, description=description, price=Decimal('10.00'),
+            category=self.category, seller=self.seller, status=status,
+        )
+
+    def titles(self, query):
+        return [product.title for product in search.search(query)[:10]]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.create_product('Silla de madera', 'Combina con cualquier lámpara')
+        self.create_product('Lámpara de escritorio')
+        self.create_product('Mesa de centro')
+
+        self.assertEqual(self.titles('lámparas'), ['Lámpara de escritorio', 'Silla de madera'])
+        # Prefijo mientras se escribe
+        self.assertEqual(self.titles('lamp')[0], 'Lámpara de escritorio')
+
+    def test_rarer_terms_weigh_more(self):
+        for index in range(5):
+            self.create_product(f'Lámpara clásica {index}')
+        self.create_product('Lámpara roja')
+
+        results = search.search('lampara roja')
+        self.assertEqual(results.count(), 6)
+        self.assertEqual(results[0].title, 'Lámpara roja')
+
+    def test_index_follows_edits_unpublishing_and_deletion(self):
+        product = self.create_product('Lámpara de pie')
+        product.title = 'Ventilador de techo'
+        product.save()
+        self.assertEqual(self.titles('lampara'), [])
+        self.assertEqual(self.titles('ventilador'), ['Ventilador de techo'])
+
+        product.status = 'draft'
+        product.save()
+        self.assertEqual(self.titles('ventilador'), [])
+
+        product.status = 'published'
+        product.save()
+        product.delete()
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_index_follows_tag_changes(self):
+        product = self.create_product('Lámpara de pie')
+        tag = Tag.objects.create(name='vintage')
+        product.tags.add(tag)
+        self.assertEqual(self.titles('vintage'), ['Lámpara de pie'])
+
+        tag.name = 'retro'
+        tag.save()
+        self.assertEqual(self.titles('vintage'), [])
+        self.assertEqual(self.titles('retro'), ['Lámpara de pie'])
+
+        product.tags.remove(tag)
+        self.assertEqual(self.titles('retro'), [])
+
+
+class SeedingCleanupTests(TestCase):
+    """
+    delete_seeded (products.seeding) solo borra los usuarios sembrados y sus datos
+    """
+
+    def test_only_seeded_users_and_their_products_are_deleted(self):
+        category = Category.objects.create(name='Hogar')
+        seller = User.objects.create_user('vendedor', password='clave-segura-123')
+        kept = Product.objects.create(
+            title='Mesa real', description='Roble', price=Decimal('10.00'), category=category, seller=seller,
+        )
+        seeding.seed_catalog(12, sellers=2, batch_size=5, seed=1)
+        shoppers = seeding.get_or_create_sellers(3, prefix=seeding.SHOPPER_PREFIX)
+        seeding.seed_wishlists(shoppers + [seller], per_user=4, seed=1)
+
+        self.assertEqual(seeding.delete_seeded(batch_size=5), {'products': 12, 'users': 5})
+        self.assertEqual(list(Product.objects.all()), [kept])
+        self.assertEqual(list(User.objects.all()), [seller])
+        self.assertFalse(Wishlist.objects.exclude(user=seller).exists())
+
+
+class BulkCreateBatchTests(TestCase):
+    """
+    Alta de muchos productos en una request (products.api_views.bulk_create_batch)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('lote', password='clave-segura-123')
+        cls.category = Category.objects.create(name='Hogar')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='bulk-batch-tests-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_login(self.seller)
+
+    def image(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (16, 16), 'white').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+    def post(self, items, images=1):
+        return self.client.post(reverse('api_bulk_create_batch'), {
+            'items': json.dumps(items),
+            'images': [self.image(f'producto-{index}.jpg') for index in range(images)],
+        })
+
+    def test_all_items_created(self):
+        response = self.post([
+            {'title': 'Lámpara', 'description': 'LED', 'price': '1,299.99', 'category': self.category.pk,
+             'tags': 'lampara, led'},
+            {'title': 'Silla', 'description': 'Madera', 'price': '$40', 'suggested_category': 'hogar'},
+        ], images=2)
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['success'], body['created'], body['failed']), (True, 2, 0))
+        lamp = Product.objects.get(title='Lámpara')
+        self.assertEqual((lamp.price, lamp.category), (Decimal('1299.99'), self.category))
+        self.assertEqual(list(lamp.tags.values_list('name', flat=True).order_by('name')), ['lampara', 'led'])
+
+    def test_partial_failure_reports_each_item(self):
+        response = self.post([
+            {'title': 'Lámpara', 'description': 'LED'},
+            {'title': 'Sin descripción'},
+        ], images=2)
+
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body['success'], body['created'], body['failed']), (False, 1, 1))
+        self.assertEqual([result['success'] for result in body['results']], [True, False])
+        self.assertEqual(body['results'][1]['error'], 'Título y descripción son requeridos')
+
+    def test_nothing_created_is_not_a_success(self):
+        response = self.post([{'title': 'Sin imagen', 'description': 'x'}], images=0)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['success'], False)
+        self.assertFalse(Product.objects.exists())
+
+    def test_single_item_endpoint_parses_price_like_the_batch(self):
+        response = self.client.post(reverse('api_bulk_create_product'), {
+            'title': 'Lámpara', 'description': 'LED', 'price': '1,299.99', 'category': self.category.pk,
+            'image': self.image('lampara.jpg'),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['product']['price'], '1299.99')
+        self.assertEqual(Product.objects.get(title='Lámpara').price, Decimal('1299.99'))
+
+    def test_extract_price_handles_separators(self):
+        cases = {
+            '1,299.99': '1299.99', '1.299,99': '1299.99', '$25.99 USD': '25.99', '25,99': '25.99',
+            '1,299': '1299.00', 'Aprox. 45.50': '45.50', None: '0.00', 'gratis': '0.00',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(ingestion.extract_price(text), Decimal(expected))
+
+
+class ThumbnailTests(TestCase):
+    """
+    Variantes precalculadas de la imagen de producto (products.thumbnails)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('vendedor', password='clave-segura-123')
+        cls.category = Category.objects.create(name='Hogar')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='thumbnail-tests-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.enterContext(mock.patch.object(thumbnails, 'GENERATE_IN_BACKGROUND', False))
+        buffer = io.BytesIO()
+        Image.new('RGB', (2400, 1200), 'red').save(buffer, 'JPEG')
+        self.content = buffer.getvalue()
+
+    def create_product(self, title='Lámpara'):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                title=title, description='LED', price=Decimal('10.00'), category=self.category,
+                image=SimpleUploadedFile('lampara.jpg', self.content, 'image/jpeg'), seller=self.seller,
+            )
+        product.refresh_from_db()
+        return product
+
+    def test_variants_are_written_and_named_by_content_hash(self):
+        product = self.create_product()
+        digest = hashlib.sha256(self.content).hexdigest()
+
+        self.assertEqual(product.thumbnails['source'], product.image.name)
+        variants = product.thumbnails['variants']
+        self.assertEqual(set(variants), set(thumbnails.VARIANTS))
+        for variant, side in thumbnails.VARIANTS.items():
+            for extension in thumbnails.FORMATS:
+                path = variants[variant][extension]
+                with self.subTest(variant=variant, extension=extension):
+                    self.assertEqual(path, thumbnails.thumbnail_path(digest, variant, extension))
+                    with default_storage.open(path) as stored, Image.open(stored) as image:
+                        self.assertEqual(image.size, (side, side // 2))
+        self.assertEqual(
+            thumbnails.thumbnail_url(product, 'card', 'webp'), default_storage.url(variants['card']['webp'])
+        )
+
+    def test_same_photo_reuses_existing_variants(self):
+        first = self.create_product()
+        with mock.patch.object(thumbnails.default_storage, 'save', wraps=default_storage.save) as save:
+            second = self.create_product('Otra lámpara')
+
+        self.assertEqual(second.thumbnails['variants'], first.thumbnails['variants'])
+        self.assertTrue(save.called)  # la imagen original sí se guarda
+        self.assertFalse(any(call.args[0].startswith(thumbnails.THUMBNAIL_DIRECTORY) for call in save.call_args_list))
+
+    def test_missing_variants_fall_back_to_the_original(self):
+        product = self.create_product()
+        product.image.name = 'products/images/otra.jpg'
+        self.assertEqual(thumbnails.thumbnail_url(product), product.image.url)
+
+
+class TagIngestionTests(TestCase):
+    """
+    Resolución de tags con caché slug -> id (products.tags)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('vendedor', password='clave-segura-123')
+        cls.category = Category.objects.create(name='Hogar')
+        cls.existing = Tag.objects.create(name='lampara')
+
+    def setUp(self):
+        tags.forget()
+        self.addCleanup(tags.forget)
+
+    def resolve(self, names):
+        with self.captureOnCommitCallbacks(execute=True):
+            return tags.tag_ids_for(names)
+
+    def test_parse_tags_normalizes_and_deduplicates(self):
+        self.assertEqual(tags.parse_tags('#Hogar  Moderno, hogar-moderno, LED., x, '), ['hogar moderno', 'led'])
+        self.assertEqual(tags.parse_tags(None), [])
+
+    def test_existing_tags_are_attached_with_a_single_insert(self):
+        products = [
+            Product.objects.create(
+                title=f'Lámpara {index}', description='LED', price=Decimal('10.00'),
+                category=self.category, image='products/images/test.jpg', seller=self.seller,
+            )
+            for index in range(3)
+        ]
+        self.resolve(['lampara', 'led'])
+
+        with CaptureQueriesContext(connection) as context:
+            tags.attach_tags(products, ['lampara, led'] * 3)
+
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertTrue(context.captured_queries[0]['sql'].startswith('INSERT'))
+        self.assertEqual(Product.tags.through.objects.count(), 6)
+
+    def test_name_conflict_with_another_slug_is_cached(self):
+        renamed = Tag.objects.create(name='hogar moderno', slug='hogar-moderno-2')
+
+        self.assertEqual(self.resolve(['hogar moderno']), {'hogar moderno': renamed.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(tags.tag_ids_for(['hogar moderno']), {'hogar moderno': renamed.pk})
+        self.assertEqual(Tag.objects.filter(name='hogar moderno').count(), 1)
+
+
+class CategoryResolutionTests(TestCase):
+    """
+    Resolución de la categoría sugerida por la IA (products.categories)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.electronics = Category.objects.create(name='Electrónica')
+        cls.home = Category.objects.create(name='Hogar')
+        cls.beauty = Category.objects.create(name='Salud y Belleza')
+
+    def setUp(self):
+        cache.clear()
+        self.index = categories.CategoryIndex([self.electronics, self.home, self.beauty])
+
+    def assertMatch(self, text, category, method):
+        match = self.index.resolve(text)
+        self.assertEqual((match.category, match.method), (category, method), text)
+        return match
+
+    def test_names_and_synonyms_match_exactly(self):
+        self.assertEqual(self.assertMatch('ELECTRONICA', self.electronics, 'exact').confidence, 1.0)
+        self.assertMatch('Belleza', self.beauty, 'exact')
+        self.assertMatch('  Decoración ', self.home, 'exact')
+
+    def test_shared_words_match_by_token(self):
+        match = self.assertMatch('Utensilios de cocina', self.home, 'token')
+        self.assertTrue(0.6 < match.confidence < 1.0)
+
+    def test_misspellings_match_by_trigram_similarity(self):
+        match = self.assertMatch('Electronika', self.electronics, 'fuzzy')
+        self.assertTrue(0 < match.confidence < 0.9)
+
+    def test_unknown_text_falls_back_to_the_first_category(self):
+        self.assertEqual(self.index.resolve('zzz qqq'), categories.CategoryMatch(self.electronics, 0.0, 'default'))
+        self.assertEqual(categories.CategoryIndex([]).resolve('hogar').method, 'default')
+
+    def test_index_is_rebuilt_when_categories_change(self):
+        index = categories.get_index()
+        self.assertIs(categories.get_index(), index)
+        self.assertNotIn('Instrumentos musicales', categories.category_names())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            instruments = Category.objects.create(name='Instrumentos musicales')
+        self.assertIsNot(categories.get_index(), index)
+        self.assertEqual(categories.resolve('instrumentos musicales').category, instruments)
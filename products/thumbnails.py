@@ -0,0 +1,154 @@
+"""
+Miniaturas precalculadas de las imágenes de producto.
+
+Al guardar un producto con imagen nueva se generan las variantes de
+VARIANTS (tarjeta, detalle, admin) en WebP y JPEG y se guardan en
+MEDIA_ROOT/products/thumbs/ con el hash del contenido original en el nombre:
+la misma foto subida dos veces reutiliza los archivos, y una foto nueva
+obtiene URLs nuevas (se pueden servir con caché inmutable).
+
+Las rutas se guardan en Product.thumbnails junto con el nombre de la imagen de
+origen, así que las plantillas no tocan el disco. Si falta una variante se usa
+la imagen original.
+"""
+import hashlib
+import io
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import caching
+from .models import Product
+
+# Variante -> lado máximo en píxeles (el doble del tamaño mostrado, para pantallas HiDPI)
+VARIANTS = getattr(settings, 'PRODUCT_THUMBNAIL_VARIANTS', {
+    'card': 480,
+    'detail': 1200,
+    'admin': 160,
+})
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+QUALITY = getattr(settings, 'PRODUCT_THUMBNAIL_QUALITY', 80)
+THUMBNAIL_DIRECTORY = 'products/thumbs'
+GENERATE_IN_BACKGROUND = getattr(settings, 'PRODUCT_THUMBNAILS_IN_BACKGROUND', True)
+
+
+def thumbnail_path(digest: str, variant: str, extension: str) -> str:
+    return f'{THUMBNAIL_DIRECTORY}/{digest[:2]}/{digest}_{variant}.{extension}'
+
+
+def generate_variants(image_file) -> Dict[str, Dict[str, str]]:
+    """
+    Genera (o reutiliza) todas las variantes de una imagen y devuelve
+    {variante: {formato: ruta}}
+    """
+    content = image_file.read()
+    digest = hashlib.sha256(content).hexdigest()
+    paths = {
+        variant: {extension: thumbnail_path(digest, variant, extension) for extension in FORMATS}
+        for variant in VARIANTS
+    }
+    if all(default_storage.exists(path) for formats in paths.values() for path in formats.values()):
+        return paths
+
+    largest = max(VARIANTS.values())
+    with Image.open(io.BytesIO(content)) as source:
+        # JPEG: decodificar ya reducido al tamaño de la variante más grande
+        source.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        # De mayor a menor: cada variante se reduce desde la anterior
+        for variant, side in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+            image.thumbnail((side, side), Image.Resampling.LANCZOS)
+            for extension, image_format in FORMATS.items():
+                path = paths[variant][extension]
+                if default_storage.exists(path):
+                    continue
+                buffer = io.BytesIO()
+                image.save(buffer, format=image_format, quality=QUALITY, optimize=True)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+    return paths
+
+
+def generate_thumbnails(product: Product, force: bool = False) -> Optional[Dict]:
+    """
+    Genera las variantes del producto y guarda sus rutas sin disparar post_save.
+    Devuelve el nuevo valor de Product.thumbnails, o None si no hubo cambios
+    """
+    if not product.image:
+        return None
+    if not force and (product.thumbnails or {}).get('source') == product.image.name:
+        return None
+    try:
+        with product.image.open('rb') as image_file:
+            variants = generate_variants(image_file)
+    except (FileNotFoundError, UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    thumbnails = {'source': product.image.name, 'variants': variants}
+    Product.objects.filter(pk=product.pk).update(thumbnails=thumbnails)
+    product.thumbnails = thumbnails
+    # update() no envía post_save: las páginas cacheadas siguen con la imagen original
+    caching.invalidate_products([product])
+    return thumbnails
+
+
+def schedule_thumbnails(product: Product):
+    """
+    Genera las miniaturas tras el commit, en un hilo aparte si
+    PRODUCT_THUMBNAILS_IN_BACKGROUND está activo, para no alargar la request
+    """
+    schedule_bulk_thumbnails([product])
+
+
+def schedule_bulk_thumbnails(products):
+    """
+    Como schedule_thumbnails, pero un solo hilo recorre todos los productos
+    (altas masivas desde la API)
+    """
+    product_ids = [product.pk for product in products if product.image]
+    if not product_ids:
+        return
+
+    def _generate():
+        try:
+            instances = Product.objects.filter(pk__in=product_ids).only('id', 'image', 'thumbnails', 'category_id')
+            for instance in instances:
+                generate_thumbnails(instance)
+        finally:
+            if GENERATE_IN_BACKGROUND:
+                connection.close()
+
+    def _launch():
+        if GENERATE_IN_BACKGROUND:
+            threading.Thread(target=_generate, name=f'thumbnails-{product_ids[0]}', daemon=True).start()
+        else:
+            _generate()
+
+    transaction.on_commit(_launch)
+
+
+def thumbnail_url(product: Product, variant: str = 'card', extension: str = 'jpeg') -> str:
+    """
+    URL de la variante pedida, o de la imagen original si aún no existe
+    """
+    thumbnails = product.thumbnails or {}
+    if thumbnails.get('source') == product.image.name:
+        path = thumbnails.get('variants', {}).get(variant, {}).get(extension)
+        if path:
+            return default_storage.url(path)
+    return product.image.url if product.image else ''
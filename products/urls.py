@@ -14,6 +14,9 @@ urlpatterns = [
 
     # API endpoints
     path('api/products/bulk-create/', api_views.bulk_create_product, name='api_bulk_create_product'),
+    path('api/products/batch/', api_views.bulk_create_batch, name='api_bulk_create_batch'),
+    path('api/products/bulk-jobs/', api_views.bulk_upload_job_create, name='api_bulk_upload_job_create'),
+    path('api/products/bulk-jobs/<int:pk>/', api_views.bulk_upload_job_status, name='api_bulk_upload_job_status'),
 
     #path('login/', views.user_login, name='login'),
     #path('logout/', views.user_logout, name='logout'),
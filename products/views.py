@@ -3,42 +3,74 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from .models import Product, Category
+from django.core.paginator import Paginator
+from productplatform import metrics
+from .models import Product
 from wishlist.models import Wishlist
 from .forms import ProductForm
+from . import caching, ingestion, pagination, search, tags
 
+SEARCH_PAGE_SIZE = 24
+PAGE_SIZE = 24
 
+# Campos que usan las tarjetas de producto (home.html); seller solo se compara por id
+CARD_FIELDS = (
+    'id', 'title', 'description', 'price', 'image', 'thumbnails', 'status', 'seller_id',
+    'created_at', 'updated_at', 'category__id', 'category__name',
+)
+
+
+@caching.cache_anonymous_page(caching.home_namespaces)
 def home(request):
     searchTerm = request.GET.get('searchProduct')
     category_filter = request.GET.get('category')
+    tag_filter = request.GET.get('tag')
     price_min = request.GET.get('price_min')
     price_max = request.GET.get('price_max')
     
-    products = Product.objects.filter(status='published')
-    
-    if searchTerm:
-        products = products.filter(title__icontains=searchTerm)
+    products = Product.objects.filter(status='published').select_related('category').only(*CARD_FIELDS)
     
     if category_filter:
         products = products.filter(category_id=category_filter)
     
+    if tag_filter:
+        products = products.filter(tags__slug=tag_filter)
+    
     if price_min:
         products = products.filter(price__gte=price_min)
     
     if price_max:
         products = products.filter(price__lte=price_max)
     
-    categories = Category.objects.all()
+    page_obj = page = None
+    with metrics.span('storefront.home.query'):
+        if searchTerm:
+            # Índice invertido con ranking BM25, paginado (ver products.search)
+            paginator = Paginator(search.search(searchTerm, queryset=products), SEARCH_PAGE_SIZE)
+            page_obj = paginator.get_page(request.GET.get('page'))
+            products = list(page_obj.object_list)
+        else:
+            page = pagination.paginate(request, products, per_page=PAGE_SIZE)
+            products = page.object_list
+    
+    categories = caching.get_categories()
     
     context = {
         'products': products,
+        'page_obj': page_obj,
+        'page': page,
         'searchTerm': searchTerm,
         'categories': categories,
         'selected_category': category_filter,
+        'selected_tag': tag_filter,
         'price_min': price_min,
-        'price_max': price_max
+        'price_max': price_max,
+        # Las tarjetas cacheadas muestran el nombre de la categoría
+        'card_cache_timeout': caching.CACHE_TIMEOUT,
+        'card_cache_version': caching.get_versions('categories')[0],
     }
-    return render(request, 'home.html', context)
+    with metrics.span('storefront.home.render'):
+        return render(request, 'home.html', context)
 
 #def about(request):
  #   return render(request, 'about.html')
@@ -79,12 +111,13 @@ def create_product(request):
             product = form.save(commit=False)
             product.seller = request.user
             product.save()
+            tags.set_product_tags(product, form.cleaned_data['tags_input'])
             messages.success(request, 'Producto creado exitosamente!')
             return redirect('home')
     else:
         form = ProductForm()
 
-    categories = Category.objects.all()
+    categories = caching.get_categories()
     return render(request, 'create_product.html', {'form': form, 'categories': categories})
 
 @login_required
@@ -93,13 +126,14 @@ def edit_product(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
-            form.save()
+            product = form.save()
+            tags.set_product_tags(product, form.cleaned_data['tags_input'])
             messages.success(request, 'Producto actualizado exitosamente!')
             return redirect('home')
     else:
         form = ProductForm(instance=product)
 
-    categories = Category.objects.all()
+    categories = caching.get_categories()
     return render(request, 'edit_product.html', {'form': form, 'product': product, 'categories': categories})
 
 @login_required
@@ -112,6 +146,7 @@ def delete_product(request, pk):
     
     return render(request, 'delete_product.html', {'product': product})
 
+@caching.cache_anonymous_page(caching.product_detail_namespaces)
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
 
@@ -129,14 +164,23 @@ def product_detail(request, pk):
     #profile = request.user
     #return render(request, 'profile.html', {'profile': profile})
 
+@login_required
 def products(request):
-    products = Product.objects.filter(seller=request.user)
-    return render(request, 'products.html', {'products': products})
+    products = (
+        Product.objects.filter(seller=request.user)
+        .select_related('category')
+        .only('id', 'title', 'price', 'image', 'thumbnails', 'status', 'created_at', 'category__id', 'category__name')
+    )
+    page = pagination.paginate(request, products, per_page=PAGE_SIZE)
+    return render(request, 'products.html', {'products': page.object_list, 'page': page})
 
 @login_required
 def bulk_create_products(request):
     """
     Vista para carga masiva de productos
     """
-    categories = Category.objects.all()
-    return render(request, 'bulk_create_products.html', {'categories': categories})
+    categories = caching.get_categories()
+    return render(request, 'bulk_create_products.html', {
+        'categories': categories,
+        'max_images': ingestion.MAX_ITEMS
+    })
@@ -9,7 +9,11 @@ class Wishlist(models.Model):
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # unique_together ya crea el índice (user, product) de las búsquedas por par
         unique_together = ('user', 'product')
+        indexes = [
+            models.Index(fields=['user', '-added_at', '-id'], name='wishlist_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.product.title}'
\ No newline at end of file
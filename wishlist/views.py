@@ -1,13 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from products import pagination
 from products.models import Product
 from .models import Wishlist
 
 
 @login_required
 def my_wishlist(request):
-    wishlist_items = Wishlist.objects.filter(user=request.user).select_related("product")
-    return render(request, 'wishlist/my_wishlist.html', {"wishlist_items": wishlist_items})
+    wishlist_items = (
+        Wishlist.objects.filter(user=request.user)
+        .select_related("product")
+        .only("id", "added_at", "product__id", "product__title", "product__price")
+    )
+    page = pagination.paginate(request, wishlist_items, ordering=("-added_at", "-pk"))
+    return render(request, 'wishlist/my_wishlist.html', {"wishlist_items": page.object_list, "page": page})
 
 
 @login_required